@@ -0,0 +1,221 @@
+"""
+HTTP API of the simulation.
+
+A background thread rebuilds one immutable snapshot of the simulation every
+REFRESH_INTERVAL seconds and serializes it once. Handlers only read the
+current reference, so a request never waits on the simulation's locks, and
+/counts costs the same with one client or hundreds. Past snapshots stay in a
+bounded history for the bulk endpoints.
+
+    GET  /counts            live counts + running flag (the sensor nodes' shape)
+    GET  /snapshot          counts, per-signal phase and remaining time, throughput
+    GET  /history           snapshots after ?since=<version>, at most ?limit=<n>
+    GET  /stream            Server-Sent Events (see live_stream.py)
+    GET  /kpi               per-approach delay, stops, queue length and throughput (see kpi.py)
+    GET  /profile           frame phase timings, per-thread CPU, profiler state (see profiling.py)
+    GET  /profile/flamegraph  profiler samples as collapsed stacks (flamegraph.pl / speedscope)
+    POST /profile/sampler   {"enabled": true|false} starts or stops the sampling profiler
+    GET  /readings          sensor readings of the last ?seconds=<n> (default 60), per ?junction=<id> (see timeseries.py)
+    POST /sensors/bulk      many sensor readings in one request
+"""
+import collections
+import itertools
+import json
+import threading
+
+from flask import Flask, Response, jsonify, request, stream_with_context
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+
+# === API SETTINGS ===
+REFRESH_INTERVAL = 0.25      # seconds between snapshots
+HISTORY_SIZE = 2400          # snapshots kept for /history (10 minutes at the default refresh)
+HISTORY_LIMIT = 500          # most snapshots returned by one /history request
+LISTEN_BACKLOG = 1024        # pending connections the server socket queues
+READINGS_WINDOW = 60         # seconds of sensor readings /readings returns by default
+READINGS_WINDOW_MAX = 3600
+
+
+class Snapshot:
+    """
+    One published state, with the JSON served for it.
+    /counts keeps the version (and ETag) of the snapshot where its counts last changed,
+    so a client polling with If-None-Match gets 304 until a count actually moves.
+    """
+
+    __slots__ = ("version", "data", "body", "etag", "countsVersion", "countsBody", "countsEtag")
+
+    def __init__(self, version, data, previous=None):
+        self.version = version
+        self.data = data
+        self.body = json.dumps({"version": version, **data}, separators=(",", ":")).encode()
+        self.etag = f'"{version}"'
+
+        if previous is not None and (previous.data["running"], previous.data["counts"]) == (data["running"], data["counts"]):
+            self.countsVersion, self.countsBody, self.countsEtag = \
+                previous.countsVersion, previous.countsBody, previous.countsEtag
+        else:
+            self.countsVersion = version
+            self.countsBody = json.dumps({"running": data["running"], "counts": data["counts"], "version": version},
+                                         separators=(",", ":")).encode()
+            self.countsEtag = self.etag
+
+
+class SnapshotCache:
+    """Calls build() -> dict every interval on its own thread and publishes the result as the current Snapshot."""
+
+    def __init__(self, build, interval=REFRESH_INTERVAL, history=HISTORY_SIZE):
+        self.build = build
+        self.interval = interval
+        self.history = collections.deque(maxlen=history)
+        self.current = None
+        self._version = itertools.count(1)
+        self._stopped = threading.Event()
+
+    def refresh(self):
+        snapshot = Snapshot(next(self._version), self.build(), self.current)
+        self.history.append(snapshot)
+        self.current = snapshot       # a single reference swap: readers see the old or the new one, whole
+        return snapshot
+
+    def start(self):
+        self.refresh()
+        threading.Thread(target=self._run, daemon=True, name="snapshot-cache").start()
+        return self
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                print("⚠️ Snapshot refresh error:", e)
+
+    def stop(self):
+        self._stopped.set()
+
+    def since(self, version, limit=HISTORY_LIMIT):
+        """Snapshots newer than version, oldest first, at most limit of them."""
+        history = list(self.history)
+        if not history or limit <= 0:
+            return []
+        start = max(0, version - history[0].version + 1)
+        return history[start:start + limit]
+
+
+def create_app(cache, stream=None, ingest=None, kpi=None, profile=None, readings=None):
+    """
+    Flask app serving cache. stream is a live_stream.Broadcaster for /stream;
+    ingest(payload) takes one sensor reading dict for /sensors/bulk;
+    kpi() returns the current KPI report for /kpi;
+    profile is a profiling.Telemetry for the /profile routes;
+    readings(seconds, junction) returns the /readings body.
+    """
+    app = Flask(__name__)
+
+    @app.route("/history", methods=["GET"])
+    def get_history_api():
+        since = request.args.get("since", default=0, type=int)
+        if since < 0:
+            return jsonify({"error": "since must be a snapshot version (0 or more)"}), 400
+        limit = max(1, min(request.args.get("limit", default=HISTORY_LIMIT, type=int), HISTORY_LIMIT))
+        snapshots = cache.since(since, limit)
+        body = b'{"snapshots":[' + b",".join(s.body for s in snapshots) + b"]}"
+        return Response(body, mimetype="application/json")
+
+    if stream is not None:
+        @app.route("/stream", methods=["GET"])
+        def stream_api():
+            """Server-Sent Events: a snapshot, then count deltas, phase changes and status as they happen."""
+            last_id = request.headers.get("Last-Event-ID")
+            return Response(stream_with_context(stream.stream(last_id)), mimetype="text/event-stream",
+                            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+    if kpi is not None:
+        @app.route("/kpi", methods=["GET"])
+        def get_kpi_api():
+            return jsonify(kpi())
+
+    if readings is not None:
+        @app.route("/readings", methods=["GET"])
+        def get_readings_api():
+            seconds = min(request.args.get("seconds", default=READINGS_WINDOW, type=float), READINGS_WINDOW_MAX)
+            return jsonify(readings(seconds, request.args.get("junction", type=int)))
+
+    if profile is not None:
+        @app.route("/profile", methods=["GET"])
+        def get_profile_api():
+            return jsonify(profile.report())
+
+        @app.route("/profile/flamegraph", methods=["GET"])
+        def get_flamegraph_api():
+            return Response(profile.sampler.collapsed(), mimetype="text/plain")
+
+        @app.route("/profile/sampler", methods=["POST"])
+        def post_sampler_api():
+            body = request.get_json(silent=True)
+            if not isinstance(body, dict) or not isinstance(body.get("enabled"), bool):
+                return jsonify({"error": 'expected {"enabled": true|false}'}), 400
+            if body["enabled"]:
+                profile.sampler.start()
+            else:
+                profile.sampler.stop()
+            return jsonify({"running": profile.sampler.running, "samples": profile.sampler.samples})
+
+    if ingest is not None:
+        @app.route("/sensors/bulk", methods=["POST"])
+        def post_sensors_bulk():
+            """Accept a JSON list of {"junction_id", "vehicles_detected", ...} readings."""
+            readings = request.get_json(silent=True)
+            if not isinstance(readings, list):
+                return jsonify({"error": "expected a JSON list of readings"}), 400
+            accepted = 0
+            for payload in readings:
+                if isinstance(payload, dict):
+                    ingest(payload)
+                    accepted += 1
+            return jsonify({"accepted": accepted}), 202
+
+    # /counts and /snapshot skip Flask's per-request machinery entirely
+    app.wsgi_app = CachedReadMiddleware(app.wsgi_app, cache)
+    return app
+
+
+class CachedReadMiddleware:
+    """WSGI layer answering GET /counts and /snapshot straight from the current Snapshot's bytes."""
+
+    def __init__(self, wsgi_app, cache):
+        self.wsgi_app = wsgi_app
+        self.cache = cache
+
+    def __call__(self, environ, start_response):
+        path = environ.get("PATH_INFO")
+        if environ.get("REQUEST_METHOD") != "GET" or path not in ("/counts", "/snapshot"):
+            return self.wsgi_app(environ, start_response)
+        snapshot = self.cache.current
+        if path == "/counts":
+            body, etag = snapshot.countsBody, snapshot.countsEtag
+        else:
+            body, etag = snapshot.body, snapshot.etag
+        if environ.get("HTTP_IF_NONE_MATCH") == etag:
+            start_response("304 Not Modified", [("ETag", etag), ("Content-Length", "0")])
+            return [b""]
+        start_response("200 OK", [("Content-Type", "application/json"), ("Content-Length", str(len(body))),
+                                  ("ETag", etag), ("Cache-Control", "no-cache")])
+        return [body]
+
+
+class KeepAliveRequestHandler(WSGIRequestHandler):
+    """HTTP/1.1, so polling clients reuse one connection instead of reconnecting for every request."""
+    protocol_version = "HTTP/1.1"
+
+
+def make_api_server(app, host, port):
+    """Threaded WSGI server for app (one thread per connection, so long-lived streams never starve requests)."""
+    server = make_server(host, port, app, threaded=True, request_handler=KeepAliveRequestHandler)
+    server.socket.listen(LISTEN_BACKLOG)
+    return server
+
+
+def serve(app, host, port):
+    """Serve app until the process exits."""
+    make_api_server(app, host, port).serve_forever()
@@ -0,0 +1,49 @@
+"""
+Process-wide sprite cache.
+
+Every image is loaded from disk once and shared by reference between all
+sprites that show it. Vehicle sprites also share a table of rotated frames,
+one per rotationAngle step of a turn, filled the first time a frame is needed.
+"""
+import os
+
+import pygame
+
+from vehicle_store import IMG_DIR, rotationAngle
+
+
+_images = {}        # path -> Surface
+_rotations = {}     # (direction, vehicleClass) -> [Surface or None] indexed by angle // rotationAngle
+
+
+def load_image(*parts, alpha=True):
+    """Load an image under IMG_DIR once; later calls return the same Surface."""
+    path = os.path.join(IMG_DIR, *parts)
+    image = _images.get(path)
+    if image is None:
+        image = pygame.image.load(path)
+        # convert() needs a display mode; before set_mode() the raw surface is cached as-is
+        if pygame.display.get_surface() is not None:
+            image = image.convert_alpha() if alpha else image.convert()
+        _images[path] = image
+    return image
+
+
+def vehicle_image(direction, vehicleClass):
+    """Unrotated sprite for a vehicle class driving in a direction."""
+    return load_image(direction, f"{vehicleClass}.png")
+
+
+def rotated_vehicle_image(direction, vehicleClass, angle):
+    """Sprite rotated clockwise by angle degrees (a multiple of rotationAngle, 0-90)."""
+    key = (direction, vehicleClass)
+    frames = _rotations.get(key)
+    if frames is None:
+        frames = [None] * (90 // rotationAngle + 1)
+        frames[0] = vehicle_image(direction, vehicleClass)
+        _rotations[key] = frames
+    step = angle // rotationAngle
+    frame = frames[step]
+    if frame is None:
+        frame = frames[step] = pygame.transform.rotate(frames[0], -step * rotationAngle)
+    return frame
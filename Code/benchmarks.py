@@ -0,0 +1,396 @@
+"""
+Benchmark suite: physics, sensor counts, SCOOT, UDP listener, sensor goodput, fleet ingest, ingest handoff
+and the HTTP API.
+
+    python Code/benchmarks.py --out bench.json
+    python Code/benchmarks.py --only physics,scoot --quick
+    python Code/benchmarks.py --out new.json --baseline bench.json
+
+Every benchmark returns a dict of numbers. The run writes them as JSON
+with the interpreter, NumPy, platform and git commit they were measured
+on, so results from two releases can be compared key by key (--baseline
+prints the change of every figure).
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import logging
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+import requests
+
+import api_server
+import wire_format
+from engine import Engine
+from ingest import ReadingBuffer, ReadingFilter
+from network_listener import serve_udp
+from scoot import plan_greens, plan_junction, plan_network
+from vehicle_store import VehicleStore, vehicleTypes
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "iot_nodes"))
+import sensor_fleet
+import sensor_node
+
+
+# === BENCHMARK SETTINGS ===
+VEHICLE_COUNTS = (10, 100, 1000, 5000)   # physics: vehicles in the store
+LOSS_RATES = (0.0, 0.1, 0.3)             # goodput: simulated packet loss
+API_CLIENTS = 8                          # /counts: concurrent keep-alive clients
+FLEET_NODES = 128                        # fleet: virtual nodes, 64 to a socket
+PLAN_SECONDS = 0.005                     # handoff: blocking I/O (prints) of one SCOOT plan
+
+
+def timed(fn, repeat):
+    """Seconds per call of fn(), over repeat calls."""
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat
+
+
+def percentiles(samples):
+    p50, p90, p99 = np.percentile(np.asarray(samples) * 1000, [50, 90, 99])
+    return {"p50_ms": round(float(p50), 3), "p90_ms": round(float(p90), 3), "p99_ms": round(float(p99), 3)}
+
+
+def free_port(kind=socket.SOCK_STREAM):
+    with socket.socket(socket.AF_INET, kind) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def filled_store(n):
+    """A store with n vehicles spread over every approach and lane, as the spawner would leave them."""
+    store = VehicleStore()
+    for i in range(n):
+        lane = i % 3
+        store.add(lane, vehicleTypes[4 if lane == 0 else i % 4], (i // 3) % 4, int(lane == 2 and i % 2))
+    return store
+
+
+# === BENCHMARKS ===
+def bench_physics(args):
+    """VehicleStore.step() (the batched Vehicle.move) against the number of vehicles."""
+    results = {}
+    for n in VEHICLE_COUNTS:
+        store = filled_store(n)
+        steps = 200 if args.quick else 1000
+        frame = iter(range(10 ** 9))
+        seconds = timed(lambda: store.step((next(frame) // 300) % 4, 0), steps)
+        results[str(n)] = {"steps_per_s": round(1 / seconds, 1), "vehicle_steps_per_s": round(n / seconds)}
+    engine = Engine(seed=1, sim_time=30 if args.quick else 120)
+    started = time.perf_counter()
+    engine.run()
+    results["engine_frames_per_s"] = round(engine.frame / (time.perf_counter() - started))
+    return results
+
+
+def bench_counts(args):
+    """get_vehicle_counts(): the per-direction waiting counts (store.waiting_counts) with 1000 vehicles."""
+    store = filled_store(1000)
+    repeat = 20000 if args.quick else 200000
+    return {
+        "waiting_counts_us": round(timed(store.waiting_counts, repeat) * 1e6, 3),
+        "waiting_snapshot_us": round(timed(store.waiting_snapshot, repeat) * 1e6, 3),
+    }
+
+
+def bench_scoot(args):
+    """apply_scoot_optimization() planners: one junction per call, and 1000 junctions per plan_network call."""
+    readings = {1: 12, 2: 3, 3: 27, 4: 0}
+    repeat = 2000 if args.quick else 20000
+    network = np.random.default_rng(1).integers(0, 60, (1000, 4))
+    return {
+        "plan_junction_per_s": round(1 / timed(lambda: plan_junction(readings, 0, 4), repeat)),
+        "plan_greens_per_s": round(1 / timed(lambda: plan_greens(readings, 0), repeat)),
+        "plan_network_1000_ms": round(timed(lambda: plan_network(network), 50 if args.quick else 500) * 1000, 3),
+    }
+
+
+def bench_fleet(args):
+    """A loss-free sensor fleet into the listener and ReadingFilter: how many readings the filter admits, and why not the rest."""
+    duration = 2.0 if args.quick else 6.0
+    readings = ReadingFilter()
+    delivered = []
+
+    def admit(payload):
+        delivered.append(readings.accept(payload["junction_id"], payload.get("seq"), payload.get("timestamp"),
+                                         payload.get("source")))
+
+    with udp_listener(admit) as port:
+        fleet = sensor_fleet.SensorFleet(FLEET_NODES, "127.0.0.1", port, interval=1.0, loss=0.0, seed=1)
+        with contextlib.redirect_stdout(io.StringIO()):
+            sent = asyncio.run(fleet.run(duration))["sent"]
+    return {"sent": sent, "delivered": len(delivered), **readings.stats}
+
+
+def handoff_run(write, plan, duration):
+    """An ingest thread calls write(jid, count) flat out while this one calls plan() (seconds it waited for the readings) every 10 ms."""
+    gaps, plans, done = [], [], threading.Event()
+
+    def ingest():
+        last = time.perf_counter()
+        i = 0
+        while not done.is_set():
+            write(i % 4 + 1, i)
+            now = time.perf_counter()
+            gaps.append(now - last)
+            last = now
+            i += 1
+
+    writer = threading.Thread(target=ingest, daemon=True, name="bench-ingest")
+    writer.start()
+    started = time.perf_counter()
+    while time.perf_counter() - started < duration:
+        time.sleep(0.01)
+        plans.append(plan())
+    done.set()
+    writer.join(5)
+    return {"writes_per_s": round(len(gaps) / duration), "writer_max_stall_ms": round(max(gaps) * 1000, 3),
+            "plan_wait": percentiles(plans)}
+
+
+def bench_handoff(args):
+    """Sensor ingest -> SCOOT handoff: a lock held for the whole plan (as before) against ReadingBuffer's swap."""
+    duration = 0.5 if args.quick else 3.0
+    lock, pending = threading.Lock(), {}
+
+    def locked_write(jid, count):
+        with lock:
+            pending[jid] = count
+
+    def locked_plan():
+        t = time.perf_counter()
+        with lock:
+            waited = time.perf_counter() - t
+            time.sleep(PLAN_SECONDS)
+            pending.clear()
+        return waited
+
+    buffer = ReadingBuffer()
+
+    def swapped_plan():
+        t = time.perf_counter()
+        buffer.swap()
+        waited = time.perf_counter() - t
+        time.sleep(PLAN_SECONDS)
+        return waited
+
+    results = {"locked": handoff_run(locked_write, locked_plan, duration),
+               "double_buffer": handoff_run(buffer.write, swapped_plan, duration)}
+    results["double_buffer"]["retries"] = buffer.stats["retries"]
+    return results
+
+
+@contextlib.contextmanager
+def udp_listener(callback):
+    """Run network_listener.serve_udp on a free loopback port for the duration of the block; yields the port."""
+    port = free_port(socket.SOCK_DGRAM)
+    loop = asyncio.new_event_loop()
+    task = loop.create_task(serve_udp(callback, "127.0.0.1", port))
+
+    def run():
+        try:
+            loop.run_until_complete(task)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            loop.close()
+
+    thread = threading.Thread(target=run, daemon=True, name="bench-listener")
+    thread.start()
+    time.sleep(0.2)
+    try:
+        yield port
+    finally:
+        loop.call_soon_threadsafe(task.cancel)
+        thread.join(5)
+
+
+def bench_listener(args):
+    """Listener packets/s: one sender blasting binary readings at loopback speed."""
+    total = 5000 if args.quick else 50000
+    received = []
+    with udp_listener(received.append) as port, socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        packets = [wire_format.encode_reading(1, 7, seq, time.time()) for seq in range(total)]
+        started = time.perf_counter()
+        for i, packet in enumerate(packets):
+            sock.sendto(packet, ("127.0.0.1", port))
+            if i % 64 == 63:
+                time.sleep(0)        # let the listener thread drain instead of overflowing the kernel buffer
+        last, idle = -1, time.perf_counter()
+        while len(received) < total and time.perf_counter() - idle < 1.0:
+            if len(received) != last:
+                last, idle = len(received), time.perf_counter()
+            time.sleep(0.01)
+        elapsed = idle if len(received) < total else time.perf_counter()
+        elapsed -= started
+    return {"sent": total, "received": len(received), "packets_per_s": round(len(received) / elapsed)}
+
+
+def bench_goodput(args):
+    """Selective-repeat goodput to the listener (simulated ACK loss and delay included) per packet loss rate."""
+    total = 100 if args.quick else 500
+    default_loss = sensor_node.PACKET_LOSS_PROB
+    results = {}
+    for loss in args.loss:
+        delivered = set()
+        with udp_listener(lambda payload: delivered.add(payload.get("seq"))) as port, \
+                socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            sock.settimeout(0.5)
+            sensor_node.PACKET_LOSS_PROB = loss
+            sender = sensor_node.SelectiveRepeatSender(sock, ("127.0.0.1", port), rng=random.Random(1))
+            sender.start()
+            started = time.perf_counter()
+            for _ in range(total):
+                sender.send(lambda seq: wire_format.encode_reading(1, 7, seq, time.time()))
+            sender.flush(60)
+            elapsed = time.perf_counter() - started
+            sender.close()
+            sensor_node.PACKET_LOSS_PROB = default_loss
+        results[str(loss)] = {
+            "delivered": len(delivered), "sent": total,
+            "goodput_per_s": round(len(delivered) / elapsed, 1),
+            "retransmitted": sender.stats["retransmitted"], "dropped": sender.stats["dropped"],
+        }
+    return results
+
+
+def bench_api(args):
+    """/counts latency percentiles: one client in sequence, then API_CLIENTS clients at once, keep-alive throughout."""
+    counts = {"right": 3, "down": 1, "left": 4, "up": 1}
+    cache = api_server.SnapshotCache(lambda: {"time": time.time(), "running": True, "counts": counts}).start()
+    port = free_port()
+    server = api_server.make_api_server(api_server.create_app(cache), "127.0.0.1", port)
+    threading.Thread(target=server.serve_forever, daemon=True, name="bench-api").start()
+    url = f"http://127.0.0.1:{port}/counts"
+    requests_per_client = 200 if args.quick else 2000
+
+    def client(samples, etag=False):
+        session = requests.Session()
+        headers = {}
+        for _ in range(requests_per_client):
+            started = time.perf_counter()
+            response = session.get(url, headers=headers, timeout=5)
+            samples.append(time.perf_counter() - started)
+            if etag:
+                headers["If-None-Match"] = response.headers["ETag"]
+        session.close()
+
+    try:
+        results = {}
+        for name, etag in (("sequential", False), ("sequential_etag", True)):
+            samples = []
+            started = time.perf_counter()
+            client(samples, etag)
+            results[name] = {**percentiles(samples), "requests_per_s": round(len(samples) / (time.perf_counter() - started))}
+        samples = []
+        threads = [threading.Thread(target=client, args=(samples,)) for _ in range(API_CLIENTS)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        results[f"concurrent_{API_CLIENTS}"] = {**percentiles(samples),
+                                                "requests_per_s": round(len(samples) / (time.perf_counter() - started))}
+        return results
+    finally:
+        server.shutdown()
+        cache.stop()
+
+
+BENCHMARKS = {
+    "physics": bench_physics,
+    "counts": bench_counts,
+    "scoot": bench_scoot,
+    "listener": bench_listener,
+    "goodput": bench_goodput,
+    "fleet": bench_fleet,
+    "handoff": bench_handoff,
+    "api": bench_api,
+}
+
+
+# === REPORT ===
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def flatten(results, prefix=""):
+    for key, value in results.items():
+        if isinstance(value, dict):
+            yield from flatten(value, f"{prefix}{key}.")
+        elif isinstance(value, (int, float)):
+            yield f"{prefix}{key}", value
+
+
+def compare(results, baseline):
+    """Print every figure that is in both runs with its relative change."""
+    old = dict(flatten(baseline["results"]))
+    print(f"📊 Against {baseline['environment'].get('commit') or 'baseline'} ({baseline['environment'].get('time')}):")
+    for key, value in flatten(results):
+        if old.get(key):
+            print(f"   {key}: {old[key]} → {value} ({100 * (value - old[key]) / old[key]:+.1f}%)")
+
+
+# === MAIN ENTRY ===
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark suite (results as JSON)")
+    parser.add_argument("--only", type=str, default=",".join(BENCHMARKS),
+                        help=f"Comma-separated benchmarks to run (default: {','.join(BENCHMARKS)})")
+    parser.add_argument("--quick", action="store_true", help="Fewer iterations, for a smoke run")
+    parser.add_argument("--loss", type=lambda text: [float(v) for v in text.split(",")], default=list(LOSS_RATES),
+                        help="Comma-separated packet loss rates for the goodput benchmark")
+    parser.add_argument("--out", metavar="PATH", help="Write the results as JSON (default: print them)")
+    parser.add_argument("--baseline", metavar="PATH", help="JSON from an earlier run to compare against")
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.only.split(",") if name.strip()]
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+
+    logging.disable(logging.CRITICAL)       # the listener and sender log every packet to files
+    results = {}
+    for name in names:
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):   # and print most of them too
+            results[name] = BENCHMARKS[name](args)
+        print(f"⏱️ {name}: {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+    report = {"environment": environment(), "results": results}
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Results written to {args.out}")
+    else:
+        print(json.dumps(report, indent=2))
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,15 @@
 import requests, time
 
-url = "http://127.0.0.1:5055/counts"
+from live_stream import iter_events, KEEPALIVE
 
+url = "http://127.0.0.1:5055/stream"
+
+# Print every pushed event (snapshot, counts deltas, phase changes, status) as it arrives
 while True:
     try:
-        data = requests.get(url, timeout=1).json()
-        print(data)
+        with requests.get(url, stream=True, timeout=(1, 2 * KEEPALIVE + 1)) as response:
+            for event, data in iter_events(response.iter_lines(decode_unicode=True)):
+                print(event, data)
     except Exception as e:
         print("Error:", e)
     time.sleep(2)
@@ -0,0 +1,252 @@
+"""
+Headless traffic engine.
+
+Runs the intersection model of simulation.py against a simulated clock:
+no display, no sleeps and no threads. One step() is one animation frame,
+FRAMES_PER_SECOND frames make one simulated second, and the signal
+controller, vehicle spawner and sensor readings fire on that clock.
+"""
+import argparse
+import collections
+import io
+import random
+import time
+
+from event_log import EventLog, KIND_SPAWN, read_log
+from kpi import KpiRecorder, format_report
+from profiling import SamplingProfiler
+from scoot import PLANNERS
+from signal_controller import SCOOT_FORECAST, SCOOT_SMOOTHING_WINDOW, Scheduler, SignalController, default_signals
+from forecast import ArrivalForecaster
+from timeseries import TimeSeriesStore
+from vehicle_store import VehicleStore, vehicleTypes, directionNumbers
+
+
+# === SIMULATED CLOCK ===
+simTime = 300                # simulated seconds per run
+FRAMES_PER_SECOND = 60       # physics steps per simulated second
+SPAWN_INTERVAL = 0.75        # seconds between spawned vehicles
+SENSOR_INTERVAL = 2          # seconds between simulated sensor readings
+
+
+# === ENGINE ===
+class Engine:
+    """
+    One intersection, its signals and its spawner, advanced one frame per step().
+    record is an EventLog that gets every spawn, phase change, sensor reading and SCOOT plan;
+    replay is a list of logged events whose spawns replace the random spawner;
+    smoothing > 0 plans SCOOT from each approach's mean reading over that many seconds;
+    forecast plans it from the queues expected when each approach turns green (forecast.py).
+    """
+
+    def __init__(self, seed=None, sim_time=simTime, scoot=True, scoot_params=None, optimizer="network",
+                 record=None, replay=None, smoothing=SCOOT_SMOOTHING_WINDOW, forecast=SCOOT_FORECAST):
+        self.rng = random.Random(seed)
+        self.log = record
+        self.replaySpawns = None if replay is None else collections.deque(e for e in replay if e[0] == KIND_SPAWN)
+        self.simTime = sim_time
+        self.scoot = scoot
+        self.scoot_params = scoot_params or {}
+        self.plan = PLANNERS[optimizer]
+        self.smoothing = smoothing
+        self.readings = TimeSeriesStore()
+        self.forecast = forecast
+        self.forecaster = ArrivalForecaster(len(directionNumbers))
+
+        self.kpi = KpiRecorder(directionNumbers.values())
+        self.store = VehicleStore(clock=self.now, kpi=self.kpi)
+
+        self.signals = default_signals()
+        self.scheduler = Scheduler(clock=self.now)
+        self.controller = SignalController(self.signals, self.scheduler,
+                                           on_yellow=self.store.reset_stops,
+                                           optimizer=self.apply_scoot_optimization,
+                                           on_phase=self._log_phase if record is not None else None)
+
+        self.pending_sensor_readings = {}
+        self.frame = 0
+        self.timeElapsed = 0
+        self.nextSpawn = 0.0
+        self.controller.start(0.0)
+
+    def now(self):
+        """Simulated seconds since the start of the run."""
+        return self.frame / FRAMES_PER_SECOND
+
+    # --- Spawner (generateVehicles) ---
+    def spawn_vehicle(self):
+        vehicle_type = self.rng.randint(0, 4)
+        lane_number = 0 if vehicle_type == 4 else self.rng.randint(0, 1) + 1
+        will_turn = 1 if lane_number == 2 and self.rng.randint(0, 4) <= 2 else 0
+        direction_number = self.rng.randint(0, 3)
+        return self.add_vehicle(lane_number, vehicle_type, direction_number, will_turn)
+
+    def add_vehicle(self, lane_number, vehicle_type, direction_number, will_turn):
+        if self.log is not None:
+            self.log.spawn(self.now(), lane_number, vehicle_type, direction_number, will_turn)
+        return self.store.add(lane_number, vehicleTypes[vehicle_type], direction_number, will_turn)
+
+    def _replay_spawns(self, now):
+        while self.replaySpawns and self.replaySpawns[0][1] <= now:
+            self.add_vehicle(*self.replaySpawns.popleft()[2:])
+
+    def _log_phase(self, controller):
+        self.log.phase(self.now(), controller.currentGreen, controller.currentYellow)
+
+    def apply_scoot_optimization(self):
+        if self.scoot:
+            plan = self.plan(self.scoot_readings(), self.controller.currentGreen, len(self.signals),
+                             **self.scoot_params)
+            for jid, green in plan.items():
+                self.signals[jid - 1].green = green
+                if self.log is not None:
+                    self.log.plan(self.now(), jid, green)
+        self.pending_sensor_readings.clear()
+
+    def scoot_readings(self):
+        if self.forecast:
+            green = self.controller.currentGreen
+            expected = self.forecaster.predict([0.0 if i == green else self.controller.remaining(i)
+                                                for i in range(len(self.signals))])
+            return {jid: round(float(expected[jid - 1]), 2) for jid in self.pending_sensor_readings}
+        if not self.smoothing:
+            return self.pending_sensor_readings
+        means = self.readings.rolling_mean(self.smoothing, len(self.signals))
+        return {jid: round(float(means[jid - 1]), 2) for jid in self.pending_sensor_readings}
+
+    # --- Sensors (send_simulated_sensor_data) ---
+    def get_vehicle_counts(self):
+        waiting = self.store.waiting_counts()
+        return {direction: waiting[idx] for idx, direction in directionNumbers.items()}
+
+    def _sensor_tick(self):
+        counts = self.get_vehicle_counts()
+        for idx, direction in directionNumbers.items():
+            self.pending_sensor_readings[idx + 1] = counts[direction]
+            self.readings.append(self.now(), idx + 1, counts[direction], green=self.signals[idx].green)
+            self.forecaster.update(idx, self.now(), counts[direction], idx != self.controller.currentGreen)
+            if self.log is not None:
+                self.log.sensor(self.now(), idx + 1, counts[direction])
+
+    # --- Clock ---
+    def step(self):
+        """Advance the simulation by one frame (1 / FRAMES_PER_SECOND simulated seconds)."""
+        if self.frame % FRAMES_PER_SECOND == 0:
+            second = self.frame // FRAMES_PER_SECOND
+            if second % SENSOR_INTERVAL == 0:
+                self._sensor_tick()
+            self.store.retire_offscreen()
+            self.kpi.sample_queues(self.now(), self.store.waiting_counts())
+
+        now = self.now()
+        self.scheduler.run_until(now)
+        if self.replaySpawns is not None:
+            self._replay_spawns(now)
+        while self.replaySpawns is None and self.nextSpawn <= now:
+            self.spawn_vehicle()
+            self.nextSpawn += SPAWN_INTERVAL
+
+        self.store.step(self.controller.currentGreen, self.controller.currentYellow)
+
+        self.frame += 1
+        self.timeElapsed = self.frame // FRAMES_PER_SECOND
+
+    def run(self):
+        """Run until simTime simulated seconds have elapsed and return the end-of-run totals."""
+        while self.timeElapsed < self.simTime:
+            self.step()
+        return self.summary()
+
+    def summary(self):
+        crossed = {direction: int(self.store.crossedCount[idx]) for idx, direction in directionNumbers.items()}
+        green_time = [self.controller.green_time(i) for i in range(len(self.signals))]
+        return {
+            "time_elapsed": self.timeElapsed,
+            "crossed": crossed,
+            "total_vehicles": sum(crossed.values()),
+            "green_time": green_time,
+            "kpi": self.kpi.report(list(crossed.values()), green_time),
+        }
+
+
+# === MAIN ENTRY ===
+ENGINE_OPTIONS = ("seed", "sim_time", "scoot", "scoot_params", "optimizer", "smoothing", "forecast")
+
+
+def replay(path, **overrides):
+    """
+    Run the engine on the spawns logged in path, with the logged options unless overridden.
+    Returns (summary, index of the first event that differs from the log or None, recorded, replayed).
+    """
+    with open(path, "rb") as f:
+        options, recorded = read_log(f.read())
+    # A log from the pygame window also carries options the engine does not take
+    options = {key: value for key, value in options.items() if key in ENGINE_OPTIONS}
+    options.update(overrides)
+    buffer = io.BytesIO()
+    engine = Engine(replay=recorded, record=EventLog(buffer, options), **options)
+    result = engine.run()
+    _, replayed = read_log(buffer.getvalue())
+    diverged = next((i for i, (a, b) in enumerate(zip(recorded, replayed)) if a != b), None)
+    if diverged is None and len(recorded) != len(replayed):
+        diverged = min(len(recorded), len(replayed))
+    return result, diverged, recorded, replayed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless adaptive traffic simulation (simulated clock, no display)")
+    parser.add_argument("--sim-time", type=int, default=None, help="Simulated seconds per run")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed for the vehicle spawner")
+    parser.add_argument("--runs", type=int, default=1, help="Number of back-to-back runs")
+    parser.add_argument("--no-scoot", action="store_true", help="Keep the fixed-time plan (disable SCOOT)")
+    parser.add_argument("--optimizer", choices=sorted(PLANNERS), default=None,
+                        help="SCOOT planner: cycle-constrained network split (default), or the original per-approach greens")
+    parser.add_argument("--smoothing", type=float, default=None,
+                        help="Plan SCOOT from the mean reading over this many seconds (default: latest reading)")
+    parser.add_argument("--reactive", action="store_true",
+                        help="Plan SCOOT from the readings as they are (no arrival forecast)")
+    parser.add_argument("--record", metavar="PATH", help="Write a binary event log of the run")
+    parser.add_argument("--replay", metavar="PATH",
+                        help="Re-run the spawns of a logged run (with its options unless given here) and compare")
+    parser.add_argument("--flamegraph", metavar="PATH", help="Sample the runs and write collapsed stacks here")
+    args = parser.parse_args()
+
+    if args.replay:
+        overrides = {"sim_time": args.sim_time, "optimizer": args.optimizer, "scoot": False if args.no_scoot else None,
+                     "smoothing": args.smoothing, "forecast": False if args.reactive else None}
+        result, diverged, recorded, replayed = replay(args.replay, **{k: v for k, v in overrides.items() if v is not None})
+        print(f"🔁 Replay: {result['total_vehicles']} vehicles passed in {result['time_elapsed']}s simulated")
+        print(format_report(result["kpi"]))
+        if diverged is None:
+            print(f"✅ Identical to the recording, bit for bit ({len(recorded)} events)")
+        else:
+            print(f"↔️ Diverges from the recording at event {diverged} of {len(recorded)}:")
+            print("   recorded:", recorded[diverged] if diverged < len(recorded) else "end of log")
+            print("   replayed:", replayed[diverged] if diverged < len(replayed) else "end of log")
+        return
+
+    if args.record and args.runs != 1:
+        parser.error("--record logs a single run")
+    profiler = SamplingProfiler().start() if args.flamegraph else None
+    for run in range(args.runs):
+        seed = None if args.seed is None else args.seed + run
+        options = {"seed": seed, "sim_time": args.sim_time or simTime, "scoot": not args.no_scoot,
+                   "optimizer": args.optimizer or "network", "smoothing": args.smoothing or SCOOT_SMOOTHING_WINDOW,
+                   "forecast": not args.reactive}
+        log = EventLog(open(args.record, "wb"), options) if args.record else None
+        started = time.perf_counter()
+        result = Engine(record=log, **options).run()
+        elapsed = time.perf_counter() - started
+        if log is not None:
+            log.close()
+        print(f"⏱️ Run {run + 1}: {result['total_vehicles']} vehicles passed in {result['time_elapsed']}s "
+              f"simulated ({elapsed:.3f}s wall)")
+        print(format_report(result["kpi"]))
+    if profiler is not None:
+        profiler.stop()
+        profiler.write(args.flamegraph)
+        print(f"🔥 {profiler.samples} profiler samples written to {args.flamegraph}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Seeded random streams and a compact binary log of a simulation run.
+
+Every subsystem that draws random numbers (the vehicle spawner, the
+listener's simulated ACK loss, a sensor node's simulated packet loss) gets
+its own stream from rng_stream(seed, name), so one subsystem drawing more
+or less often never shifts another's numbers.
+
+A log is a header followed by fixed-layout records. The header holds the
+magic bytes, a version byte, and the run's options as length-prefixed
+JSON. Each record is a kind byte, the simulation time as a double, and
+the kind's fields:
+
+    SPAWN   lane, vehicle type, direction number, will_turn     13 bytes
+    PHASE   current green, current yellow                       11 bytes
+    SENSOR  junction id, vehicles detected                      14 bytes
+    PLAN    junction id, green seconds (one per junction)       12 bytes
+
+A headless run replayed from its own log writes the same bytes again
+(see engine.py --replay).
+"""
+import json
+import random
+import struct
+import threading
+
+
+def rng_stream(seed, name):
+    """Random stream of one subsystem; unseeded (None) streams draw from the OS as before."""
+    return random.Random(None if seed is None else f"{seed}:{name}")
+
+
+# === LOG FORMAT ===
+MAGIC = b"TLOG"
+VERSION = 1
+
+KIND_SPAWN = 1
+KIND_PHASE = 2
+KIND_SENSOR = 3
+KIND_PLAN = 4
+
+HEADER = struct.Struct("!4sBH")          # magic, version, options length
+RECORDS = {
+    KIND_SPAWN: struct.Struct("!BdBBBB"),
+    KIND_PHASE: struct.Struct("!BdBB"),
+    KIND_SENSOR: struct.Struct("!BdBI"),
+    KIND_PLAN: struct.Struct("!BdBH"),
+}
+
+
+class EventLog:
+    """Appends records to a binary stream (a file opened "wb", or io.BytesIO); safe to call from any thread."""
+
+    def __init__(self, stream, options=None):
+        self.stream = stream
+        self.lock = threading.Lock()
+        meta = json.dumps(options or {}, sort_keys=True, separators=(",", ":")).encode()
+        stream.write(HEADER.pack(MAGIC, VERSION, len(meta)) + meta)
+
+    def _write(self, kind, t, *fields):
+        record = RECORDS[kind].pack(kind, t, *fields)
+        with self.lock:
+            self.stream.write(record)
+
+    def spawn(self, t, lane, vehicle_type, direction_number, will_turn):
+        self._write(KIND_SPAWN, t, lane, vehicle_type, direction_number, will_turn)
+
+    def phase(self, t, current_green, current_yellow):
+        self._write(KIND_PHASE, t, current_green, current_yellow)
+
+    def sensor(self, t, junction_id, vehicles):
+        self._write(KIND_SENSOR, t, junction_id, vehicles)
+
+    def plan(self, t, junction_id, green):
+        self._write(KIND_PLAN, t, junction_id, green)
+
+    def flush(self):
+        with self.lock:
+            self.stream.flush()
+
+    def close(self):
+        with self.lock:
+            self.stream.close()
+
+
+def read_log(data):
+    """(options, [(kind, t, *fields), ...]) from the bytes of a log; raises ValueError on a malformed one."""
+    if len(data) < HEADER.size:
+        raise ValueError("log too short")
+    magic, version, length = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"not a version {VERSION} event log")
+    offset = HEADER.size + length
+    options = json.loads(data[HEADER.size:offset])
+    events = []
+    while offset < len(data):
+        record = RECORDS.get(data[offset])
+        if record is None:
+            raise ValueError(f"unknown record kind {data[offset]} at byte {offset}")
+        if offset + record.size > len(data):
+            raise ValueError(f"truncated record at byte {offset}")
+        events.append(record.unpack_from(data, offset))
+        offset += record.size
+    return options, events
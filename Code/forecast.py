@@ -0,0 +1,60 @@
+"""
+Online demand forecasts for the SCOOT planner.
+
+A plan made from the latest readings sizes every green for the queue as it
+stands now. An approach is served only when its turn comes, though, and
+until then its queue keeps growing. ArrivalForecaster learns each
+approach's arrival rate from its queue growth between readings taken
+while it was red, when no vehicle can leave. The rate is an EWMA of that
+growth divided by an EWMA of the time between the readings, so closely
+spaced readings from several sources count for no more than the time
+they cover. Each reading updates it in O(1). predict(waits) adds the arrivals expected
+before each approach's green to its latest queue.
+
+The expected queues are scaled back to the total of the measured ones.
+The planner's cycle length follows the total demand, so the forecast
+changes how the cycle is split but never stretches it.
+"""
+import numpy as np
+
+
+# === FORECAST SETTINGS ===
+FORECAST_ALPHA = 0.1         # weight of a new sample in the growth and elapsed-time EWMAs
+
+
+class ArrivalForecaster:
+    """EWMA arrival rate (vehicles per second) and latest queue of every approach."""
+
+    def __init__(self, approaches, alpha=FORECAST_ALPHA):
+        self.alpha = alpha
+        self.queue = np.full(approaches, np.nan)
+        self.growth = np.zeros(approaches)           # EWMA of the queue growth between red readings
+        self.elapsed = np.zeros(approaches)          # EWMA of the seconds between them
+        self.last = np.zeros(approaches)            # time of each approach's last reading
+        self.red = np.zeros(approaches, dtype=bool)  # whether it was red at that reading
+
+    def update(self, approach, t, queue, red):
+        """Fold in one reading: the queue of a 0-based approach at time t, and whether it is red."""
+        dt = t - self.last[approach]
+        if red and self.red[approach] and dt > 0 and not np.isnan(self.queue[approach]):
+            self.growth[approach] += self.alpha * (queue - self.queue[approach] - self.growth[approach])
+            self.elapsed[approach] += self.alpha * (dt - self.elapsed[approach])
+        self.queue[approach] = queue
+        self.last[approach] = t
+        self.red[approach] = red
+
+    @property
+    def rate(self):
+        """Arrivals per second of every approach (0 until it has been read twice on red)."""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(self.elapsed > 0, np.maximum(0.0, self.growth / self.elapsed), 0.0)
+
+    def predict(self, waits):
+        """
+        Expected queue of every approach after waits[i] more seconds of arrivals,
+        scaled to the total of the latest queues (approaches never read count as empty).
+        """
+        queue = np.nan_to_num(self.queue)
+        expected = queue + self.rate * np.asarray(waits, dtype=float)
+        total = expected.sum()
+        return expected * (queue.sum() / total) if total > 0 else expected
@@ -0,0 +1,135 @@
+"""
+Sensor reading admission: duplicates, ordering and staleness.
+
+The same junction is reported by several sources. Sensor nodes send
+WINDOW_SIZE packets per reading and retransmit them, and the simulation
+sends its own frames to the same port. ReadingFilter decides which
+readings reach the controller:
+
+    duplicate     the same timestamp (and seq, if any) as that source's last
+                  reading of the junction
+    out of order  older than that source's newest reading of the junction
+                  (a late packet)
+    superseded    older than the newest reading of the junction from any
+                  source: sources merge by timestamp, newest wins
+    stale         taken more than `horizon` seconds ago
+
+A source is the sender's socket address. The listener adds it to the
+payload as "source" (see network_listener.py). One socket can carry
+several senders: sensor_fleet.py puts up to 64 nodes on each, and they
+interleave their seqs (node k sends k, k + 64, ...). A socket's seqs
+therefore arrive out of order even with no loss, so readings are ordered
+by timestamp. Seq orders only readings without a timestamp, and those
+with neither are always let through. The listener's ReceiveWindow has
+already dropped retransmitted copies by seq.
+
+Admitted readings reach the signal controller through a ReadingBuffer.
+The ingest thread writes into the back buffer. At plan time the
+controller swaps in an empty one and reads what it took. Neither side
+takes a lock, so neither waits while the other works. This is not
+lock-free in the hardware sense. It is correct because CPython's GIL
+makes each dict store and each attribute rebind atomic, and because
+there is exactly one writer and one swapper. The one interleaving that
+could lose a reading is a swap between the writer's load of `back` and
+its store. The writer re-reads `back` after each store and writes again
+if it changed. That retry has not fired in any run so far, but its count
+is kept in stats, with coalesced writes and the age of the data at each
+swap.
+"""
+import collections
+import time
+
+
+# === INGEST SETTINGS ===
+STALE_AFTER = 20.0           # seconds: two SCOOT updates, the longest a good reading waits in the queue
+MAX_SOURCES = 4096           # (source, junction) pairs remembered (oldest forgotten first)
+
+
+class ReadingFilter:
+    """Admits each sensor reading at most once, in order and fresh; meant for the one thread that drains them."""
+
+    def __init__(self, horizon=STALE_AFTER, clock=time.time):
+        self.horizon = horizon
+        self.clock = clock
+        self.sources = collections.OrderedDict()   # (source, junction) -> [last seq, last timestamp]
+        self.newest = {}                           # junction -> newest accepted timestamp, any source
+        # invalid (malformed or out of range) and failed (raised while stored) are counted by the caller
+        self.stats = {"accepted": 0, "duplicate": 0, "out_of_order": 0, "superseded": 0, "stale": 0,
+                      "invalid": 0, "failed": 0}
+
+    def _reject(self, reason):
+        self.stats[reason] += 1
+        return False
+
+    def accept(self, junction, seq=None, timestamp=None, source=None):
+        """True when the reading should be applied; otherwise counts why not and returns False."""
+        if timestamp is not None and self.clock() - timestamp > self.horizon:
+            return self._reject("stale")
+
+        key = (source, junction)
+        last = self.sources.get(key)
+        if last is None:
+            if len(self.sources) >= MAX_SOURCES:
+                self.sources.popitem(last=False)
+            last = self.sources[key] = [None, None]
+        else:
+            self.sources.move_to_end(key)
+        last_seq, last_time = last
+        if timestamp is not None:
+            if last_time is not None:
+                if timestamp < last_time:
+                    return self._reject("out_of_order")
+                if timestamp == last_time and (seq is None or seq == last_seq):
+                    return self._reject("duplicate")
+        elif seq is not None and last_seq is not None:
+            if seq == last_seq:
+                return self._reject("duplicate")
+            if seq < last_seq:
+                return self._reject("out_of_order")
+
+        last[0] = seq if seq is not None else last_seq
+        last[1] = timestamp if timestamp is not None else last_time
+
+        if timestamp is not None:
+            newest = self.newest.get(junction)
+            if newest is not None and timestamp < newest:
+                return self._reject("superseded")
+            self.newest[junction] = timestamp
+        self.stats["accepted"] += 1
+        return True
+
+
+class ReadingBuffer:
+    """Double buffer of the latest value per key: one thread write()s, another swap()s; no locks (relies on the GIL)."""
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.back = {}       # key -> (value, written at)
+        self.stats = {"writes": 0, "coalesced": 0, "retries": 0, "swaps": 0, "empty_swaps": 0,
+                      "last_age": 0.0, "max_age": 0.0}
+
+    def write(self, key, value):
+        entry = (value, self.clock())
+        back = self.back
+        if key in back:
+            self.stats["coalesced"] += 1
+        back[key] = entry
+        # A swap between the load and the store may have taken `back` before our entry landed in it
+        while self.back is not back:
+            self.stats["retries"] += 1
+            back = self.back
+            back[key] = entry
+        self.stats["writes"] += 1
+
+    def swap(self):
+        """{key: value} written since the last swap, newest value per key."""
+        front, self.back = self.back, {}
+        stats = self.stats
+        stats["swaps"] += 1
+        if not front:
+            stats["empty_swaps"] += 1
+            return {}
+        age = self.clock() - min(written for _, written in front.values())
+        stats["last_age"] = round(age, 3)
+        stats["max_age"] = max(stats["max_age"], stats["last_age"])
+        return {key: value for key, (value, _) in front.items()}
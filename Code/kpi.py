@@ -0,0 +1,105 @@
+"""
+Traffic KPIs per approach: delay, stops, queue length and throughput.
+
+The vehicle store stamps every vehicle as it goes. It records spawn time,
+when it first stops in a queue, its crossing time, and its exit time,
+plus its delay (time to the stop line less free-flow time) and how many
+times it stopped. When the vehicle leaves the screen its record moves into a
+preallocated ring buffer. Queue lengths are sampled into a second ring
+once a second. Both rings are allocated once and overwrite their oldest
+entries, so recording costs a few array writes and memory never grows
+with the length of a run.
+"""
+import threading
+
+import numpy as np
+
+
+# === KPI SETTINGS ===
+VEHICLE_HISTORY = 8192       # finished vehicles kept for the averages
+QUEUE_HISTORY = 3600         # queue samples kept (an hour at one per second)
+
+VEHICLE_RECORD = np.dtype([
+    ("approach", np.int32),
+    ("born", np.float64),        # spawned
+    ("queued", np.float64),      # first stopped behind the stop line (NaN if it never stopped)
+    ("crossed", np.float64),     # crossed the stop line
+    ("exited", np.float64),      # left the screen
+    ("delay", np.float64),       # seconds to the stop line beyond free-flow time
+    ("stops", np.int32),         # halts after STOP_RELEASE seconds of driving (vehicle_store.py)
+])
+
+
+class Ring:
+    """Fixed-capacity circular buffer of NumPy records; extend() overwrites the oldest once full."""
+
+    def __init__(self, capacity, dtype):
+        self.data = np.zeros(capacity, dtype=dtype)
+        self.capacity = capacity
+        self.next = 0
+        self.size = 0
+
+    def extend(self, records):
+        records = records[-self.capacity:]
+        k = len(records)
+        index = (self.next + np.arange(k)) % self.capacity
+        self.data[index] = records
+        self.next = (self.next + k) % self.capacity
+        self.size = min(self.size + k, self.capacity)
+
+    def filled(self):
+        """The records held, in no particular order."""
+        return self.data[:self.size]
+
+
+class KpiRecorder:
+    """Rings of finished vehicles and queue samples for the named approaches, aggregated by report()."""
+
+    def __init__(self, approaches, vehicles=VEHICLE_HISTORY, samples=QUEUE_HISTORY):
+        self.approaches = list(approaches)
+        self.lock = threading.Lock()
+        self.vehicles = Ring(vehicles, VEHICLE_RECORD)
+        self.queues = Ring(samples, np.dtype([("time", np.float64), ("queue", np.int32, (len(self.approaches),))]))
+
+    def record_vehicles(self, records):
+        """Add finished vehicles (a VEHICLE_RECORD array)."""
+        with self.lock:
+            self.vehicles.extend(records)
+
+    def sample_queues(self, t, queue):
+        """Add one sample of the vehicles waiting on every approach."""
+        record = np.zeros(1, dtype=self.queues.data.dtype)
+        record["time"], record["queue"] = t, queue
+        with self.lock:
+            self.queues.extend(record)
+
+    def report(self, crossed=None, green_time=None):
+        """
+        {approach: {vehicles, avg_delay, avg_stops, p95_queue, throughput_per_green_hour}}.
+        crossed and green_time (seconds) per approach give the throughput; without them it is left out.
+        """
+        with self.lock:
+            vehicles = self.vehicles.filled().copy()
+            queues = self.queues.filled()["queue"].copy()
+        report = {}
+        for a, name in enumerate(self.approaches):
+            mine = vehicles[vehicles["approach"] == a]
+            kpis = {
+                "vehicles": int(len(mine)),
+                "avg_delay": round(float(mine["delay"].mean()), 2) if len(mine) else 0.0,
+                "avg_stops": round(float(mine["stops"].mean()), 2) if len(mine) else 0.0,
+                "p95_queue": round(float(np.percentile(queues[:, a], 95)), 2) if len(queues) else 0.0,
+            }
+            if crossed is not None and green_time is not None:
+                kpis["throughput_per_green_hour"] = round(3600 * crossed[a] / green_time[a], 1) if green_time[a] else 0.0
+            report[name] = kpis
+        return report
+
+
+def format_report(report):
+    """Console table of a report(), one line per approach."""
+    lines = [f"{'approach':>10} {'vehicles':>9} {'delay s':>8} {'stops':>6} {'p95 queue':>10} {'veh/green h':>12}"]
+    for name, kpis in report.items():
+        lines.append(f"{name:>10} {kpis['vehicles']:>9} {kpis['avg_delay']:>8.2f} {kpis['avg_stops']:>6.2f} "
+                     f"{kpis['p95_queue']:>10.1f} {kpis.get('throughput_per_green_hour', 0):>12.1f}")
+    return "\n".join(lines)
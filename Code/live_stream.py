@@ -0,0 +1,93 @@
+"""
+Server-Sent Events fan-out for live counts and signal phases.
+
+Publishers (the vehicle store and the signal controller) encode each event
+once into a shared ring of recent events. Every subscriber streams the same
+bytes from that ring, so the cost of an event does not grow with the number
+of subscribers. A new subscriber, or one that fell further behind than the
+ring reaches, first gets a "snapshot" event with the full current state.
+Event ids are "<epoch>-<n>", with an epoch taken from the start time of
+each Broadcaster. A client that reconnects with a Last-Event-ID from
+another run (or one it made up) gets a snapshot too, however its n
+compares with the current run's.
+"""
+import collections
+import itertools
+import json
+import threading
+import time
+
+
+# === STREAM SETTINGS ===
+HISTORY = 1024           # events kept for subscribers that are catching up
+KEEPALIVE = 15.0         # seconds of silence before a comment line keeps proxies from closing the stream
+
+
+def encode_event(event_id, event, data):
+    """One SSE event; event_id is the full "<epoch>-<n>" string."""
+    return f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n".encode()
+
+
+class Broadcaster:
+    """Shared event ring; publish() from any thread, stream() once per subscriber."""
+
+    def __init__(self, history=HISTORY, epoch=None):
+        self.epoch = epoch or format(time.time_ns(), "x")  # prefix of this run's event ids
+        self._cond = threading.Condition()
+        self._events = collections.deque(maxlen=history)   # (id, encoded event), ids consecutive
+        self._lastId = 0
+        self._state = {}                                    # event name -> full current state
+
+    def publish(self, event, data, state=None):
+        """Send data to every subscriber; state (default: data) is what a snapshot shows for this event."""
+        with self._cond:
+            self._lastId += 1
+            self._state[event] = data if state is None else state
+            self._events.append((self._lastId, encode_event(f"{self.epoch}-{self._lastId}", event, data)))
+            self._cond.notify_all()
+
+    def snapshot(self):
+        """(last event id, {event: state}) as of now."""
+        with self._cond:
+            return f"{self.epoch}-{self._lastId}", dict(self._state)
+
+    def _event_number(self, event_id):
+        """n of an "<epoch>-<n>" id from this run, or None for any other id."""
+        epoch, _, n = (event_id or "").rpartition("-")
+        if epoch != self.epoch or not n.isdigit():
+            return None
+        n = int(n)
+        return n if n <= self._lastId else None
+
+    def stream(self, last_event_id=None, keepalive=KEEPALIVE):
+        """Yield encoded SSE chunks forever, starting after last_event_id (the client's Last-Event-ID)."""
+        last_id = self._event_number(last_event_id)   # None: start as a new subscriber
+        while True:
+            with self._cond:
+                if last_id is not None and last_id >= self._lastId:
+                    self._cond.wait(keepalive)
+                if last_id is not None and last_id >= self._lastId:
+                    chunk = b": keepalive\n\n"
+                elif last_id is None or not self._events or last_id < self._events[0][0] - 1:
+                    # New or too far behind: start over from the full state
+                    last_id = self._lastId
+                    chunk = encode_event(f"{self.epoch}-{last_id}", "snapshot", self._state)
+                else:
+                    start = last_id - self._events[0][0] + 1
+                    chunk = b"".join(encoded for _, encoded in itertools.islice(self._events, start, None))
+                    last_id = self._lastId
+            yield chunk
+
+
+def iter_events(lines):
+    """Parse decoded SSE lines (e.g. response.iter_lines(decode_unicode=True)) into (event, data) pairs."""
+    event, data = "message", []
+    for line in lines:
+        if not line:
+            if data:
+                yield event, json.loads("\n".join(data))
+            event, data = "message", []
+        elif line.startswith("event:"):
+            event = line[6:].strip()
+        elif line.startswith("data:"):
+            data.append(line[5:].strip())
@@ -0,0 +1,196 @@
+"""
+Asynchronous, batched log files for the packet paths.
+
+setup_logging() gives the root logger a BatchingHandler. Its emit() only
+queues the record. A writer thread wakes on the first record,
+lets more gather for FLUSH_INTERVAL and formats up to BATCH_SIZE of them.
+It writes the batch with one call and rotates the file before a line
+would take it past max_bytes, counted in UTF-8 bytes since the lines
+carry emoji. With json_lines=True every record is one JSON object,
+including any extra={...} fields given at the call site, instead of a
+"time [LEVEL] message" line.
+
+A PacketLog decides whether a per-packet line is printed and logged
+(sent, received, ACKed, lost, retransmitted) before the line is even
+formatted. It skips every line below its level. Of the INFO lines it
+keeps about one packet in `every`. The choice is a hash of the packet's
+seq, so every line of a packet (received, ACKed) is kept or skipped
+together, in any thread, without a shared counter. Lines without a seq
+take the next number of an itertools.count() instead.
+"""
+import itertools
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+
+# === LOGGING SETTINGS ===
+LINE_FORMAT = "%(asctime)s [%(levelname)s] %(message)s"
+BATCH_SIZE = 512             # most records written by one write() call
+FLUSH_INTERVAL = 0.5         # seconds the writer lets records gather before a write
+MAX_BYTES = 10 * 1024 * 1024 # rotate the log file past this size
+BACKUPS = 3                  # rotated files kept (name.1 … name.N)
+
+# Attributes every LogRecord has; anything else on a record came in through extra={...}
+_RECORD_FIELDS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: time, level, logger, thread, message and the record's extra fields."""
+
+    def format(self, record):
+        entry = {
+            "time": round(record.created, 6),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class BatchingHandler(logging.Handler):
+    """File handler whose emit() only enqueues; a writer thread formats, writes and rotates in batches."""
+
+    def __init__(self, filename, max_bytes=MAX_BYTES, backups=BACKUPS):
+        super().__init__()
+        self.filename = os.path.abspath(filename)
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.queue = queue.SimpleQueue()
+        self.file = open(self.filename, "ab")   # binary, so size counts the UTF-8 bytes of emoji lines
+        self.size = self.file.tell()
+        self.stats = {"records": 0, "batches": 0, "rotations": 0}
+        self.writer = threading.Thread(target=self._write_batches, daemon=True, name="log-writer")
+        self.writer.start()
+
+    def emit(self, record):
+        self.queue.put(record)
+
+    def flush(self, timeout=2.0):
+        """Wait until everything queued so far is on disk."""
+        if self.writer.is_alive():
+            written = threading.Event()
+            self.queue.put(written)
+            written.wait(timeout)
+
+    def close(self):
+        if self.writer.is_alive():
+            self.queue.put(None)
+            self.writer.join(2.0)
+        self.file.close()
+        super().close()
+
+    def _write_batches(self):
+        while True:
+            batch = [self.queue.get()]
+            if isinstance(batch[0], logging.LogRecord) and self.queue.qsize() < BATCH_SIZE:
+                time.sleep(FLUSH_INTERVAL)       # let a batch gather instead of waking per record
+            while len(batch) < BATCH_SIZE and batch[-1] is not None:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._write([item for item in batch if isinstance(item, logging.LogRecord)])
+            for item in batch:
+                if isinstance(item, threading.Event):
+                    item.set()
+            if batch[-1] is None:
+                return
+
+    def _write(self, records):
+        if not records:
+            return
+        lines = []
+        for record in records:
+            try:
+                lines.append((self.format(record) + "\n").encode("utf-8"))
+            except Exception:
+                self.handleError(record)
+        # One write per file: the batch is split where a line would take the file past max_bytes (in bytes)
+        chunk, chunkSize = [], 0
+        for data in lines:
+            if self.size + chunkSize + len(data) > self.max_bytes and (self.size or chunkSize):
+                self.file.write(b"".join(chunk))
+                self._rotate()
+                chunk, chunkSize = [], 0
+            chunk.append(data)
+            chunkSize += len(data)
+        self.file.write(b"".join(chunk))
+        self.file.flush()
+        self.size += chunkSize
+        self.stats["records"] += len(records)
+        self.stats["batches"] += 1
+
+    def _rotate(self):
+        self.file.close()
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.filename}.{i}"):
+                os.replace(f"{self.filename}.{i}", f"{self.filename}.{i + 1}")
+        if self.backups:
+            os.replace(self.filename, f"{self.filename}.1")
+        self.file = open(self.filename, "wb")
+        self.size = 0
+        self.stats["rotations"] += 1
+
+
+def setup_logging(filename, level=logging.INFO, json_lines=False, max_bytes=MAX_BYTES, backups=BACKUPS, force=False):
+    """
+    Log the root logger to filename through a BatchingHandler.
+    Like logging.basicConfig, a second call changes nothing unless force=True.
+    """
+    root = logging.getLogger()
+    existing = [handler for handler in root.handlers if isinstance(handler, BatchingHandler)]
+    if existing and not force:
+        return existing[0]
+    for handler in existing:
+        root.removeHandler(handler)
+        handler.close()
+    handler = BatchingHandler(filename, max_bytes, backups)
+    handler.setFormatter(JsonFormatter() if json_lines else logging.Formatter(LINE_FORMAT))
+    root.addHandler(handler)
+    root.setLevel(level)
+    return handler
+
+
+class PacketLog:
+    """Gate for per-packet lines: nothing below level, and about one packet (by seq) in every for INFO lines."""
+
+    def __init__(self, every=1, level=logging.INFO):
+        self.every = every
+        self.level = level
+        self.counter = itertools.count(1)   # numbers lines without a seq; next() is atomic under the GIL
+
+    def __call__(self, level=logging.INFO, seq=None):
+        if level < self.level:
+            return False
+        if level >= logging.WARNING or self.every <= 1:
+            return True
+        n = seq if isinstance(seq, int) else next(self.counter)
+        # Fibonacci hash, compared on its high bits: seqs interleaved by a fleet socket (k, k + 64, ...) still spread evenly
+        return (n * 2654435761) % 4294967296 < 4294967296 // self.every
+
+
+# === COMMAND LINE ===
+def add_logging_arguments(parser):
+    parser.add_argument("--log-every", type=int, default=1, metavar="N",
+                        help="Print and log about one packet in N, all of its lines (warnings and errors are always kept)")
+    parser.add_argument("--log-level", choices=["DEBUG", "INFO", "WARNING", "ERROR"], default="INFO",
+                        help="Skip per-packet lines below this level")
+    parser.add_argument("--log-json", action="store_true", help="Write the log file as JSON lines")
+
+
+def apply_logging_arguments(args, filename, packet_log):
+    """Reconfigure the log file and packet_log from add_logging_arguments' options."""
+    level = getattr(logging, args.log_level)
+    packet_log.every, packet_log.level = max(1, args.log_every), level
+    if args.log_json:
+        setup_logging(filename, json_lines=True, force=True)
@@ -0,0 +1,272 @@
+"""
+Grid and corridor networks of intersections.
+
+Every junction is an Intersection with its own signals and controller, laid
+out on a rows x cols grid. All junctions share one VehicleStore and one
+Scheduler, so one step() moves every vehicle in the network with a single
+batched update and fires every junction's phase changes from one heap. A
+vehicle that drives off a junction's screen towards a neighbouring junction
+enters the neighbour's matching approach link_time seconds later; one that
+drives off the edge of the grid leaves the network.
+"""
+import argparse
+import heapq
+import random
+import time
+
+import numpy as np
+
+from engine import simTime, FRAMES_PER_SECOND, SPAWN_INTERVAL
+from scoot import network_offsets, plan_network
+from signal_controller import SCOOT_UPDATE_INTERVAL, Scheduler, SignalController, default_signals
+from vehicle_store import VehicleStore, vehicleTypes, vehicleSizes, directionNumbers, turnsInto, speeds, screenWidth
+
+
+# === NETWORK SETTINGS ===
+LINK_TRAVEL_TIME = 5.0       # seconds on the road between one junction's screen and the next
+
+# (row, col) step of a vehicle leaving a junction in each direction number
+_STEP = {0: (0, 1), 1: (1, 0), 2: (0, -1), 3: (-1, 0)}
+_DIRECTION_INDEX = {direction: i for i, direction in directionNumbers.items()}
+_TURN_INTO = np.array([_DIRECTION_INDEX[turnsInto[directionNumbers[i]]] for i in range(4)], dtype=np.int64)
+_SIZE_CLASSES = [vehicleClass for (_, vehicleClass) in vehicleSizes]   # store.sizeKey -> vehicle class
+
+
+def junction_rng(seed, index):
+    """
+    Spawner of one junction. No junction's draws depend on another's, so a shard
+    of the network draws what the whole network would; junction 0 draws what Engine(seed) does.
+    """
+    return random.Random(seed if index == 0 or seed is None else f"{seed}:{index}")
+
+
+# === INTERSECTION ===
+class Intersection:
+    """One junction of a Network: its signals, a controller on the network's scheduler, and its links."""
+
+    def __init__(self, network, index, local):
+        self.network = network
+        self.index = index              # position in the whole grid, row-major
+        self.local = local              # position in this process's store
+        self.row, self.col = divmod(index, network.cols)
+        self.rng = junction_rng(network.seed, index)
+        self.spawned = 0
+        self.signals = default_signals()
+        self.controller = SignalController(self.signals, network.scheduler,
+                                           on_yellow=self.reset_stops, on_phase=self._phase_changed)
+        self.downstream = [-1] * 4      # junction a vehicle leaving in direction d drives into, -1 off the grid
+        self.fed = [False] * 4          # approach d is fed by a neighbour, not by the spawner
+        for d, (dr, dc) in _STEP.items():
+            self.downstream[d] = network.junction_at(self.row + dr, self.col + dc)
+            self.fed[d] = network.junction_at(self.row - dr, self.col - dc) >= 0
+
+    def reset_stops(self, direction_number):
+        self.network.store.reset_stops(direction_number, self.local)
+
+    def _phase_changed(self, controller):
+        self.network.currentGreen[self.local] = controller.currentGreen
+        self.network.currentYellow[self.local] = controller.currentYellow
+
+    def waiting_counts(self):
+        return self.network.store.waiting_counts(self.local)
+
+    def crossed(self):
+        return tuple(self.network.store.crossedCount[4 * self.local:4 * self.local + 4].tolist())
+
+
+# === NETWORK ===
+class Network:
+    """
+    rows x cols junctions advanced together, one frame per step().
+    owned (default: all) restricts this process to some of the junctions: vehicles
+    bound for the others collect in outbox, and receive() takes the ones bound here.
+    planner(readings) -> greens replaces the local SCOOT plan (see plan_greens).
+    """
+
+    def __init__(self, rows=1, cols=1, seed=None, sim_time=simTime, scoot=True, scoot_params=None,
+                 green_wave=False, link_time=LINK_TRAVEL_TIME, owned=None, planner=None):
+        self.rows, self.cols = rows, cols
+        self.seed = seed
+        self.simTime = sim_time
+        self.scoot = scoot
+        self.scoot_params = scoot_params or {}
+        self.greenWave = green_wave
+        self.linkTime = link_time
+        self.linkFrames = round(link_time * FRAMES_PER_SECOND)
+        self.planner = planner or self.plan_greens
+        self.frame = 0
+        self.timeElapsed = 0
+        self.nextSpawn = 0.0
+
+        owned = list(range(rows * cols) if owned is None else owned)
+        self.scheduler = Scheduler(clock=self.now)
+        self.store = VehicleStore(junctions=len(owned))
+        self.currentGreen = np.zeros(len(owned), dtype=np.int64)
+        self.currentYellow = np.zeros(len(owned), dtype=np.int64)
+        self.junctions = [Intersection(self, index, local) for local, index in enumerate(owned)]
+        self.byIndex = {junction.index: junction for junction in self.junctions}
+
+        self.riders = {}             # store row -> (vehicle id, frame it entered the network)
+        self.arrivals = []           # heap of vehicles on links into this process's junctions
+        self.outbox = []             # vehicles on links into other processes' junctions
+        self.entered = self.exited = 0
+        self.journeyFrames = 0
+
+        # Each controller starts part-way into its cycle, so signal 0 turns green at its offset
+        cycle = sum(signal.green + signal.yellow for signal in self.junctions[0].signals)
+        offsets = self.green_wave_offsets(cycle) if green_wave else np.zeros(rows * cols)
+        for junction in self.junctions:
+            junction.controller.start(-((cycle - offsets[junction.index]) % cycle))
+        self.scheduler.run_until(0.0)
+        for junction in self.junctions:
+            for signal in junction.signals:
+                signal.totalGreenTime = 0
+
+    def now(self):
+        """Simulated seconds since the start of the run."""
+        return self.frame / FRAMES_PER_SECOND
+
+    def junction_at(self, row, col):
+        """Grid index of the junction at (row, col), or -1 off the grid."""
+        return row * self.cols + col if 0 <= row < self.rows and 0 <= col < self.cols else -1
+
+    def green_wave_offsets(self, cycle):
+        """Offsets of every grid junction that carry an eastbound (direction 0) platoon along each row at car speed."""
+        upstream = [index - 1 if index % self.cols else -1 for index in range(self.rows * self.cols)]
+        travel = self.linkTime + screenWidth / (speeds['car'] * FRAMES_PER_SECOND)
+        return network_offsets(upstream, travel, cycle)
+
+    # --- SCOOT, every junction in one plan ---
+    def plan_greens(self, readings):
+        """(junctions, 4) waiting counts -> (junctions, 4) green seconds."""
+        return plan_network(readings, common_cycle=self.greenWave, **self.scoot_params).greens
+
+    def apply_scoot_optimization(self):
+        readings = self.store.waiting.reshape(-1, 4, 3).sum(axis=2)
+        for junction, greens in zip(self.junctions, self.planner(readings).tolist()):
+            for i, signal in enumerate(junction.signals):
+                if i != junction.controller.currentGreen:
+                    signal.green = int(greens[i])
+
+    # --- Vehicles in, between and out ---
+    def spawn_vehicles(self):
+        """One spawner draw per junction; draws for approaches fed by a neighbour are dropped."""
+        for junction in self.junctions:
+            rng = junction.rng
+            vehicle_type = rng.randint(0, 4)
+            lane_number = 0 if vehicle_type == 4 else rng.randint(0, 1) + 1
+            will_turn = 1 if lane_number == 2 and rng.randint(0, 4) <= 2 else 0
+            direction_number = rng.randint(0, 3)
+            if not junction.fed[direction_number]:
+                self.entered += 1
+                junction.spawned += 1
+                row = self.store.add(lane_number, vehicleTypes[vehicle_type], direction_number, will_turn,
+                                     junction.local)
+                self.riders[row] = ((junction.index, junction.spawned), self.frame)
+
+    def receive(self, vehicles):
+        """Queue vehicles from another process's outbox on their links."""
+        for vehicle in vehicles:
+            heapq.heappush(self.arrivals, vehicle)
+
+    def _arrive(self):
+        # Heap order (due frame, junction, direction, lane, vehicle id) does not depend on which
+        # process a vehicle came from, so every partition of the grid adds them in the same order
+        while self.arrivals and self.arrivals[0][0] <= self.frame:
+            _, index, direction_number, lane_number, vehicle_id, vehicleClass, born = heapq.heappop(self.arrivals)
+            junction = self.byIndex[index]
+            will_turn = 1 if lane_number == 2 and junction.rng.randint(0, 4) <= 2 else 0
+            row = self.store.add(lane_number, vehicleClass, direction_number, will_turn, junction.local)
+            self.riders[row] = (vehicle_id, born)
+
+    def retire_vehicles(self):
+        """Hand vehicles that left a junction's screen to the next junction, or out of the network."""
+        store = self.store
+        gone = store.retire_offscreen()
+        if gone.size == 0:
+            return
+        direction = store.direction[gone]
+        leaving = np.where(store.turned[gone], _TURN_INTO[direction], direction)
+        due = self.frame + self.linkFrames
+        for row, local, d, lane, key in zip(gone.tolist(), store.junction[gone].tolist(), leaving.tolist(),
+                                            store.lane[gone].tolist(), store.sizeKey[gone].tolist()):
+            vehicle_id, born = self.riders.pop(row)
+            nxt = self.junctions[local].downstream[d]
+            if nxt < 0:
+                self.exited += 1
+                self.journeyFrames += self.frame - born
+                continue
+            vehicle = (due, nxt, d, lane, vehicle_id, _SIZE_CLASSES[key], born)
+            if nxt in self.byIndex:
+                heapq.heappush(self.arrivals, vehicle)
+            else:
+                self.outbox.append(vehicle)
+
+    # --- Clock ---
+    def step(self):
+        """Advance every junction by one frame (1 / FRAMES_PER_SECOND simulated seconds)."""
+        if self.frame % FRAMES_PER_SECOND == 0:
+            self.retire_vehicles()
+            if self.scoot and self.frame and self.timeElapsed % SCOOT_UPDATE_INTERVAL == 0:
+                self.apply_scoot_optimization()
+
+        now = self.now()
+        self.scheduler.run_until(now)
+        self._arrive()
+        while self.nextSpawn <= now:
+            self.spawn_vehicles()
+            self.nextSpawn += SPAWN_INTERVAL
+
+        self.store.step(self.currentGreen, self.currentYellow)
+
+        self.frame += 1
+        self.timeElapsed = self.frame // FRAMES_PER_SECOND
+
+    def run(self):
+        """Run until simTime simulated seconds have elapsed and return the end-of-run totals."""
+        while self.timeElapsed < self.simTime:
+            self.step()
+        return self.summary()
+
+    def summary(self):
+        return {
+            "time_elapsed": self.timeElapsed,
+            "junctions": len(self.junctions),
+            "entered": self.entered,
+            "exited": self.exited,
+            "in_network": self.entered - self.exited,
+            "crossed": int(self.store.crossedCount.sum()),
+            "mean_journey": self.journeyFrames / FRAMES_PER_SECOND / self.exited if self.exited else 0.0,
+        }
+
+
+# === MAIN ENTRY ===
+def main():
+    parser = argparse.ArgumentParser(description="Headless grid/corridor network of intersections")
+    parser.add_argument("--rows", type=int, default=1, help="Junction rows")
+    parser.add_argument("--cols", type=int, default=4, help="Junction columns (1 x N is a corridor)")
+    parser.add_argument("--sim-time", type=int, default=simTime, help="Simulated seconds per run")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed for the vehicle spawners")
+    parser.add_argument("--link-time", type=float, default=LINK_TRAVEL_TIME, help="Seconds between neighbouring junctions")
+    parser.add_argument("--no-scoot", action="store_true", help="Keep the fixed-time plan (disable SCOOT)")
+    parser.add_argument("--green-wave", action="store_true",
+                        help="Offset the junctions for eastbound progression and give them a common SCOOT cycle")
+    parser.add_argument("--scale", type=str, default=None,
+                        help="Comma-separated junction counts: time a 1 x N corridor of each size instead")
+    args = parser.parse_args()
+
+    layouts = [(1, int(n)) for n in args.scale.split(",")] if args.scale else [(args.rows, args.cols)]
+    for rows, cols in layouts:
+        started = time.perf_counter()
+        result = Network(rows, cols, seed=args.seed, sim_time=args.sim_time, scoot=not args.no_scoot,
+                         green_wave=args.green_wave, link_time=args.link_time).run()
+        elapsed = time.perf_counter() - started
+        frames = result["time_elapsed"] * FRAMES_PER_SECOND
+        print(f"🚦 {rows}x{cols}: {result['junctions']} junctions, {result['exited']} of {result['entered']} vehicles "
+              f"through (mean journey {result['mean_journey']:.1f}s), {result['crossed']} stop-line crossings")
+        print(f"⏱️ {elapsed:.2f}s wall for {result['time_elapsed']}s simulated "
+              f"({1000 * elapsed / frames:.3f} ms/frame, {result['time_elapsed'] / elapsed:.1f}x real time)")
+
+
+if __name__ == "__main__":
+    main()
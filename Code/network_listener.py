@@ -1,94 +1,240 @@
+import asyncio
 import socket
 import json
 import threading
 import random
-import time
 import logging
+import os
+
+import wire_format
+from log_pipeline import PacketLog, setup_logging
 
 # === CONFIGURATION ===
 DEFAULT_HOST = "0.0.0.0"
 DEFAULT_PORT = 5051
 BUFFER_SIZE = 2048
+MAX_BATCH = 256               # datagrams drained from the socket per readiness event
+RECV_BUFFER_BYTES = 1 << 22   # kernel receive buffer, absorbs bursts from large sensor fleets
+MAX_PEERS = 4096              # senders whose receive window is remembered (oldest forgotten first)
+WINDOW_LIMIT = 1024           # out-of-order seqs held above the cumulative ACK point per sender
 
 # Simulate unreliable network conditions
 ACK_LOSS_PROB = 0.15      # 15% chance ACKs are "lost"
 ACK_DELAY_RANGE = (0.1, 1.2)  # ACKs delayed between 100ms–1.2s
 
 # === LOGGING CONFIGURATION ===
-LOG_FILE = "listener_ack_log.txt"
-logging.basicConfig(
-    filename=LOG_FILE,
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(message)s"
-)
+# Next to this module, whatever directory the simulation is started from (Code/.gitignore keeps it out of git)
+LOG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "listener_ack_log.txt")
+setup_logging(LOG_FILE)      # batched on a writer thread (see log_pipeline.py)
+packetLog = PacketLog()      # per-packet lines; the simulation's --log-every / --log-level set it
 logging.info("🛰️ Network Listener started with ACK loss/delay simulation")
 
 
-def start_udp_listener(on_data_callback, host=DEFAULT_HOST, port=DEFAULT_PORT):
+def bind_socket(host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """Bind a non-blocking UDP socket, falling back to port + 1 if the port is busy."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RECV_BUFFER_BYTES)
+    except OSError:
+        pass
+
+    try:
+        sock.bind((host, port))
+        print(f"🔊 UDP listener started on {host}:{port}")
+        logging.info(f"UDP listener started on {host}:{port}")
+    except OSError as e:
+        print(f"⚠️ Port {port} busy ({e}). Trying alternate port...")
+        port_alt = port + 1
+        sock.bind((host, port_alt))
+        print(f"✅ Bound to alternate port {port_alt}")
+        logging.info(f"Bound to alternate port {port_alt}")
+
+    sock.setblocking(False)
+    return sock
+
+
+class ReceiveWindow:
     """
-    Start a UDP listener in a daemon thread.
-    on_data_callback(payload: dict) will be called for each received JSON message.
+    Which sequence numbers one sender has delivered, in O(WINDOW_LIMIT) bits.
+    cum is the first seq not yet received; bit k of above is set when cum + k has arrived.
     """
 
-    def listen():
-        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    def __init__(self):
+        self.cum = 0
+        self.above = 0
+
+    def record(self, seq):
+        """Mark seq received. Returns False if it was a duplicate."""
+        offset = seq - self.cum
+        if offset < 0 or (self.above >> offset) & 1:
+            return False
+        if offset >= WINDOW_LIMIT:
+            # The sender has given up on everything that far behind; move the window up to seq
+            shift = offset - WINDOW_LIMIT + 1
+            self.above >>= shift
+            self.cum += shift
+            offset -= shift
+        self.above |= 1 << offset
+        while self.above & 1:
+            self.above >>= 1
+            self.cum += 1
+        return True
+
+    def sack(self):
+        """(cum, bitmap) with bit i set when cum + 1 + i has arrived."""
+        return self.cum, (self.above >> 1) & ((1 << wire_format.SACK_BITS) - 1)
+
+
+class SensorProtocol(asyncio.DatagramProtocol):
+    """
+    Receives sensor datagrams on the event loop.
+    Each readiness event drains up to MAX_BATCH datagrams straight from the socket,
+    hands every decoded payload to on_data_callback, and schedules the (simulated
+    lossy, delayed) ACKs as loop timers instead of one thread per ACK.
+    Sequenced packets are answered with a SACK carrying the sender's receive window,
+    read when the ACK actually leaves so it reflects everything received by then.
+    rng draws the simulated ACK losses and delays (default: an unseeded stream).
+    """
 
+    def __init__(self, on_data_callback, sock, rng=None):
+        self.on_data_callback = on_data_callback
+        self.rng = rng or random.Random()
+        self.sock = sock
+        self.transport = None
+        self.loop = None
+        self.windows = {}     # addr -> ReceiveWindow
+        self.stats = {"received": 0, "duplicates": 0, "acked": 0, "ack_lost": 0, "invalid": 0}
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.loop = asyncio.get_running_loop()
+
+    def datagram_received(self, data, addr):
+        batch = [(data, addr)]
+        # Pull whatever else is already queued in the kernel during the same pass
         try:
-            sock.bind((host, port))
-            print(f"🔊 UDP listener started on {host}:{port}")
-            logging.info(f"UDP listener started on {host}:{port}")
+            while len(batch) < MAX_BATCH:
+                batch.append(self.sock.recvfrom(BUFFER_SIZE))
+        except (BlockingIOError, InterruptedError):
+            pass
         except OSError as e:
-            print(f"⚠️ Port {port} busy ({e}). Trying alternate port...")
-            port_alt = port + 1
-            sock.bind((host, port_alt))
-            print(f"✅ Bound to alternate port {port_alt}")
-            logging.info(f"Bound to alternate port {port_alt}")
+            logging.error(f"UDP listener error: {e}")
+        self.process_batch(batch)
 
-        while True:
+    def process_batch(self, batch):
+        seqs, kept = [], False
+        for data, addr in batch:
             try:
-                data, addr = sock.recvfrom(BUFFER_SIZE)
+                kind, seq, payloads = wire_format.decode(data)
+            except ValueError as e:
+                self.stats["invalid"] += 1
+                if packetLog(logging.WARNING):
+                    print("⚠️ Received undecodable datagram:", e)
+                continue
+            if kind in (wire_format.KIND_ACK, wire_format.KIND_SACK):
+                continue
+            # A retransmitted copy is ACKed again, but its readings were already delivered
+            duplicate = isinstance(seq, int) and not self.window(addr).record(seq)
+            if duplicate:
+                self.stats["duplicates"] += 1
+
+            # --- Handle incoming payload ---
+            self.stats["received"] += 1
+            seqs.append(seq)
+            sender = addr
+            keep = packetLog(seq=seq)       # one decision for all of this packet's INFO lines
+            kept |= keep
+            if keep:
+                logging.info(f"Received packet seq={seq} ({len(payloads)} reading(s)) from {addr}",
+                             extra={"seq": seq, "peer": f"{addr[0]}:{addr[1]}", "readings": len(payloads)})
+
+            source = f"{addr[0]}:{addr[1]}"
+            for payload in () if duplicate else payloads:
+                payload["source"] = source
                 try:
-                    payload = json.loads(data.decode())
-                    seq = payload.get("seq", None)
-                except Exception as e:
-                    print("⚠️ Received non-JSON or decode error:", e)
-                    continue
-
-                # --- Handle incoming payload ---
-                print(f"📩 Received packet seq={seq} from {addr}")
-                logging.info(f"Received packet seq={seq} from {addr}")
-
-                try:
-                    on_data_callback(payload)
+                    self.on_data_callback(payload)
                 except Exception as e:
                     print(f"⚠️ Error in on_data_callback: {e}")
                     logging.error(f"Error in callback for seq={seq}: {e}")
 
-                # --- Simulate ACK behavior ---
-                # Drop ACK randomly
-                if random.random() < ACK_LOSS_PROB:
-                    print(f"💀 ACK for seq={seq} lost (simulated)")
-                    logging.warning(f"ACK for seq={seq} lost (simulated)")
-                    continue
-
-                # Random delay before ACK
-                delay = random.uniform(*ACK_DELAY_RANGE)
-                threading.Timer(delay, send_ack, args=(sock, addr, seq)).start()
-
-            except Exception as e:
-                print("⚠️ UDP listener error:", e)
-                logging.error(f"UDP listener error: {e}")
-                break
-
-        sock.close()
-
-    def send_ack(sock, addr, seq):
+            # --- Simulate ACK behavior ---
+            # Drop ACK randomly
+            if self.rng.random() < ACK_LOSS_PROB:
+                self.stats["ack_lost"] += 1
+                if packetLog(logging.WARNING):
+                    logging.warning(f"ACK for seq={seq} lost (simulated)", extra={"seq": seq})
+                continue
+
+            # Random delay before ACK; answer in the format the sender used
+            delay = self.rng.uniform(*ACK_DELAY_RANGE)
+            self.loop.call_later(delay, self.send_ack, addr, seq, wire_format.is_binary(data), delay)
+
+        # One console line per batch that has a kept packet; the per-packet detail goes to LOG_FILE
+        if not kept:
+            return
+        if len(seqs) == 1:
+            print(f"📩 Received packet seq={seqs[0]} from {sender}")
+        elif seqs:
+            print(f"📩 Received {len(seqs)} packets (seq {seqs[0]}…{seqs[-1]})")
+
+    def window(self, addr):
+        window = self.windows.get(addr)
+        if window is None:
+            if len(self.windows) >= MAX_PEERS:
+                del self.windows[next(iter(self.windows))]
+            window = self.windows[addr] = ReceiveWindow()
+        return window
+
+    def send_ack(self, addr, seq, binary, delay):
         """Send ACK with optional delay."""
-        ack_msg = json.dumps({"ack": seq}).encode()
-        sock.sendto(ack_msg, addr)
-        print(f"✅ Sent ACK for seq={seq} (after {round(random.uniform(*ACK_DELAY_RANGE), 2)}s delay)")
-        logging.info(f"Sent ACK for seq={seq}")
+        if self.transport is None or self.transport.is_closing():
+            return
+        if not isinstance(seq, int):
+            ack = wire_format.encode_ack(seq) if binary else json.dumps({"ack": seq}).encode()
+        else:
+            cum, sack = self.window(addr).sack()
+            if binary:
+                ack = wire_format.encode_sack(seq, cum, sack)
+            else:
+                ack = json.dumps({"ack": seq, "cum": cum, "sack": sack}).encode()
+        self.transport.sendto(ack, addr)
+        self.stats["acked"] += 1
+        if packetLog(seq=seq):
+            logging.info(f"Sent ACK for seq={seq} (after {round(delay, 2)}s delay)", extra={"seq": seq, "delay": round(delay, 3)})
+
+    def error_received(self, exc):
+        logging.error(f"UDP listener error: {exc}")
+
+
+async def serve_udp(on_data_callback, host=DEFAULT_HOST, port=DEFAULT_PORT, rng=None):
+    """Run the listener on the current event loop until cancelled."""
+    loop = asyncio.get_running_loop()
+    sock = bind_socket(host, port)
+    transport, protocol = await loop.create_datagram_endpoint(
+        lambda: SensorProtocol(on_data_callback, sock, rng), sock=sock)
+    try:
+        await asyncio.Future()
+    finally:
+        transport.close()
+        logging.info(f"UDP listener stopped: {protocol.stats}")
+
+
+def start_udp_listener(on_data_callback, host=DEFAULT_HOST, port=DEFAULT_PORT, rng=None):
+    """
+    Start a UDP listener in a daemon thread running its own asyncio loop.
+    on_data_callback(payload: dict) will be called on that thread for each received reading,
+    whether it arrived as legacy JSON or in the binary wire format (see wire_format.py),
+    with the sender's "host:port" under "source". Retransmitted copies of a sequenced packet
+    are ACKed but not passed on again.
+    """
+
+    def listen():
+        try:
+            asyncio.run(serve_udp(on_data_callback, host, port, rng))
+        except Exception as e:
+            print("⚠️ UDP listener error:", e)
+            logging.error(f"UDP listener error: {e}")
 
     thread = threading.Thread(target=listen, daemon=True, name="udp-listener")
     thread.start()
@@ -0,0 +1,170 @@
+"""
+Frame-time telemetry and a sampling profiler.
+
+FrameTimer splits every frame of the pygame loop into phases (events,
+signals and text, physics, vehicle blits, display update, idle) and keeps
+the last FRAME_HISTORY frames in a preallocated ring. ThreadCpuMonitor
+reads each thread's own CPU clock, which shows how the spawner, signal,
+sensor and API threads share the interpreter. SamplingProfiler can be
+switched on and off while the simulation runs. It snapshots every thread's
+stack SAMPLE_INTERVAL apart and exports the counts as collapsed stacks:
+one "thread;outer;...;inner count" line per stack. flamegraph.pl,
+speedscope and inferno all read that format.
+"""
+import collections
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+
+# === PROFILING SETTINGS ===
+FRAME_HISTORY = 600          # frames kept (10 s at 60 fps)
+SAMPLE_INTERVAL = 0.005      # seconds between profiler samples
+
+
+class FrameTimer:
+    """Per-phase durations of recent frames: start(), lap(phase) after each phase, end()."""
+
+    def __init__(self, phases, history=FRAME_HISTORY):
+        self.phases = list(phases)
+        self.index = {phase: i for i, phase in enumerate(self.phases)}
+        self.samples = np.zeros((history, len(self.phases)))
+        self.history = history
+        self.frames = 0
+        self._row = np.zeros(len(self.phases))
+        self._last = None
+
+    def start(self):
+        self._row[:] = 0.0
+        self._last = time.perf_counter()
+
+    def lap(self, phase):
+        now = time.perf_counter()
+        self._row[self.index[phase]] += now - self._last
+        self._last = now
+
+    def end(self):
+        self.samples[self.frames % self.history] = self._row
+        self.frames += 1
+
+    def report(self):
+        """Mean / p50 / p99 milliseconds per phase and per frame over the frames kept, and the frame rate."""
+        filled = self.samples[:min(self.frames, self.history)] * 1000
+        if not len(filled):
+            return {"frames": 0}
+
+        def stats(ms):
+            p50, p99 = np.percentile(ms, [50, 99])
+            return {"mean_ms": round(float(ms.mean()), 3), "p50_ms": round(float(p50), 3), "p99_ms": round(float(p99), 3)}
+
+        total = filled.sum(axis=1)
+        return {
+            "frames": self.frames,
+            "fps": round(1000 / float(total.mean()), 1) if total.mean() > 0 else 0.0,
+            "frame": stats(total),
+            "phases": {phase: stats(filled[:, i]) for i, phase in enumerate(self.phases)},
+        }
+
+
+class ThreadCpuMonitor:
+    """CPU seconds of every live thread, and the share of wall time each used since the previous report()."""
+
+    def __init__(self):
+        self._last = None
+
+    @staticmethod
+    def cpu_times():
+        times = {}
+        for thread in threading.enumerate():
+            try:
+                times[thread.name] = time.clock_gettime(time.pthread_getcpuclockid(thread.ident))
+            except (AttributeError, OSError, TypeError):
+                pass       # no per-thread CPU clock on this platform, or the thread just ended
+        return times
+
+    def report(self):
+        now, times = time.monotonic(), self.cpu_times()
+        last, self._last = self._last, (now, times)
+        threads = {}
+        for name, cpu in times.items():
+            threads[name] = {"cpu_s": round(cpu, 3)}
+            if last is not None and name in last[1] and now > last[0]:
+                threads[name]["cpu_pct"] = round(100 * (cpu - last[1][name]) / (now - last[0]), 1)
+        return {"process_cpu_s": round(time.process_time(), 3), "threads": threads}
+
+
+class SamplingProfiler:
+    """Stack sampler for every thread but its own; start() / stop() at any time, counts accumulate."""
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.counts = collections.Counter()
+        self.samples = 0
+        self.lock = threading.Lock()
+        self._stopped = None
+
+    @property
+    def running(self):
+        return self._stopped is not None and not self._stopped.is_set()
+
+    def start(self):
+        if not self.running:
+            self._stopped = threading.Event()
+            threading.Thread(target=self._run, args=(self._stopped,), daemon=True, name="sampling-profiler").start()
+        return self
+
+    def stop(self):
+        if self._stopped is not None:
+            self._stopped.set()
+
+    def clear(self):
+        with self.lock:
+            self.counts.clear()
+            self.samples = 0
+
+    def _run(self, stopped):
+        me = threading.get_ident()
+        while not stopped.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            stacks = []
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                stacks.append(";".join(reversed(stack)))
+            with self.lock:
+                self.counts.update(stacks)
+                self.samples += 1
+
+    def collapsed(self):
+        """The samples so far as collapsed stacks, the input format of flamegraph.pl and speedscope."""
+        with self.lock:
+            return "".join(f"{stack} {count}\n" for stack, count in self.counts.most_common())
+
+    def write(self, path):
+        with open(path, "w") as f:
+            f.write(self.collapsed())
+
+
+class Telemetry:
+    """Frame timer, thread CPU monitor and sampling profiler of one process, reported together."""
+
+    def __init__(self, phases):
+        self.frames = FrameTimer(phases)
+        self.threads = ThreadCpuMonitor()
+        self.sampler = SamplingProfiler()
+
+    def report(self):
+        return {
+            "frames": self.frames.report(),
+            "cpu": self.threads.report(),
+            "sampler": {"running": self.sampler.running, "samples": self.sampler.samples},
+        }
@@ -0,0 +1,139 @@
+import collections
+import math
+
+import numpy as np
+
+from signal_controller import defaultYellow, TOTAL_CYCLE_TIME, SCOOT_MIN_GREEN, SCOOT_MAX_GREEN
+
+
+# === SCOOT TUNING CONSTANTS ===
+BASE_GREEN = 8                 # baseline seconds
+MAX_GREEN_CAP = 25             # upper bound in seconds for any approach
+MIN_GREEN_CAP = 8              # minimum even if no traffic
+DAMPING_FACTOR = 0.55          # less than 1 = gentler response
+VEHICLE_SCALER = 1.2           # reduces effect of large queues
+
+
+def plan_greens(readings, current_green,
+                base_green=BASE_GREEN, max_green=MAX_GREEN_CAP, min_green=MIN_GREEN_CAP,
+                damping=DAMPING_FACTOR, vehicle_scaler=VEHICLE_SCALER):
+    """
+    Compute new green times from the latest sensor readings.
+    readings maps junction_id (1-based) -> vehicles_detected.
+    Returns {junction_id: green_seconds}; the approach that is currently green is left out.
+    """
+    if not readings:
+        return {}
+
+    adjusted_total = sum(math.sqrt(v + 1) for v in readings.values())
+
+    plan = {}
+    for jid, vcount in readings.items():
+        if jid - 1 == current_green:
+            continue
+
+        # Normalize both by total traffic and absolute vehicle magnitude
+        share_ratio = (math.sqrt(vcount + 1) / adjusted_total) ** damping
+
+        # scale with a soft response to actual queue length
+        traffic_influence = min(vcount / 10, 2.5) / vehicle_scaler  # caps at 2.1x boost
+        new_green = base_green + (share_ratio * 10 * traffic_influence)
+
+        # clamp
+        plan[jid] = max(min_green, min(max_green, int(new_green)))
+    return plan
+
+
+# === NETWORK OPTIMIZER ===
+SATURATION_FLOW = 1.5          # vehicles discharged per second of green (3 lanes, one every carTime = 2 s each)
+
+NetworkPlan = collections.namedtuple("NetworkPlan", ["cycle", "greens", "offsets"])
+
+
+def plan_network(readings, yellow=defaultYellow, min_green=SCOOT_MIN_GREEN, max_green=SCOOT_MAX_GREEN,
+                 max_cycle=TOTAL_CYCLE_TIME, damping=DAMPING_FACTOR, saturation_flow=SATURATION_FLOW,
+                 upstream=None, travel_time=None, common_cycle=False):
+    """
+    Cycle length, green splits and offsets for many junctions at once.
+
+    readings is a (junctions, approaches) array of vehicles detected per approach.
+    Each junction's cycle is the green needed to clear its queues at saturation_flow
+    plus one yellow per approach, kept within [approaches * (min_green + yellow), max_cycle].
+    The green time is split in proportion to (vehicles + 1) ** damping, every green is
+    kept within [min_green, max_green], and greens + yellows never exceed the cycle.
+
+    upstream[j] is the junction feeding j (-1 for none) and travel_time[j] the seconds
+    between them; offsets then put each green wave travel_time behind its upstream
+    junction's, modulo the cycle. common_cycle gives every junction the longest cycle,
+    as coordination needs. Returns NetworkPlan(cycle, greens, offsets) as arrays.
+    """
+    readings = np.atleast_2d(np.asarray(readings, dtype=np.float64))
+    n_junctions, n_approaches = readings.shape
+    lost = n_approaches * yellow
+    min_cycle = lost + n_approaches * min_green
+    if min_cycle > max_cycle:
+        raise ValueError(f"max_cycle {max_cycle}s is shorter than {n_approaches} minimum greens and yellows ({min_cycle}s)")
+
+    need = np.maximum(readings / saturation_flow, min_green)
+    cycle = np.clip(lost + need.sum(axis=1), min_cycle, max_cycle)
+    if common_cycle:
+        cycle[:] = cycle.max()
+    effective = (cycle - lost)[:, None]
+
+    # Proportional split, clamped; clamping leaves a surplus or shortfall against the cycle,
+    # taken from the time above min_green or given to the room below max_green
+    weights = (readings + 1.0) ** damping
+    greens = np.clip(effective * weights / weights.sum(axis=1, keepdims=True), min_green, max_green)
+    shortfall = effective - greens.sum(axis=1, keepdims=True)
+    room = np.where(shortfall < 0, greens - min_green, max_green - greens)
+    total_room = room.sum(axis=1, keepdims=True)
+    greens += np.divide(room * shortfall, total_room, out=np.zeros_like(greens), where=total_room > 0)
+    # Whole seconds, rounded down so greens + yellows stay within the cycle
+    greens = np.floor(np.clip(greens, min_green, max_green) + 1e-9)
+    if not common_cycle:
+        cycle = greens.sum(axis=1) + lost
+
+    offsets = np.zeros(n_junctions) if upstream is None else network_offsets(upstream, travel_time, cycle)
+    return NetworkPlan(cycle, greens, offsets)
+
+
+def network_offsets(upstream, travel_time, cycle):
+    """
+    Start of each junction's green wave: the travel time summed along its chain of
+    upstream junctions (upstream[j] == -1 ends a chain), modulo cycle.
+    """
+    # Pointer jumping: after k rounds each junction holds the travel time over 2^k upstream links
+    parent = np.asarray(upstream, dtype=np.int64).copy()
+    offsets = np.zeros(parent.size) if travel_time is None else np.broadcast_to(
+        np.asarray(travel_time, dtype=np.float64), parent.shape).copy()
+    offsets[parent < 0] = 0.0
+    for _ in range(max(1, parent.size).bit_length() + 1):
+        linked = parent >= 0
+        if not linked.any():
+            break
+        offsets[linked] += offsets[parent[linked]]
+        parent[linked] = parent[parent[linked]]
+    else:
+        raise ValueError("upstream links form a loop")
+    return offsets % cycle
+
+
+def plan_junction(readings, current_green, approaches, **params):
+    """
+    plan_network for a single junction, in plan_greens' shape: readings maps
+    junction_id (1-based approach) -> vehicles_detected, missing approaches count
+    as empty, and the approach that is currently green is left out of the result.
+    """
+    if not readings:
+        return {}
+    row = np.zeros(approaches)
+    for jid, vcount in readings.items():
+        row[jid - 1] = vcount
+    greens = plan_network(row, **params).greens[0]
+    return {jid: int(greens[jid - 1]) for jid in readings if jid - 1 != current_green}
+
+
+PLANNERS = {
+    "network": plan_junction,
+    "greens": lambda readings, current_green, approaches, **params: plan_greens(readings, current_green, **params),
+}
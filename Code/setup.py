@@ -9,7 +9,8 @@ setup(
     packages=find_packages(exclude=["tests*", "darkflow*"]),
     install_requires=[
         "pygame>=2.6.1",
-        "matplotlib>=3.10.0"
+        "matplotlib>=3.10.0",
+        "numpy>=1.24"
     ],
     entry_points={
         "console_scripts": [
@@ -0,0 +1,148 @@
+"""
+Network simulation split across worker processes.
+
+The junctions of a Network are partitioned into contiguous blocks, one per
+worker process, so the physics of each block runs on its own core. Vehicles
+take link_time seconds to drive between junctions, so a worker can run
+SYNC_INTERVAL seconds ahead without waiting for anyone, as long as that is
+shorter than link_time. At each barrier the coordinator routes every worker's
+outbox of boundary vehicles to the workers that own their next junction.
+SCOOT readings go to the coordinator too, which plans the whole grid in one
+call. Every junction draws from its own random stream, and link arrivals are
+added in an order that ignores which process sent them, so a sharded run
+returns exactly what the single-process run with the same seed returns.
+"""
+import argparse
+import multiprocessing
+import time
+
+import numpy as np
+
+from engine import simTime, FRAMES_PER_SECOND
+from network import Network, LINK_TRAVEL_TIME
+from scoot import plan_network
+
+
+# === SHARD SETTINGS ===
+SYNC_INTERVAL = 1            # simulated seconds between barriers (must not exceed the link travel time)
+
+
+def _worker(conn, rows, cols, owned, options, sync_frames):
+    """One shard: step the owned junctions, meeting the coordinator at every barrier and every SCOOT run."""
+    def remote_plan(readings):
+        conn.send(("plan", readings))
+        return conn.recv()
+
+    network = Network(rows, cols, owned=owned, planner=remote_plan, **options)
+    end = network.simTime * FRAMES_PER_SECOND
+    while network.frame < end:
+        barrier = min(network.frame + sync_frames, end)
+        while network.frame < barrier:
+            network.step()
+        outbox, network.outbox = network.outbox, []
+        conn.send(("sync", outbox))
+        network.receive(conn.recv())
+    conn.send(("done", network.summary(), network.journeyFrames))
+    conn.close()
+
+
+class ShardedNetwork:
+    """Network(rows, cols, **options) run by workers processes; run() returns the same summary."""
+
+    def __init__(self, rows=1, cols=1, workers=2, sync_interval=SYNC_INTERVAL, **options):
+        link_time = options.get("link_time", LINK_TRAVEL_TIME)
+        if sync_interval > link_time:
+            raise ValueError(f"sync interval {sync_interval}s exceeds the link travel time {link_time}s")
+        self.rows, self.cols = rows, cols
+        self.options = options
+        self.syncFrames = round(sync_interval * FRAMES_PER_SECOND)
+        self.shards = [block.tolist() for block in np.array_split(np.arange(rows * cols), workers) if block.size]
+        self.shardOf = np.empty(rows * cols, dtype=np.int64)
+        for i, owned in enumerate(self.shards):
+            self.shardOf[owned] = i
+
+    def plan_greens(self, readings):
+        return plan_network(readings, common_cycle=self.options.get("green_wave", False),
+                            **(self.options.get("scoot_params") or {})).greens
+
+    def run(self):
+        conns, processes = [], []
+        for owned in self.shards:
+            parent, child = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=_worker, daemon=True, name=f"shard-{owned[0]}",
+                                              args=(child, self.rows, self.cols, owned, self.options, self.syncFrames))
+            process.start()
+            child.close()
+            conns.append(parent)
+            processes.append(process)
+        try:
+            return self._coordinate(conns)
+        finally:
+            for process in processes:
+                process.join()
+
+    def _coordinate(self, conns):
+        while True:
+            messages = [conn.recv() for conn in conns]      # every worker reaches the same barrier
+            kind = messages[0][0]
+            if kind == "plan":
+                greens = self.plan_greens(np.concatenate([readings for _, readings in messages]))
+                start = 0
+                for conn, owned in zip(conns, self.shards):
+                    conn.send(greens[start:start + len(owned)])
+                    start += len(owned)
+            elif kind == "sync":
+                inboxes = [[] for _ in conns]
+                for _, outbox in messages:
+                    for vehicle in outbox:
+                        inboxes[self.shardOf[vehicle[1]]].append(vehicle)
+                for conn, inbox in zip(conns, inboxes):
+                    conn.send(inbox)
+            else:
+                return self._merge(messages)
+
+    @staticmethod
+    def _merge(messages):
+        summaries = [summary for _, summary, _ in messages]
+        result = {key: sum(summary[key] for summary in summaries)
+                  for key in ("junctions", "entered", "exited", "in_network", "crossed")}
+        journeyFrames = sum(frames for _, _, frames in messages)
+        result["time_elapsed"] = summaries[0]["time_elapsed"]
+        result["mean_journey"] = journeyFrames / FRAMES_PER_SECOND / result["exited"] if result["exited"] else 0.0
+        return result
+
+
+# === MAIN ENTRY ===
+def main():
+    parser = argparse.ArgumentParser(description="Network of intersections split across worker processes")
+    parser.add_argument("--rows", type=int, default=4, help="Junction rows")
+    parser.add_argument("--cols", type=int, default=25, help="Junction columns")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count(), help="Worker processes")
+    parser.add_argument("--sim-time", type=int, default=simTime, help="Simulated seconds per run")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed for the vehicle spawners")
+    parser.add_argument("--link-time", type=float, default=LINK_TRAVEL_TIME, help="Seconds between neighbouring junctions")
+    parser.add_argument("--no-scoot", action="store_true", help="Keep the fixed-time plan (disable SCOOT)")
+    parser.add_argument("--green-wave", action="store_true", help="Offset the junctions for eastbound progression")
+    parser.add_argument("--check", action="store_true", help="Also run in one process and compare the results")
+    args = parser.parse_args()
+
+    options = dict(seed=args.seed, sim_time=args.sim_time, scoot=not args.no_scoot,
+                   green_wave=args.green_wave, link_time=args.link_time)
+    started = time.perf_counter()
+    result = ShardedNetwork(args.rows, args.cols, workers=args.workers, **options).run()
+    elapsed = time.perf_counter() - started
+    print(f"🧩 {args.rows}x{args.cols} on {args.workers} workers: {result['exited']} of {result['entered']} vehicles "
+          f"through, {result['crossed']} stop-line crossings ({elapsed:.2f}s wall)")
+
+    if args.check:
+        started = time.perf_counter()
+        single = Network(args.rows, args.cols, **options).run()
+        elapsed = time.perf_counter() - started
+        verdict = "✅ identical to" if single == result else "❌ differs from"
+        print(f"{verdict} the single-process run ({elapsed:.2f}s wall)")
+        if single != result:
+            print("   single:", single, "\n   sharded:", result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""
+Event-driven signal controller.
+
+The signal plan is a fixed-order phase state machine, GREEN(i) -> YELLOW(i) ->
+GREEN(i + 1) -> ..., whose phase ends are scheduled at absolute deadlines on a
+Scheduler. Nothing runs between phase boundaries and SCOOT runs, each phase
+starts exactly where the previous one ended, and a run can go on indefinitely
+without growing the stack. The same controller runs on the monotonic clock in
+the pygame window and on the simulated clock of the headless engine.
+"""
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+
+# === DEFAULT CONFIGURATION ===
+defaultRed = 150
+defaultYellow = 5
+defaultGreen = 20
+defaultMinimum = 10
+defaultMaximum = 60
+
+noOfSignals = 4
+
+# === SCOOT SETTINGS ===
+TOTAL_CYCLE_TIME = 120       # seconds per full signal rotation
+SCOOT_UPDATE_INTERVAL = 10   # seconds between optimization updates
+SCOOT_MIN_GREEN = 10
+SCOOT_MAX_GREEN = 60
+SCOOT_SMOOTHING_WINDOW = 0   # seconds of readings averaged per plan (0: latest reading only)
+SCOOT_FORECAST = True        # plan from the queues expected at each green (forecast.py)
+
+
+# === SIGNAL CLASS ===
+class TrafficSignal:
+    def __init__(self, red, yellow, green, minimum, maximum):
+        self.red = red
+        self.yellow = yellow
+        self.green = green
+        self.minimum = minimum
+        self.maximum = maximum
+        self.signalText = "30"
+        self.totalGreenTime = 0
+
+
+def default_signals():
+    """The four signals of the intersection with their starting plan."""
+    ts1 = TrafficSignal(0, defaultYellow, defaultGreen, defaultMinimum, defaultMaximum)
+    ts2 = TrafficSignal(ts1.red + ts1.yellow + ts1.green, defaultYellow, defaultGreen, defaultMinimum, defaultMaximum)
+    ts3 = TrafficSignal(defaultRed, defaultYellow, defaultGreen, defaultMinimum, defaultMaximum)
+    ts4 = TrafficSignal(defaultRed, defaultYellow, defaultGreen, defaultMinimum, defaultMaximum)
+    return [ts1, ts2, ts3, ts4]
+
+
+# === SCHEDULER ===
+class Scheduler:
+    """
+    Heap of timed callbacks on a given clock.
+    run_until(t) fires everything due by t (simulated time); run_forever() sleeps
+    between deadlines and is woken early whenever a new callback is scheduled.
+    run_forever() logs a callback that raises and carries on, so one bad callback
+    cannot stop the signal plan; run_until() lets it propagate to its caller.
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self._heap = []
+        self._counter = itertools.count()   # keeps callbacks due at the same time in scheduling order
+        self._cond = threading.Condition()
+        self._stopped = False
+
+    def now(self):
+        return self.clock()
+
+    def call_at(self, when, callback, *args):
+        with self._cond:
+            heapq.heappush(self._heap, (when, next(self._counter), callback, args))
+            self._cond.notify()
+
+    def call_later(self, delay, callback, *args):
+        self.call_at(self.clock() + delay, callback, *args)
+
+    def run_until(self, now):
+        """Fire, in deadline order, every callback due at or before now."""
+        while True:
+            with self._cond:
+                if not self._heap or self._heap[0][0] > now:
+                    return
+                _, _, callback, args = heapq.heappop(self._heap)
+            callback(*args)
+
+    def run_forever(self):
+        """Block the calling thread, firing callbacks as their deadlines pass, until stop()."""
+        while True:
+            with self._cond:
+                while not self._stopped:
+                    timeout = self._heap[0][0] - self.clock() if self._heap else None
+                    if timeout is not None and timeout <= 0:
+                        break
+                    self._cond.wait(timeout)
+                if self._stopped:
+                    return
+                _, _, callback, args = heapq.heappop(self._heap)
+            try:
+                callback(*args)
+            except Exception:
+                logging.exception(f"Scheduled callback {getattr(callback, '__name__', callback)} failed")
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+
+
+# === SIGNAL CONTROLLER ===
+class SignalController:
+    """
+    Cycles the green through signals 0..noOfSignals-1, one GREEN then one YELLOW phase each.
+    signals[i].green and .yellow are the durations the next phase of signal i will get;
+    they are read when the phase starts, so SCOOT can rewrite them at any time.
+    """
+
+    def __init__(self, signals, scheduler, on_yellow=None, optimizer=None, optimize_every=SCOOT_UPDATE_INTERVAL,
+                 on_phase=None):
+        self.signals = signals
+        self.scheduler = scheduler
+        self.on_yellow = on_yellow          # on_yellow(direction_number) when a green ends
+        self.on_phase = on_phase            # on_phase(controller) after every GREEN/YELLOW change
+        self.optimizer = optimizer          # optimizer() every optimize_every seconds
+        self.optimize_every = optimize_every
+
+        self.currentGreen = 0
+        self.nextGreen = (self.currentGreen + 1) % noOfSignals
+        self.currentYellow = 0
+        self.phaseStart = self.phaseEnd = None
+        self.nextOptimization = None
+
+    def start(self, now=None):
+        """Begin the first green phase at now (default: the scheduler's clock)."""
+        if now is None:
+            now = self.scheduler.now()
+        self._begin_green(now)
+        if self.optimizer is not None:
+            self.nextOptimization = now + self.optimize_every
+            self.scheduler.call_at(self.nextOptimization, self._optimize)
+
+    # --- Phase transitions ---
+    def _begin_green(self, start):
+        self.currentYellow = 0
+        self.phaseStart = start
+        self.phaseEnd = start + self.signals[self.currentGreen].green
+        self.scheduler.call_at(self.phaseEnd, self._end_green)
+        if self.on_phase is not None:
+            self.on_phase(self)
+
+    def _end_green(self):
+        signal = self.signals[self.currentGreen]
+        signal.totalGreenTime += self.phaseEnd - self.phaseStart
+        self.currentYellow = 1
+        self.phaseStart = self.phaseEnd
+        self.phaseEnd = self.phaseStart + signal.yellow
+        if self.on_yellow is not None:
+            self.on_yellow(self.currentGreen)
+        self.scheduler.call_at(self.phaseEnd, self._end_yellow)
+        if self.on_phase is not None:
+            self.on_phase(self)
+
+    def _end_yellow(self):
+        signal = self.signals[self.currentGreen]
+        signal.green = defaultGreen
+        signal.yellow = defaultYellow
+        signal.red = defaultRed
+        self.currentGreen = self.nextGreen
+        self.nextGreen = (self.currentGreen + 1) % noOfSignals
+        self._begin_green(self.phaseEnd)
+
+    def _optimize(self):
+        try:
+            self.optimizer()
+        finally:
+            # Rescheduled even if the optimizer raised, so one failed plan does not end SCOOT
+            self.nextOptimization += self.optimize_every
+            self.scheduler.call_at(self.nextOptimization, self._optimize)
+
+    # --- Queries ---
+    def remaining(self, i, now=None):
+        """Seconds until signal i changes colour: end of its green/yellow, or start of its next green."""
+        if self.phaseEnd is None:
+            return 0.0
+        if now is None:
+            now = self.scheduler.now()
+        left = max(0.0, self.phaseEnd - now)
+        if i == self.currentGreen:
+            return left
+        # Red: the rest of the current phase plus every phase queued in between
+        if self.currentYellow == 0:
+            left += self.signals[self.currentGreen].yellow
+        j = self.nextGreen
+        while j != i:
+            left += self.signals[j].green + self.signals[j].yellow
+            j = (j + 1) % noOfSignals
+        return left
+
+    def green_time(self, i, now=None):
+        """Total green served by signal i, including the running phase."""
+        total = self.signals[i].totalGreenTime
+        if i == self.currentGreen and self.currentYellow == 0:
+            if now is None:
+                now = self.scheduler.now()
+            total += max(0.0, min(now, self.phaseEnd) - self.phaseStart)
+        return total
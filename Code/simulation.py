@@ -1,36 +1,38 @@
-import random
+import argparse
 import math
+import collections
 import time
 import threading
 import pygame
 import sys
 import os
 import signal
-from flask import Flask, jsonify
+import logging
+
+import api_server
+import assets
+import live_stream
+from event_log import EventLog, rng_stream
+from kpi import KpiRecorder, format_report
+from log_pipeline import add_logging_arguments, apply_logging_arguments
+from engine import FRAMES_PER_SECOND, simTime
+from profiling import Telemetry
+from forecast import ArrivalForecaster
+from ingest import ReadingBuffer, ReadingFilter
+from scoot import plan_junction
+from timeseries import TimeSeriesStore
+from signal_controller import (
+    defaultMinimum, defaultMaximum, noOfSignals,
+    SCOOT_SMOOTHING_WINDOW, SCOOT_FORECAST,
+    Scheduler, SignalController, default_signals,
+)
+from vehicle_store import VehicleStore, vehicleTypes, directionNumbers
 
 
 # === DEFAULT CONFIGURATION ===
-defaultRed = 150
-defaultYellow = 5
-defaultGreen = 20
-defaultMinimum = 10
-defaultMaximum = 60
-
-signals = []
-noOfSignals = 4
-simTime = 300
+signals = default_signals()
 timeElapsed = 0
 
-currentGreen = 0
-nextGreen = (currentGreen + 1) % noOfSignals
-currentYellow = 0
-
-# === SCOOT SETTINGS ===
-TOTAL_CYCLE_TIME = 120       # seconds per full signal rotation
-SCOOT_UPDATE_INTERVAL = 10   # seconds between optimization updates
-SCOOT_MIN_GREEN = 10
-SCOOT_MAX_GREEN = 60
-
 # === VEHICLE TIMING AND SPEED ===
 carTime = 2
 bikeTime = 1
@@ -40,349 +42,180 @@ truckTime = 2.5
 noOfCars = noOfBikes = noOfBuses = noOfTrucks = noOfRickshaws = 0
 noOfLanes = 2
 detectionTime = 5
-speeds = {'car': 2.25, 'bus': 1.8, 'truck': 1.8, 'rickshaw': 2, 'bike': 2.5}
-
-# === PATH HANDLING ===
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-IMG_DIR = os.path.join(BASE_DIR, "images")
 
 # === COORDINATES ===
-x = {'right': [0, 0, 0], 'down': [755, 727, 697], 'left': [1400, 1400, 1400], 'up': [602, 627, 657]}
-y = {'right': [348, 370, 398], 'down': [0, 0, 0], 'left': [498, 466, 436], 'up': [800, 800, 800]}
-vehicles = {'right': {0: [], 1: [], 2: [], 'crossed': 0},
-            'down': {0: [], 1: [], 2: [], 'crossed': 0},
-            'left': {0: [], 1: [], 2: [], 'crossed': 0},
-            'up': {0: [], 1: [], 2: [], 'crossed': 0}}
-vehicleTypes = {0: 'car', 1: 'bus', 2: 'truck', 3: 'rickshaw', 4: 'bike'}
-directionNumbers = {0: 'right', 1: 'down', 2: 'left', 3: 'up'}
 signalCoods = [(530, 230), (810, 230), (810, 570), (530, 570)]
 signalTimerCoods = [(530, 210), (810, 210), (810, 550), (530, 550)]
 vehicleCountCoods = [(480, 210), (880, 210), (880, 550), (480, 550)]
 vehicleCountTexts = ["0", "0", "0", "0"]
-stopLines = {'right': 590, 'down': 330, 'left': 800, 'up': 535}
-defaultStop = {'right': 580, 'down': 320, 'left': 810, 'up': 545}
-stops = {'right': [580, 580, 580], 'down': [320, 320, 320],
-         'left': [810, 810, 810], 'up': [545, 545, 545]}
-mid = {'right': {'x': 705, 'y': 445}, 'down': {'x': 695, 'y': 450},
-       'left': {'x': 695, 'y': 425}, 'up': {'x': 695, 'y': 400}}
-rotationAngle = 3
-gap = 15
-gap2 = 15
 
 pygame.init()
 simulation = pygame.sprite.Group()
+kpiRecorder = KpiRecorder(directionNumbers.values())
+vehicleStore = VehicleStore(kpi=kpiRecorder)  # positions and kinematics of every vehicle on screen
 
+# Sprites by store row, and retired sprites waiting to be reused by the spawner
+vehicleLock = threading.Lock()
+vehicleSprites = {}
+vehiclePool = []
 
-# === SIGNAL CLASS ===
-class TrafficSignal:
-    def __init__(self, red, yellow, green, minimum, maximum):
-        self.red = red
-        self.yellow = yellow
-        self.green = green
-        self.minimum = minimum
-        self.maximum = maximum
-        self.signalText = "30"
-        self.totalGreenTime = 0
+# === RUN LOG ===
+# Random streams per subsystem and the optional event log; run_simulation(seed, record) sets them up
+spawnRng = rng_stream(None, "spawn")
+eventLog = None
+logStart = time.monotonic()
+flamegraphPath = None        # where the profiler's samples go on exit (run_simulation's flamegraph)
+
+
+def log_time():
+    """Seconds since the run started, the time stamp of every logged event."""
+    return time.monotonic() - logStart
 
 
 # === VEHICLE CLASS ===
 class Vehicle(pygame.sprite.Sprite):
+    """Sprite for one row of vehicleStore; the store moves it, the sprite only draws it."""
+
     def __init__(self, lane, vehicleClass, direction_number, direction, will_turn):
         pygame.sprite.Sprite.__init__(self)
+        self.reset(lane, vehicleClass, direction_number, direction, will_turn)
+
+    def reset(self, lane, vehicleClass, direction_number, direction, will_turn):
+        """(Re)initialise the sprite for a newly spawned vehicle."""
         self.lane = lane
         self.vehicleClass = vehicleClass
-        self.speed = speeds[vehicleClass]
         self.direction_number = direction_number
         self.direction = direction
-        self.x = x[direction][lane]
-        self.y = y[direction][lane]
-        self.crossed = 0
         self.willTurn = will_turn
-        self.turned = 0
         self.rotateAngle = 0
-        vehicles[direction][lane].append(self)
-        self.index = len(vehicles[direction][lane]) - 1
-
-        path = os.path.join(IMG_DIR, direction, f"{vehicleClass}.png")
-        self.originalImage = pygame.image.load(path)
-        self.currentImage = pygame.image.load(path)
 
-        # STOP LOGIC
-        if direction == 'right':
-            if len(vehicles[direction][lane]) > 1 and vehicles[direction][lane][self.index - 1].crossed == 0:
-                self.stop = vehicles[direction][lane][self.index - 1].stop - vehicles[direction][lane][self.index - 1].currentImage.get_rect().width - gap
-            else:
-                self.stop = defaultStop[direction]
-            temp = self.currentImage.get_rect().width + gap
-            x[direction][lane] -= temp
-            stops[direction][lane] -= temp
-
-        elif direction == 'left':
-            if len(vehicles[direction][lane]) > 1 and vehicles[direction][lane][self.index - 1].crossed == 0:
-                self.stop = vehicles[direction][lane][self.index - 1].stop + vehicles[direction][lane][self.index - 1].currentImage.get_rect().width + gap
-            else:
-                self.stop = defaultStop[direction]
-            temp = self.currentImage.get_rect().width + gap
-            x[direction][lane] += temp
-            stops[direction][lane] += temp
-
-        elif direction == 'down':
-            if len(vehicles[direction][lane]) > 1 and vehicles[direction][lane][self.index - 1].crossed == 0:
-                self.stop = vehicles[direction][lane][self.index - 1].stop - vehicles[direction][lane][self.index - 1].currentImage.get_rect().height - gap
-            else:
-                self.stop = defaultStop[direction]
-            temp = self.currentImage.get_rect().height + gap
-            y[direction][lane] -= temp
-            stops[direction][lane] -= temp
-
-        elif direction == 'up':
-            if len(vehicles[direction][lane]) > 1 and vehicles[direction][lane][self.index - 1].crossed == 0:
-                self.stop = vehicles[direction][lane][self.index - 1].stop + vehicles[direction][lane][self.index - 1].currentImage.get_rect().height + gap
-            else:
-                self.stop = defaultStop[direction]
-            temp = self.currentImage.get_rect().height + gap
-            y[direction][lane] += temp
-            stops[direction][lane] += temp
+        self.originalImage = assets.vehicle_image(direction, vehicleClass)
+        self.currentImage = self.originalImage
 
+        self.row = vehicleStore.add(lane, vehicleClass, direction_number, will_turn)
         simulation.add(self)
 
     def render(self, screen):
-        screen.blit(self.currentImage, (self.x, self.y))
-
-    def move(self):
-        if self.direction == 'right':
-            if self.crossed == 0 and self.x + self.currentImage.get_rect().width > stopLines[self.direction]:
-                self.crossed = 1
-                vehicles[self.direction]['crossed'] += 1
-            if self.willTurn == 1:
-                if self.crossed == 0 or self.x + self.currentImage.get_rect().width < mid[self.direction]['x']:
-                    if ((self.x + self.currentImage.get_rect().width <= self.stop or (currentGreen == 0 and currentYellow == 0) or self.crossed == 1)
-                        and (self.index == 0 or self.x + self.currentImage.get_rect().width < (vehicles[self.direction][self.lane][self.index - 1].x - gap2)
-                             or vehicles[self.direction][self.lane][self.index - 1].turned == 1)):
-                        self.x += self.speed
-                else:
-                    if self.turned == 0:
-                        self.rotateAngle += rotationAngle
-                        self.currentImage = pygame.transform.rotate(self.originalImage, -self.rotateAngle)
-                        self.x += 2
-                        self.y += 1.8
-                        if self.rotateAngle == 90:
-                            self.turned = 1
-                    else:
-                        if (self.index == 0 or
-                                self.y + self.currentImage.get_rect().height < (vehicles[self.direction][self.lane][self.index - 1].y - gap2) or
-                                self.x + self.currentImage.get_rect().width < (vehicles[self.direction][self.lane][self.index - 1].x - gap2)):
-                            self.y += self.speed
-            else:
-                if ((self.x + self.currentImage.get_rect().width <= self.stop or self.crossed == 1 or (currentGreen == 0 and currentYellow == 0))
-                        and (self.index == 0 or
-                             self.x + self.currentImage.get_rect().width < (vehicles[self.direction][self.lane][self.index - 1].x - gap2) or
-                             vehicles[self.direction][self.lane][self.index - 1].turned == 1)):
-                    self.x += self.speed
-
-        elif self.direction == 'down':
-            if self.crossed == 0 and self.y + self.currentImage.get_rect().height > stopLines[self.direction]:
-                self.crossed = 1
-                vehicles[self.direction]['crossed'] += 1
-            if self.willTurn == 1:
-                if self.crossed == 0 or self.y + self.currentImage.get_rect().height < mid[self.direction]['y']:
-                    if ((self.y + self.currentImage.get_rect().height <= self.stop or (currentGreen == 1 and currentYellow == 0) or self.crossed == 1)
-                            and (self.index == 0 or
-                                 self.y + self.currentImage.get_rect().height < (vehicles[self.direction][self.lane][self.index - 1].y - gap2) or
-                                 vehicles[self.direction][self.lane][self.index - 1].turned == 1)):
-                        self.y += self.speed
-                else:
-                    if self.turned == 0:
-                        self.rotateAngle += rotationAngle
-                        self.currentImage = pygame.transform.rotate(self.originalImage, -self.rotateAngle)
-                        self.x -= 2.5
-                        self.y += 2
-                        if self.rotateAngle == 90:
-                            self.turned = 1
-                    else:
-                        if (self.index == 0 or
-                                self.x > (vehicles[self.direction][self.lane][self.index - 1].x + vehicles[self.direction][self.lane][self.index - 1].currentImage.get_rect().width + gap2)
-                                or self.y < (vehicles[self.direction][self.lane][self.index - 1].y - gap2)):
-                            self.x -= self.speed
-            else:
-                if ((self.y + self.currentImage.get_rect().height <= self.stop or self.crossed == 1 or (currentGreen == 1 and currentYellow == 0))
-                        and (self.index == 0 or
-                             self.y + self.currentImage.get_rect().height < (vehicles[self.direction][self.lane][self.index - 1].y - gap2) or
-                             vehicles[self.direction][self.lane][self.index - 1].turned == 1)):
-                    self.y += self.speed
-
-        elif self.direction == 'left':
-            if self.crossed == 0 and self.x < stopLines[self.direction]:
-                self.crossed = 1
-                vehicles[self.direction]['crossed'] += 1
-            if self.willTurn == 1:
-                if self.crossed == 0 or self.x > mid[self.direction]['x']:
-                    if ((self.x >= self.stop or (currentGreen == 2 and currentYellow == 0) or self.crossed == 1)
-                            and (self.index == 0 or
-                                 self.x > (vehicles[self.direction][self.lane][self.index - 1].x + vehicles[self.direction][self.lane][self.index - 1].currentImage.get_rect().width + gap2)
-                                 or vehicles[self.direction][self.lane][self.index - 1].turned == 1)):
-                        self.x -= self.speed
-                else:
-                    if self.turned == 0:
-                        self.rotateAngle += rotationAngle
-                        self.currentImage = pygame.transform.rotate(self.originalImage, -self.rotateAngle)
-                        self.x -= 1.8
-                        self.y -= 2.5
-                        if self.rotateAngle == 90:
-                            self.turned = 1
-                    else:
-                        if (self.index == 0 or
-                                self.y > (vehicles[self.direction][self.lane][self.index - 1].y + vehicles[self.direction][self.lane][self.index - 1].currentImage.get_rect().height + gap2) or
-                                self.x > (vehicles[self.direction][self.lane][self.index - 1].x + gap2)):
-                            self.y -= self.speed
-            else:
-                if ((self.x >= self.stop or self.crossed == 1 or (currentGreen == 2 and currentYellow == 0))
-                        and (self.index == 0 or
-                             self.x > (vehicles[self.direction][self.lane][self.index - 1].x + vehicles[self.direction][self.lane][self.index - 1].currentImage.get_rect().width + gap2)
-                             or vehicles[self.direction][self.lane][self.index - 1].turned == 1)):
-                    self.x -= self.speed
-
-        elif self.direction == 'up':
-            if self.crossed == 0 and self.y < stopLines[self.direction]:
-                self.crossed = 1
-                vehicles[self.direction]['crossed'] += 1
-            if self.willTurn == 1:
-                if self.crossed == 0 or self.y > mid[self.direction]['y']:
-                    if ((self.y >= self.stop or (currentGreen == 3 and currentYellow == 0) or self.crossed == 1)
-                            and (self.index == 0 or
-                                 self.y > (vehicles[self.direction][self.lane][self.index - 1].y + vehicles[self.direction][self.lane][self.index - 1].currentImage.get_rect().height + gap2)
-                                 or vehicles[self.direction][self.lane][self.index - 1].turned == 1)):
-                        self.y -= self.speed
-                else:
-                    if self.turned == 0:
-                        self.rotateAngle += rotationAngle
-                        self.currentImage = pygame.transform.rotate(self.originalImage, -self.rotateAngle)
-                        self.x += 1
-                        self.y -= 1
-                        if self.rotateAngle == 90:
-                            self.turned = 1
-                    else:
-                        if (self.index == 0 or
-                                self.x < (vehicles[self.direction][self.lane][self.index - 1].x - vehicles[self.direction][self.lane][self.index - 1].currentImage.get_rect().width - gap2)
-                                or self.y > (vehicles[self.direction][self.lane][self.index - 1].y + gap2)):
-                            self.x += self.speed
-            else:
-                if ((self.y >= self.stop or self.crossed == 1 or (currentGreen == 3 and currentYellow == 0))
-                        and (self.index == 0 or
-                             self.y > (vehicles[self.direction][self.lane][self.index - 1].y + vehicles[self.direction][self.lane][self.index - 1].currentImage.get_rect().height + gap2)
-                             or vehicles[self.direction][self.lane][self.index - 1].turned == 1)):
-                    self.y -= self.speed
+        angle = vehicleStore.angle[self.row]
+        if angle != self.rotateAngle:
+            self.rotateAngle = int(angle)
+            self.currentImage = assets.rotated_vehicle_image(self.direction, self.vehicleClass, self.rotateAngle)
+        screen.blit(self.currentImage, vehicleStore.pos[self.row].tolist())
+
+
+def spawn_vehicle(lane, vehicleClass, direction_number, direction, will_turn):
+    """Spawn a vehicle, reusing a retired sprite when one is available."""
+    with vehicleLock:
+        if vehiclePool:
+            vehicle = vehiclePool.pop()
+            vehicle.reset(lane, vehicleClass, direction_number, direction, will_turn)
+        else:
+            vehicle = Vehicle(lane, vehicleClass, direction_number, direction, will_turn)
+        vehicleSprites[vehicle.row] = vehicle
+    return vehicle
+
+
+def retire_vehicles():
+    """Drop vehicles that have driven off screen; only the crossed counters keep them."""
+    with vehicleLock:
+        for row in vehicleStore.retire_offscreen().tolist():
+            vehicle = vehicleSprites.pop(row)
+            vehicle.kill()
+            vehiclePool.append(vehicle)
+
 
 def apply_scoot_optimization():
-    """Applies SCOOT logic with adaptive scaling for realistic timings."""
+    """Applies SCOOT to the readings since the last plan: one cycle of at most signal_controller.TOTAL_CYCLE_TIME split by queue length."""
     try:
-        if not pending_sensor_readings:
+        latest = sensorBuffer.swap()     # {junction: count}
+        if not latest:
             return
 
-        total_vehicles = sum(pending_sensor_readings.values()) or 1
-
-        # --- SCOOT TUNING CONSTANTS ---
-        BASE_GREEN = 8                 # baseline seconds
-        MAX_GREEN_CAP = 25             # upper bound in seconds for any approach
-        MIN_GREEN_CAP = 8              # minimum even if no traffic
-        DAMPING_FACTOR = 0.55          # less than 1 = gentler response
-        VEHICLE_SCALER = 1.2           # reduces effect of large queues
-
         print("\n📊 SCOOT Reallocation:")
-        adjusted_total = sum(math.sqrt(v + 1) for v in pending_sensor_readings.values())
+        readings = scoot_readings(latest)
+        plan = plan_junction(readings, signalController.currentGreen, noOfSignals)
 
-        for jid, vcount in pending_sensor_readings.items():
-            idx = jid - 1
-            if idx == currentGreen:
+        for jid, vcount in readings.items():
+            if jid not in plan:
                 print(f"⏸️ Junction {jid} currently green — skipping update.")
                 continue
+            signals[jid - 1].green = plan[jid]
+            if eventLog is not None:
+                eventLog.plan(log_time(), jid, plan[jid])
+            print(f"  • Junction {jid}: {vcount} vehicles → {plan[jid]}s green")
 
-            # Normalize both by total traffic and absolute vehicle magnitude
-            share_ratio = (math.sqrt(vcount + 1) / adjusted_total) ** DAMPING_FACTOR
+        print(f"🧮 SCOOT Optimization applied at {time.strftime('%H:%M:%S')}")
+    except Exception as e:
+        print("⚠️ SCOOT optimization error:", e)
 
-            # scale with a soft response to actual queue length
-            traffic_influence = min(vcount / 10, 2.5) / VEHICLE_SCALER  # caps at 2.1x boost
-            new_green = BASE_GREEN + (share_ratio * 10 * traffic_influence)
 
-            # clamp
-            new_green = max(MIN_GREEN_CAP, min(MAX_GREEN_CAP, int(new_green)))
-            signals[idx].green = new_green
+def optimize_signals():
+    apply_scoot_optimization()
 
-            print(f"  • Junction {jid}: {vcount} vehicles → {new_green}s green")
 
-        pending_sensor_readings.clear()
-        print(f"🧮 SCOOT Optimization applied at {time.strftime('%H:%M:%S')}")
-    except Exception as e:
-        print("⚠️ SCOOT optimization error:", e)
+# === LIVE STREAM ===
+# Count changes and phase changes are pushed to /stream subscribers as they happen
+liveStream = live_stream.Broadcaster()
+streamedCounts = {direction: 0 for direction in directionNumbers.values()}
 
 
-def updateValues():
-    """Decrements signals and periodically runs SCOOT optimization."""
-    static_counter = getattr(updateValues, "counter", 0)
-    updateValues.counter = static_counter + 1
+def publish_counts(snapshot):
+    """Push the directions whose waiting count changed (called by vehicleStore under its lock)."""
+    delta = {}
+    for idx, direction in directionNumbers.items():
+        count = sum(snapshot[idx])
+        if count != streamedCounts[direction]:
+            streamedCounts[direction] = delta[direction] = count
+    if delta:
+        liveStream.publish("counts", {"counts": delta, "time": time.time()},
+                           state={"counts": dict(streamedCounts), "time": time.time()})
 
-    # Every SCOOT_UPDATE_INTERVAL seconds, optimize
-    if updateValues.counter >= SCOOT_UPDATE_INTERVAL:
-        updateValues.counter = 0
-        with pending_lock:
-            apply_scoot_optimization()
 
-    # Normal countdown logic (always runs)
-    for i in range(noOfSignals):
-        if i == currentGreen:
-            if currentYellow == 0:
-                signals[i].green = max(0, signals[i].green - 1)
-                signals[i].totalGreenTime += 1
-            else:
-                signals[i].yellow = max(0, signals[i].yellow - 1)
-        else:
-            signals[i].red = max(0, signals[i].red - 1)
+def publish_phase(controller):
+    """Push the new signal phase and when every signal changes next."""
+    liveStream.publish("phase", {
+        "green": controller.currentGreen,
+        "yellow": controller.currentYellow,
+        "remaining": [round(controller.remaining(i), 2) for i in range(noOfSignals)],
+        "time": time.time(),
+    })
+
+
+def phase_changed(controller):
+    publish_phase(controller)
+    greenHistory.append((log_time(), controller.currentGreen))
+    if eventLog is not None:
+        eventLog.phase(log_time(), controller.currentGreen, controller.currentYellow)
+
+
+vehicleStore.on_waiting = publish_counts
+liveStream.publish("status", {"running": True})
 
 
 # === INITIALIZATION ===
-# === INITIALIZATION ===
+# Signal plan: phase changes and SCOOT runs are events on a monotonic-clock scheduler
+signalScheduler = Scheduler()
+signalController = SignalController(signals, signalScheduler,
+                                    on_yellow=vehicleStore.reset_stops,
+                                    optimizer=optimize_signals,
+                                    on_phase=phase_changed)
+
+
 def initialize():
-    ts1 = TrafficSignal(0, defaultYellow, defaultGreen, defaultMinimum, defaultMaximum)
-    signals.append(ts1)
-    ts2 = TrafficSignal(ts1.red + ts1.yellow + ts1.green, defaultYellow, defaultGreen, defaultMinimum, defaultMaximum)
-    signals.append(ts2)
-    ts3 = TrafficSignal(defaultRed, defaultYellow, defaultGreen, defaultMinimum, defaultMaximum)
-    ts4 = TrafficSignal(defaultRed, defaultYellow, defaultGreen, defaultMinimum, defaultMaximum)
-    signals.append(ts3)
-    signals.append(ts4)
-    repeat()
-
-
-def repeat():
-    global currentGreen, currentYellow, nextGreen
-    while signals[currentGreen].green > 0:
-        updateValues()
-        time.sleep(1)
-    currentYellow = 1
-    for i in range(3):
-        stops[directionNumbers[currentGreen]][i] = defaultStop[directionNumbers[currentGreen]]
-        for vehicle in vehicles[directionNumbers[currentGreen]][i]:
-            vehicle.stop = defaultStop[directionNumbers[currentGreen]]
-    while signals[currentGreen].yellow > 0:
-        updateValues()
-        time.sleep(1)
-    currentYellow = 0
-    signals[currentGreen].green = defaultGreen
-    signals[currentGreen].yellow = defaultYellow
-    signals[currentGreen].red = defaultRed
-    currentGreen = nextGreen
-    nextGreen = (currentGreen + 1) % noOfSignals
-    signals[nextGreen].red = signals[currentGreen].yellow + signals[currentGreen].green
-    repeat()
+    """Start the signal plan and run its scheduler on this thread."""
+    signalController.start()
+    signalScheduler.run_forever()
 
 
 def generateVehicles():
     while True:
-        vehicle_type = random.randint(0, 4)
-        lane_number = 0 if vehicle_type == 4 else random.randint(0, 1) + 1
-        will_turn = 1 if lane_number == 2 and random.randint(0, 4) <= 2 else 0
-        direction_number = random.randint(0, 3)
-        Vehicle(lane_number, vehicleTypes[vehicle_type], direction_number, directionNumbers[direction_number], will_turn)
+        vehicle_type = spawnRng.randint(0, 4)
+        lane_number = 0 if vehicle_type == 4 else spawnRng.randint(0, 1) + 1
+        will_turn = 1 if lane_number == 2 and spawnRng.randint(0, 4) <= 2 else 0
+        direction_number = spawnRng.randint(0, 3)
+        if eventLog is not None:
+            eventLog.spawn(log_time(), lane_number, vehicle_type, direction_number, will_turn)
+        spawn_vehicle(lane_number, vehicleTypes[vehicle_type], direction_number, directionNumbers[direction_number], will_turn)
         time.sleep(0.75)
 
 def get_vehicle_counts():
@@ -390,32 +223,23 @@ def get_vehicle_counts():
     Counts how many vehicles are waiting (not crossed) at each direction.
     Returns a dict like: {'right': 12, 'down': 8, 'left': 15, 'up': 10}
     """
-    global vehicles, directionNumbers
-    counts = {}
-    for direction in directionNumbers.values():
-        waiting = 0
-        for lane in range(3):  # 3 lanes per direction
-            waiting += sum(1 for v in vehicles[direction][lane] if v.crossed == 0)
-        counts[direction] = waiting
-    return counts
+    waiting = vehicleStore.waiting_counts()
+    return {direction: waiting[idx] for idx, direction in directionNumbers.items()}
 
 
-import json
 import socket
 
+import wire_format
+
 def send_simulated_sensor_data(host="127.0.0.1", port=5051, interval=2):
-    """Send realistic sensor data based on current vehicle queues."""
+    """Send realistic sensor data based on current vehicle queues, all four approaches in one frame."""
     sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
     while True:
         counts = get_vehicle_counts()
-        for idx, direction in directionNumbers.items():
-            payload = {
-                "junction_id": idx + 1,
-                "vehicles_detected": counts[direction],
-                "timestamp": time.time()
-            }
-            sock.sendto(json.dumps(payload).encode(), (host, port))
-            print(f"📡 Sent sensor for {direction.upper()} (Junction {idx+1}): {counts[direction]} vehicles")
+        readings = [(idx + 1, counts[direction]) for idx, direction in directionNumbers.items()]
+        sock.sendto(wire_format.encode_frame(readings, timestamp=time.time()), (host, port))
+        print("📡 Sent sensor frame: " + ", ".join(
+            f"{direction.upper()} (Junction {idx+1}): {counts[direction]}" for idx, direction in directionNumbers.items()))
         time.sleep(interval)
 
 def simulationTime():
@@ -423,9 +247,20 @@ def simulationTime():
     while True:
         timeElapsed += 1
         time.sleep(1)
+        kpiRecorder.sample_queues(time.monotonic(), vehicleStore.waiting_counts())
+        if timeElapsed % READINGS_FLUSH_INTERVAL == 0:
+            readingStore.flush()
         if timeElapsed == simTime:
-            totalVehicles = sum(vehicles[d]['crossed'] for d in directionNumbers.values())
+            totalVehicles = int(vehicleStore.crossedCount.sum())
             print("Total vehicles passed:", totalVehicles)
+            print(format_report(kpi_report()))
+            frameReport = telemetry.frames.report()
+            if frameReport["frames"]:
+                print(f"🎞️ {frameReport['fps']} fps, frame p99 {frameReport['frame']['p99_ms']} ms")
+            if eventLog is not None:
+                eventLog.flush()
+            readingStore.flush()
+            write_flamegraph()
             pygame.quit()
             sys.exit()
 
@@ -437,55 +272,228 @@ except Exception:
     start_udp_listener = None
     print("⚠️ network_listener not found; UDP listener disabled.")
 
-# Thread-safe storage for latest readings from sensors
-pending_lock = threading.Lock()
-pending_sensor_readings = {}  # maps junction_id -> last vehicles_detected
+# Latest admitted reading per junction: the ingest thread writes the back buffer, the controller swaps it out at plan time
+sensorBuffer = ReadingBuffer()
+
+# Every reading with the green in force, for /readings and smoothed SCOOT plans; run_simulation(readings=DIR) maps it to disk
+readingStore = TimeSeriesStore()
+READINGS_FLUSH_INTERVAL = 5   # seconds between writes of a memory-mapped store
+
+# Duplicate, out-of-order and stale readings stop here (used by the ingest thread only)
+readingFilter = ReadingFilter()
+
+# Arrival rates learned from the readings, and when each approach turned green, to tell which readings were on red
+forecaster = ArrivalForecaster(noOfSignals)
+greenHistory = collections.deque(maxlen=64)   # (log time, current green), appended by phase_changed
+
+# Listener -> ingest handoff: the listener thread only appends, the ingest thread drains.
+# deque.append/popleft are atomic, so neither side takes a lock for it.
+SENSOR_QUEUE_LIMIT = 10000
+sensorQueue = collections.deque(maxlen=SENSOR_QUEUE_LIMIT)
+INGEST_INTERVAL = 0.05        # seconds the ingest thread sleeps once the queue is empty
 
 # min/max green times (same as defaults used in your simulation)
 GREEN_MIN = defaultMinimum
 GREEN_MAX = defaultMaximum
 
+def is_count(value, low, high):
+    """value is an integer (not a bool, float or string) in low..high."""
+    return isinstance(value, int) and not isinstance(value, bool) and low <= value <= high
+
+
 def handle_sensor_data(payload):
-    """Receives live vehicle counts from sensors (UDP) and stores them."""
+    """Receives live vehicle counts from sensors (UDP) and stores the ones readingFilter admits."""
+    # Counted as invalid, before the filter, store and forecaster see them: their int32/int64 columns
+    # and the event log's unsigned fields raise on anything out of range
+    jid = payload.get("junction_id")
+    vehicles_count = payload.get("vehicles_detected")
+    seq = payload.get("seq")
+    timestamp = payload.get("timestamp")
+    if (not is_count(jid, 1, noOfSignals) or not is_count(vehicles_count, 0, wire_format.MAX_VEHICLES)
+            or not (seq is None or is_count(seq, 0, 2 ** 63 - 1))):
+        readingFilter.stats["invalid"] += 1
+        return
     try:
-        jid = int(payload.get("junction_id", 0))
-        vehicles_count = int(payload.get("vehicles_detected", 0))
-    except Exception:
-        print("⚠️ Invalid sensor payload:", payload)
+        timestamp = None if timestamp is None else float(timestamp)
+    except (TypeError, ValueError):
+        timestamp = math.nan
+    if timestamp is not None and not math.isfinite(timestamp):
+        readingFilter.stats["invalid"] += 1
+        return
+    if not readingFilter.accept(jid, seq, timestamp, payload.get("source")):
         return
 
-    with pending_lock:
-        pending_sensor_readings[jid] = vehicles_count
+    sensorBuffer.write(jid, vehicles_count)
+    t = reading_time(payload)
+    readingStore.append(t, jid, vehicles_count, seq, signals[jid - 1].green)
+    forecaster.update(jid - 1, t, vehicles_count, green_at(t) != jid - 1)
+    if eventLog is not None:
+        eventLog.sensor(log_time(), jid, vehicles_count)
 
 
-if start_udp_listener:
+def reading_time(payload):
+    """When a reading was taken on the log clock: its sender's timestamp, or now if it has none."""
     try:
-        start_udp_listener(handle_sensor_data)
-    except Exception as e:
-        print("⚠️ Failed to start UDP listener:", e)
+        age = max(0.0, time.time() - float(payload["timestamp"]))
+    except (KeyError, TypeError, ValueError):
+        age = 0.0
+    return log_time() - age
+
+
+def green_at(t):
+    """The approach that had green (or yellow) at log time t."""
+    for since, green in reversed(list(greenHistory)):   # copied: phase_changed appends from the controller thread
+        if since <= t:
+            return green
+    return signalController.currentGreen
+
+
+def scoot_readings(latest):
+    """
+    What SCOOT plans from, for the junctions in latest: the queues expected when each approach turns
+    green (SCOOT_FORECAST), the mean reading over SCOOT_SMOOTHING_WINDOW seconds, or latest itself.
+    """
+    if SCOOT_FORECAST:
+        green = signalController.currentGreen
+        expected = forecaster.predict([0.0 if i == green else signalController.remaining(i) for i in range(noOfSignals)])
+        return {jid: round(float(expected[jid - 1]), 2) for jid in latest}
+    if not SCOOT_SMOOTHING_WINDOW:
+        return latest
+    means = readingStore.rolling_mean(SCOOT_SMOOTHING_WINDOW, noOfSignals)
+    return {jid: round(float(means[jid - 1]), 2) for jid in latest}
+
+
+def drain_sensor_readings():
+    """Pass every queued sensor payload through handle_sensor_data (newest admitted reading per junction wins)."""
+    while True:
+        try:
+            payload = sensorQueue.popleft()
+        except IndexError:
+            return
+        # One bad reading costs that reading, not the ingest thread
+        try:
+            handle_sensor_data(payload)
+        except Exception:
+            readingFilter.stats["failed"] += 1
+            logging.exception(f"Sensor reading {payload!r} failed")
+
+
+def ingest_sensor_readings():
+    """Ingest thread: the only writer of readingFilter, readingStore, forecaster and sensorBuffer."""
+    while True:
+        drain_sensor_readings()
+        time.sleep(INGEST_INTERVAL)
+
+
+def start_sensor_listener(seed=None):
+    if start_udp_listener:
+        try:
+            start_udp_listener(sensorQueue.append, rng=rng_stream(seed, "ack"))
+        except Exception as e:
+            print("⚠️ Failed to start UDP listener:", e)
 # --- END SNIPPET ---
 
-# === FLASK SERVER FOR REAL-TIME VEHICLE DATA ===
-app = Flask(__name__)
+# === HTTP API ===
 simulation_running = True  # Shared flag to tell nodes if sim is active
-@app.route("/counts", methods=["GET"])
-def get_counts_api():
-    """Return live vehicle counts as JSON."""
-    try:
-        counts = get_vehicle_counts()
-        return jsonify(counts)
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+THROUGHPUT_WINDOW = 60     # seconds behind the vehicles-per-minute figure
+crossedHistory = collections.deque()   # (time, total crossed), appended by the snapshot thread
+
+
+def build_snapshot():
+    """Everything the API serves, read once per refresh without taking the vehicle lock."""
+    now = time.time()
+    crossed = vehicleStore.crossedCount.tolist()
+    total = sum(crossed)
+    crossedHistory.append((now, total))
+    while crossedHistory[0][0] < now - THROUGHPUT_WINDOW:
+        crossedHistory.popleft()
+    first_time, first_total = crossedHistory[0]
+    per_minute = (total - first_total) * 60.0 / (now - first_time) if now > first_time else 0.0
+
+    currentGreen, currentYellow = signalController.currentGreen, signalController.currentYellow
+    return {
+        "time": now,
+        "running": simulation_running,
+        "time_elapsed": timeElapsed,
+        "counts": get_vehicle_counts(),
+        "signals": [{
+            "direction": directionNumbers[i],
+            "state": ("yellow" if currentYellow else "green") if i == currentGreen else "red",
+            "remaining": round(signalController.remaining(i), 2),
+            "green": signals[i].green,
+            "green_time": round(signalController.green_time(i), 2),
+        } for i in range(noOfSignals)],
+        "throughput": {
+            "crossed": {directionNumbers[i]: crossed[i] for i in range(noOfSignals)},
+            "total": total,
+            "per_minute": round(per_minute, 2),
+        },
+    }
+
+
+# Frame phases timed by the main loop, in the order they run
+FRAME_PHASES = ("events", "signals", "text", "physics", "vehicles", "display", "idle")
+telemetry = Telemetry(FRAME_PHASES)
+
+
+def kpi_report():
+    """Per-approach delay, stops, 95th-percentile queue and throughput per hour of green."""
+    return kpiRecorder.report(vehicleStore.crossedCount.tolist(),
+                              [signalController.green_time(i) for i in range(noOfSignals)])
+
+
+def readings_report(seconds, junction=None):
+    """The readings of the last `seconds` as columns, each junction's mean count over them and its arrival rate."""
+    rows = readingStore.window(seconds, now=log_time(), junction=junction)
+    means = readingStore.rolling_mean(seconds, noOfSignals, now=log_time())
+    return {
+        "columns": {name: values.tolist() for name, values in rows.items()},
+        "mean": {directionNumbers[i]: None if math.isnan(means[i]) else round(float(means[i]), 2)
+                 for i in range(noOfSignals)},
+        "arrival_rate": {directionNumbers[i]: round(float(forecaster.rate[i]), 3) for i in range(noOfSignals)},
+        "ingest": dict(readingFilter.stats),
+        "store": dict(readingStore.stats),
+        "handoff": {**sensorBuffer.stats, "queued": len(sensorQueue)},
+    }
+
+
+def write_flamegraph():
+    if flamegraphPath:
+        telemetry.sampler.write(flamegraphPath)
+        print(f"🔥 Profiler samples written to {flamegraphPath}")
+
+
+apiCache = api_server.SnapshotCache(build_snapshot)
+app = api_server.create_app(apiCache, stream=liveStream, ingest=sensorQueue.append, kpi=kpi_report,
+                             profile=telemetry, readings=readings_report)
 
 
 def start_flask_server():
-    """Run Flask server in a background thread."""
+    """Run the API server in a background thread."""
     # You can change host to "0.0.0.0" if you want to access it from another PC on your network
-    app.run(host="127.0.0.1", port=5055, debug=False, use_reloader=False)
+    apiCache.start()
+    api_server.serve(app, "127.0.0.1", 5055)
+
 
+def run_simulation(seed=None, record=None, fps=FRAMES_PER_SECOND, profile=False, flamegraph=None, readings=None):
+    """
+    Start the traffic simulation and visualization.
+    seed fixes the spawner's and the simulated ACK loss's random streams;
+    record is a path for a binary event log of the run (see event_log.py).
+    fps caps the frame rate (0 runs uncapped); profile starts the sampling
+    profiler at once, and its samples go to flamegraph (a path) on exit.
+    readings is a directory to keep the sensor readings in (see timeseries.py).
+    """
+    global spawnRng, eventLog, logStart, flamegraphPath, readingStore
+    spawnRng = rng_stream(seed, "spawn")
+    flamegraphPath = flamegraph
+    if readings:
+        readingStore = TimeSeriesStore(path=readings)
+    logStart = time.monotonic()
+    if record:
+        eventLog = EventLog(open(record, "wb"), {"seed": seed, "source": "simulation"})
+    start_sensor_listener(seed)
 
-def run_simulation():
-    """Start the traffic simulation and visualization."""
     thread4 = threading.Thread(name="simulationTime", target=simulationTime, daemon=True)
     thread4.start()
 
@@ -494,14 +502,30 @@ def run_simulation():
 
     black, white = (0, 0, 0), (255, 255, 255)
     screenWidth, screenHeight = 1400, 800
-    background = pygame.image.load(os.path.join(IMG_DIR, 'mod_int.png'))
     screen = pygame.display.set_mode((screenWidth, screenHeight))
     pygame.display.set_caption("SIMULATION")
+    background = assets.load_image('mod_int.png', alpha=False)
 
-    redSignal = pygame.image.load(os.path.join(IMG_DIR, "signals", "red.png"))
-    yellowSignal = pygame.image.load(os.path.join(IMG_DIR, "signals", "yellow.png"))
-    greenSignal = pygame.image.load(os.path.join(IMG_DIR, "signals", "green.png"))
+    redSignal = assets.load_image("signals", "red.png")
+    yellowSignal = assets.load_image("signals", "yellow.png")
+    greenSignal = assets.load_image("signals", "green.png")
     font = pygame.font.Font(None, 30)
+    textCache = {}
+
+    def render_text(text, foreground, background):
+        """font.render, reusing the surface while the text stays the same (most frames)."""
+        key = (text, foreground, background)
+        surface = textCache.get(key)
+        if surface is None:
+            if len(textCache) > 256:
+                textCache.clear()
+            surface = textCache[key] = font.render(text, True, foreground, background)
+        return surface
+
+    clock = pygame.time.Clock()
+    frames = telemetry.frames
+    if profile:
+        telemetry.sampler.start()
 
     thread3 = threading.Thread(name="generateVehicles", target=generateVehicles, daemon=True)
     thread3.start()
@@ -513,17 +537,26 @@ def run_simulation():
     )
     thread5.start()
 
+    thread6 = threading.Thread(name="sensorIngest", target=ingest_sensor_readings, daemon=True)
+    thread6.start()
+
     # Start Flask server in background
     thread_flask = threading.Thread(name="flaskServer", target=start_flask_server, daemon=True)
     thread_flask.start()
-    print("🌐 Flask server running at http://127.0.0.1:5055/counts")
+    print("🌐 API server running at http://127.0.0.1:5055/counts (also /snapshot, /history, /stream)")
 
     # --- Graceful shutdown handler ---
     def handle_exit(*args):
         global simulation_running
         print("🛑 Simulation window closed — notifying all sensor nodes to stop.")
         simulation_running = False
+        liveStream.publish("status", {"running": False})
+        if eventLog is not None:
+            eventLog.flush()
+        readingStore.flush()
+        write_flamegraph()
         time.sleep(1)
+        logging.shutdown()           # os._exit skips atexit: write out the listener's queued log lines
         pygame.quit()
         os._exit(0)
 
@@ -533,70 +566,79 @@ def run_simulation():
 
     # --- Main Simulation Loop ---
     while True:
+        frames.start()
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 handle_exit()
+        frames.lap("events")
 
         screen.blit(background, (0, 0))
 
+        currentGreen, currentYellow = signalController.currentGreen, signalController.currentYellow
         for i in range(noOfSignals):
+            remaining = math.ceil(signalController.remaining(i))
             if i == currentGreen:
                 if currentYellow == 1:
-                    if signals[i].yellow == 0:
+                    if remaining == 0:
                         signals[i].signalText = "STOP"
                     else:
-                        signals[i].signalText = str(signals[i].yellow)
+                        signals[i].signalText = str(remaining)
                     screen.blit(yellowSignal, signalCoods[i])
                 else:
-                    if signals[i].green == 0:
+                    if remaining == 0:
                         signals[i].signalText = "SLOW"
                     else:
-                        signals[i].signalText = str(signals[i].green)
+                        signals[i].signalText = str(remaining)
                     screen.blit(greenSignal, signalCoods[i])
             else:
-                if signals[i].red <= 10:
-                    if signals[i].red == 0:
+                if remaining <= 10:
+                    if remaining == 0:
                         signals[i].signalText = "GO"
                     else:
-                        signals[i].signalText = str(signals[i].red)
+                        signals[i].signalText = str(remaining)
                 else:
                     signals[i].signalText = "---"
                 screen.blit(redSignal, signalCoods[i])
+        frames.lap("signals")
 
         for i in range(noOfSignals):
-            signalTextSurface = font.render(str(signals[i].signalText), True, white, black)
+            signalTextSurface = render_text(str(signals[i].signalText), white, black)
             screen.blit(signalTextSurface, signalTimerCoods[i])
-            displayText = vehicles[directionNumbers[i]]['crossed']
-            vehicleCountSurface = font.render(str(displayText), True, black, white)
+            displayText = vehicleStore.crossedCount[i]
+            vehicleCountSurface = render_text(str(displayText), black, white)
             screen.blit(vehicleCountSurface, vehicleCountCoods[i])
 
-        timeElapsedSurface = font.render("Time Elapsed: " + str(timeElapsed), True, black, white)
+        timeElapsedSurface = render_text("Time Elapsed: " + str(timeElapsed), black, white)
         screen.blit(timeElapsedSurface, (1100, 50))
+        frames.lap("text")
 
+        vehicleStore.step(currentGreen, currentYellow)
+        retire_vehicles()
+        frames.lap("physics")
         for vehicle in simulation:
-            screen.blit(vehicle.currentImage, [vehicle.x, vehicle.y])
-            vehicle.move()
+            vehicle.render(screen)
+        frames.lap("vehicles")
 
         pygame.display.update()
-
-
-# === FLASK SERVER FOR REAL-TIME VEHICLE DATA ===
-app = Flask(__name__)
-
-@app.route("/counts", methods=["GET"])
-def get_counts_api():
-    """Return live vehicle counts as JSON."""
-    try:
-        counts = get_vehicle_counts()
-        return jsonify({"running": simulation_running, "counts": counts})
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
-
-
-def start_flask_server():
-    """Run Flask server in a background thread."""
-    app.run(host="127.0.0.1", port=5055, debug=False, use_reloader=False)
+        frames.lap("display")
+        clock.tick(fps)
+        frames.lap("idle")
+        frames.end()
 
 
 if __name__ == "__main__":
-    run_simulation()
+    parser = argparse.ArgumentParser(description="Adaptive traffic simulation (pygame window)")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for the spawner and the simulated ACK loss")
+    parser.add_argument("--record", metavar="PATH", help="Write a binary event log of the run")
+    parser.add_argument("--fps", type=int, default=FRAMES_PER_SECOND,
+                        help=f"Frame rate cap (default: {FRAMES_PER_SECOND}, 0 for uncapped)")
+    parser.add_argument("--profile", action="store_true", help="Start the sampling profiler with the simulation")
+    parser.add_argument("--flamegraph", metavar="PATH", help="Write the profiler's collapsed stacks here on exit")
+    parser.add_argument("--readings", metavar="DIR", help="Keep the sensor readings as memory-mapped columns here")
+    add_logging_arguments(parser)
+    args = parser.parse_args()
+    if start_udp_listener:
+        import network_listener
+        apply_logging_arguments(args, network_listener.LOG_FILE, network_listener.packetLog)
+    run_simulation(args.seed, args.record, args.fps, args.profile or bool(args.flamegraph), args.flamegraph,
+                   args.readings)
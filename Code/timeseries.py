@@ -0,0 +1,145 @@
+"""
+Columnar history of sensor readings.
+
+Each reading is one row: time, junction, count, sequence number (-1 when
+the sender did not number it) and the green split in force for that
+junction when it arrived. Every column is its own preallocated NumPy
+array of `capacity` rows used as a ring. Memory stays fixed and, once
+full, the oldest rows are overwritten. The time column is kept sorted for
+the window queries. Readings of different junctions reach the store a
+little out of time order: every sender stamps its own, and packets are
+delayed and retransmitted. So a row older than the newest is inserted
+where its time belongs, shifting the newer rows up by one, if that place
+is within the last REORDER_DEPTH rows (stats["reordered"]). A row older
+than that is dropped and counted in stats["late"], never stored with a
+time it was not taken at.
+
+With path, the columns are memory-mapped .npy files in that directory.
+flush() writes the dirty pages and meta.json (the row count). load(path)
+reads a saved store back in time order.
+
+One thread appends and any number read, without a lock. append() writes
+the row before it bumps `total`. Readers take `total` once and look only
+below it, and they drop rows the writer lapped while they were copying.
+A reader that copies the last rows while a late row shifts them may see
+one of them twice or miss it.
+"""
+import json
+import os
+
+import numpy as np
+
+
+# === STORE SETTINGS ===
+CAPACITY = 1 << 16           # rows kept (about 9 hours of 4 junctions every 2 s)
+REORDER_DEPTH = 256          # newest rows a late row may be inserted among (about a minute of 4 junctions at 1 s)
+COLUMNS = {
+    "time": np.float64,      # seconds (the run's log clock)
+    "junction": np.int32,
+    "count": np.int32,       # vehicles detected
+    "seq": np.int64,         # sender's sequence number, -1 if none
+    "green": np.int32,       # green seconds in force for the junction
+}
+
+
+class TimeSeriesStore:
+    """Append-only ring of reading rows, one NumPy array per column; optionally memory-mapped under path."""
+
+    def __init__(self, capacity=CAPACITY, path=None):
+        self.capacity = capacity
+        self.path = path
+        self.total = 0       # rows ever appended; row i lives at i % capacity
+        self.stats = {"appended": 0, "reordered": 0, "late": 0}
+        if path is None:
+            self.columns = {name: np.zeros(capacity, dtype) for name, dtype in COLUMNS.items()}
+        else:
+            os.makedirs(path, exist_ok=True)
+            self.columns = {name: np.lib.format.open_memmap(os.path.join(path, f"{name}.npy"), "w+", dtype, (capacity,))
+                            for name, dtype in COLUMNS.items()}
+        self.time = self.columns["time"]
+
+    def append(self, t, junction, count, seq=-1, green=0):
+        """Add one reading in time order and return True; False if it is older than the last REORDER_DEPTH rows."""
+        total, capacity, columns = self.total, self.capacity, self.columns
+        time = columns["time"]
+        depth = min(total, REORDER_DEPTH, capacity - 1)
+        newer = 0            # stored rows with a later time, all among the newest
+        while newer < depth and time[(total - 1 - newer) % capacity] > t:
+            newer += 1
+        if newer:
+            # All depth rows are newer: t still fits right behind them if the row before is not
+            if newer == depth and total > depth and time[(total - 1 - depth) % capacity] > t:
+                self.stats["late"] += 1
+                return False
+            index = np.arange(total - newer, total + 1) % capacity
+            for column in columns.values():
+                column[index[1:]] = column[index[:-1]]
+            self.stats["reordered"] += 1
+        i = (total - newer) % capacity
+        columns["time"][i] = t
+        columns["junction"][i] = junction
+        columns["count"][i] = count
+        columns["seq"][i] = -1 if seq is None else seq
+        columns["green"][i] = green
+        self.total += 1
+        self.stats["appended"] += 1
+        return True
+
+    def flush(self):
+        """Write a memory-mapped store's pages and row count to disk (no-op in memory)."""
+        if self.path is None:
+            return
+        for column in self.columns.values():
+            column.flush()
+        with open(os.path.join(self.path, "meta.json"), "w") as f:
+            json.dump({"total": self.total, "capacity": self.capacity}, f)
+
+    # --- Queries ---
+    def _ordered(self, start, end):
+        """Ring positions of logical rows start..end-1, in time order."""
+        return np.arange(start, end) % self.capacity
+
+    def window(self, seconds, now=None, junction=None):
+        """{column: array} of the rows from the last `seconds` (before `now`, default the newest row), oldest first."""
+        total = self.total
+        start = max(0, total - self.capacity)
+        if total == start:
+            return {name: np.zeros(0, dtype) for name, dtype in COLUMNS.items()}
+        # Times are sorted along the logical rows: binary-search the two contiguous halves of the ring
+        head, tail = start % self.capacity, (total - 1) % self.capacity + 1
+        if now is None:
+            now = self.time[(total - 1) % self.capacity]
+        since = now - seconds
+        if head < tail:
+            first = start + int(np.searchsorted(self.time[head:tail], since, "left"))
+        else:
+            older = self.time[head:]
+            k = int(np.searchsorted(older, since, "left"))
+            first = start + k if k < len(older) else start + len(older) + int(np.searchsorted(self.time[:tail], since, "left"))
+        index = self._ordered(first, total)
+        rows = {name: column[index] for name, column in self.columns.items()}
+        lapped = self.total - self.capacity - first
+        if lapped > 0:       # the writer overwrote the oldest rows while they were copied
+            rows = {name: values[lapped:] for name, values in rows.items()}
+        keep = rows["time"] <= now
+        if junction is not None:
+            keep &= rows["junction"] == junction
+        return {name: values[keep] for name, values in rows.items()}
+
+    def rolling_mean(self, seconds, junctions, now=None):
+        """Mean count per junction 1..junctions over the window (NaN where a junction sent nothing)."""
+        rows = self.window(seconds, now)
+        size = junctions + 1
+        n = np.bincount(rows["junction"], minlength=size)[:size]
+        sums = np.bincount(rows["junction"], weights=rows["count"], minlength=size)[:size]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return (sums / n)[1:]
+
+
+def load(path):
+    """{column: array} of a saved store's rows, oldest first."""
+    with open(os.path.join(path, "meta.json")) as f:
+        meta = json.load(f)
+    total, capacity = meta["total"], meta["capacity"]
+    index = np.arange(max(0, total - capacity), total) % capacity
+    return {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")[index] for name in COLUMNS}
@@ -0,0 +1,417 @@
+"""
+Structure-of-arrays vehicle store.
+
+Every spawned vehicle is one row: position, size, speed, stop offset, leader row
+and crossed/turned flags live in NumPy arrays, and step() advances all of them
+with one batched kinematics update per frame. The queueing, stop and turning
+rules are the ones the pygame Vehicle sprites used to apply one by one.
+"""
+import math
+import os
+import struct
+import threading
+import time
+
+import numpy as np
+
+from kpi import VEHICLE_RECORD
+
+
+# === VEHICLE SPEED ===
+speeds = {'car': 2.25, 'bus': 1.8, 'truck': 1.8, 'rickshaw': 2, 'bike': 2.5}
+
+# === PATH HANDLING ===
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+IMG_DIR = os.path.join(BASE_DIR, "images")
+
+# === COORDINATES ===
+x = {'right': [0, 0, 0], 'down': [755, 727, 697], 'left': [1400, 1400, 1400], 'up': [602, 627, 657]}
+y = {'right': [348, 370, 398], 'down': [0, 0, 0], 'left': [498, 466, 436], 'up': [800, 800, 800]}
+vehicleTypes = {0: 'car', 1: 'bus', 2: 'truck', 3: 'rickshaw', 4: 'bike'}
+directionNumbers = {0: 'right', 1: 'down', 2: 'left', 3: 'up'}
+stopLines = {'right': 590, 'down': 330, 'left': 800, 'up': 535}
+defaultStop = {'right': 580, 'down': 320, 'left': 810, 'up': 545}
+mid = {'right': {'x': 705, 'y': 445}, 'down': {'x': 695, 'y': 450},
+       'left': {'x': 695, 'y': 425}, 'up': {'x': 695, 'y': 400}}
+rotationAngle = 3
+gap = 15
+gap2 = 15
+screenWidth, screenHeight = 1400, 800
+
+# === DIRECTION GEOMETRY ===
+# Axis of travel (0 = x, 1 = y) and its sign; a turning vehicle ends up travelling in turnsInto[direction]
+# and is nudged by turnOffsets[direction] on every frame of the turn.
+directionAxis = {'right': 0, 'down': 1, 'left': 0, 'up': 1}
+directionSign = {'right': 1, 'down': 1, 'left': -1, 'up': -1}
+turnsInto = {'right': 'down', 'down': 'left', 'left': 'up', 'up': 'right'}
+turnOffsets = {'right': (2, 1.8), 'down': (-2.5, 2), 'left': (-1.8, -2.5), 'up': (1, -1)}
+
+
+# === SPRITE SIZES (read from the PNG headers, no pygame needed) ===
+def image_size(path):
+    """Return (width, height) of a PNG file from its IHDR chunk."""
+    with open(path, "rb") as f:
+        header = f.read(24)
+    width, height = struct.unpack(">II", header[16:24])
+    return width, height
+
+
+def rotated_size(width, height, angle):
+    """Bounding box of a width x height sprite rotated by angle degrees, as pygame.transform.rotate reports it."""
+    if angle % 90 == 0:
+        return (height, width) if angle % 180 else (width, height)
+    rad = math.radians(angle)
+    c, s = abs(math.cos(rad)), abs(math.sin(rad))
+    return int(width * c + height * s), int(width * s + height * c)
+
+
+vehicleSizes = {
+    (direction, vehicleClass): image_size(os.path.join(IMG_DIR, direction, f"{vehicleClass}.png"))
+    for direction in directionNumbers.values()
+    for vehicleClass in vehicleTypes.values()
+}
+
+# Per-direction lookup arrays, indexed by direction number
+_DIRECTIONS = [directionNumbers[i] for i in range(4)]
+_AXIS = np.array([directionAxis[d] for d in _DIRECTIONS], dtype=np.int64)
+_STOP_LINE = np.array([stopLines[d] for d in _DIRECTIONS], dtype=np.float64)
+_SIGNED_DEFAULT_STOP = np.array([directionSign[d] * defaultStop[d] for d in _DIRECTIONS], dtype=np.float64)
+_MID = np.array([mid[d]['xy'[directionAxis[d]]] for d in _DIRECTIONS], dtype=np.float64)
+_TURN_OFFSET = np.array([turnOffsets[d] for d in _DIRECTIONS], dtype=np.float64)
+_NEW_AXIS = np.array([directionAxis[turnsInto[d]] for d in _DIRECTIONS], dtype=np.int64)
+
+# Bounding box of every (direction, vehicle class) sprite at every rotationAngle step of a turn
+_SIZE_KEYS = {key: i for i, key in enumerate(vehicleSizes)}
+_ROTATION_STEPS = 90 // rotationAngle + 1
+_ROTATED_SIZES = np.array([[rotated_size(w, h, step * rotationAngle) for step in range(_ROTATION_STEPS)]
+                           for (w, h) in vehicleSizes.values()], dtype=np.float64)
+
+# Lane entry points, indexed by [direction number, lane]
+_SPAWN = np.array([[[x[d][lane], y[d][lane]] for lane in range(3)] for d in _DIRECTIONS], dtype=np.float64)
+
+INITIAL_CAPACITY = 256
+STOP_RELEASE = 0.5           # seconds a vehicle must drive without halting before its next halt counts as a stop
+
+
+class VehicleStore:
+    """
+    All vehicles of one or more intersections, one array row per vehicle.
+    Every junction has its own screen coordinates; a row's junction picks the
+    signals it obeys, and per-approach counters are indexed junction * 4 + direction.
+    Rows of vehicles that have left the screen are parked on a free list and
+    handed to the next spawn, so the arrays stay as large as the busiest moment.
+    With a kpi.KpiRecorder, every vehicle's timings (stamped on clock) go to it as the vehicle leaves.
+    Its delay is its time to the stop line less the time it would take without stopping. A halt
+    counts as a stop only after STOP_RELEASE seconds of driving, so creeping up a queue or
+    tailing a slower vehicle is not a stop on every frame.
+    """
+
+    def __init__(self, capacity=INITIAL_CAPACITY, junctions=1, clock=time.monotonic, kpi=None):
+        self.lock = threading.Lock()
+        self.junctions = junctions
+        self.clock = clock
+        self.kpi = kpi
+        self.steps = 0          # step() calls, the unit of the free-flow times
+        self.count = 0          # rows in use or parked, i.e. the high-water mark
+        self.free = []          # parked rows, reused by add()
+        self.crossedCount = np.zeros(4 * junctions, dtype=np.int64)
+        # Vehicles not yet past the stop line, kept up to date on spawn and on crossing
+        self.waiting = np.zeros((4 * junctions, 3), dtype=np.int64)
+        self._waitingSnapshot = ((0, 0, 0),) * (4 * junctions)
+        self.on_waiting = None  # on_waiting(snapshot) after every change, called with the lock held
+        # Last spawned row of every (approach, lane), -1 once it has left the screen
+        self.laneTail = np.full((4 * junctions, 3), -1, dtype=np.int64)
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        old, n = getattr(self, "pos", None), self.count
+        fields = {
+            "pos": ((capacity, 2), np.float64),
+            "size": ((capacity, 2), np.float64),
+            "signedStop": (capacity, np.float64),   # stop offset times the direction's sign
+            "direction": (capacity, np.int64),
+            "junction": (capacity, np.int64),
+            "approach": (capacity, np.int64),
+            "lane": (capacity, np.int64),
+            "sizeKey": (capacity, np.int64),
+            "leader": (capacity, np.int64),
+            "angle": (capacity, np.int64),
+            "crossed": (capacity, bool),
+            "willTurn": (capacity, bool),
+            "turned": (capacity, bool),
+            "active": (capacity, bool),
+            # KPI timings: spawned (time and step), first stopped, crossed, delay, stops,
+            # steps to the stop line without stopping, moving in the last step and since when
+            "born": (capacity, np.float64),
+            "bornStep": (capacity, np.int64),
+            "queuedAt": (capacity, np.float64),
+            "crossedAt": (capacity, np.float64),
+            "delay": (capacity, np.float64),
+            "stops": (capacity, np.int64),
+            "freeFlow": (capacity, np.float64),
+            "moving": (capacity, bool),
+            "movingSince": (capacity, np.float64),
+            # Per-row constants derived at spawn so step() only gathers what it needs
+            "speed": (capacity, np.float64),
+            "velocity": (capacity, np.float64),
+            "sign": (capacity, np.float64),
+            "forward": (capacity, np.float64),
+            "backward": (capacity, np.float64),
+            "signedStopLine": (capacity, np.float64),
+            "signedMid": (capacity, np.float64),
+            "axisIndex": (capacity, np.int64),
+            "leaderAxisIndex": (capacity, np.int64),
+            # Drives on whatever the gap to its leader: it has none, the leader has turned off (or,
+            # once this vehicle has turned too, is far enough ahead on the old axis)
+            "clear": (capacity, bool),
+            # What a finished turn swaps in: flat index of the new axis (own and leader's), its sign and front side
+            "turnIndex": (capacity, np.int64),
+            "leaderTurnIndex": (capacity, np.int64),
+            "turnSign": (capacity, np.float64),
+            "turnForward": (capacity, np.float64),
+        }
+        for name, (shape, dtype) in fields.items():
+            array = np.zeros(shape, dtype=dtype)
+            if old is not None:
+                array[:n] = getattr(self, name)[:n]
+            setattr(self, name, array)
+        # Flat views: one index per (row, axis) gathers faster than a 2-D (rows, axes) fancy index
+        self.flatPos, self.flatSize = self.pos.reshape(-1), self.size.reshape(-1)
+        self.capacity = capacity
+
+    def add(self, lane, vehicleClass, direction_number, will_turn, junction=0):
+        """Place a vehicle at its lane's entry, behind the lane's last vehicle, and return its row."""
+        with self.lock:
+            if self.free:
+                row = self.free.pop()
+            else:
+                if self.count == self.capacity:
+                    self._allocate(self.capacity * 2)
+                row = self.count
+                self.count += 1
+            direction = directionNumbers[direction_number]
+            axis, sign = directionAxis[direction], directionSign[direction]
+            key = (direction, vehicleClass)
+            approach = 4 * junction + direction_number
+            leader = self.laneTail[approach, lane]
+
+            self.pos[row] = _SPAWN[direction_number, lane]
+            if leader >= 0 and not self.crossed[leader]:
+                leaderRear = self.pos[leader, axis] + (self.size[leader, axis] if sign < 0 else 0)
+                length = vehicleSizes[key][axis] if sign > 0 else 0
+                self.pos[row, axis] = sign * min(sign * self.pos[row, axis], sign * leaderRear - gap - length)
+            self.size[row] = vehicleSizes[key]
+            self.speed[row] = speeds[vehicleClass]
+            self.velocity[row] = sign * speeds[vehicleClass]
+            self.sign[row] = sign
+            self.forward[row] = 1.0 if sign > 0 else 0.0
+            self.backward[row] = 1.0 - self.forward[row]
+            self.signedStopLine[row] = sign * stopLines[direction]
+            self.signedMid[row] = sign * _MID[direction_number]
+            self.axisIndex[row] = 2 * row + axis
+            newAxis = directionAxis[turnsInto[direction]]
+            self.turnIndex[row] = 2 * row + newAxis
+            self.turnSign[row] = directionSign[turnsInto[direction]]
+            self.turnForward[row] = 1.0 if self.turnSign[row] > 0 else 0.0
+            self.direction[row] = direction_number
+            self.junction[row] = junction
+            self.approach[row] = approach
+            self.lane[row] = lane
+            self.sizeKey[row] = _SIZE_KEYS[key]
+            self.angle[row] = 0
+            self.crossed[row] = False
+            self.willTurn[row] = bool(will_turn)
+            self.turned[row] = False
+            self.active[row] = True
+            self.born[row] = self.clock()
+            self.bornStep[row] = self.steps
+            self.queuedAt[row] = self.crossedAt[row] = np.nan
+            self.delay[row] = 0.0
+            self.stops[row] = 0
+            front = sign * (self.pos[row, axis] + self.size[row, axis] * self.forward[row])
+            self.freeFlow[row] = max(0.0, self.signedStopLine[row] - front) / self.speed[row]
+            self.moving[row] = True
+            self.movingSince[row] = -np.inf    # it drove in from upstream: its first halt is a stop
+
+            # STOP LOGIC
+            self.leader[row] = leader
+            self.clear[row] = leader < 0 or self.turned[leader]
+            self.leaderAxisIndex[row] = 2 * max(leader, 0) + axis
+            self.leaderTurnIndex[row] = 2 * max(leader, 0) + newAxis
+            if leader >= 0 and not self.crossed[leader]:
+                self.signedStop[row] = self.signedStop[leader] - (self.size[leader, axis] + gap)
+            else:
+                self.signedStop[row] = sign * defaultStop[direction]
+            self.laneTail[approach, lane] = row
+
+            self.waiting[approach, lane] += 1
+            self._publish_waiting()
+            return row
+
+    def retire_offscreen(self):
+        """Park every vehicle that has crossed and left the screen; return the parked rows."""
+        with self.lock:
+            n = self.count
+            pos, size = self.pos[:n], self.size[:n]
+            gone = np.flatnonzero(self.active[:n] & self.crossed[:n]
+                                  & ((pos[:, 0] > screenWidth) | (pos[:, 0] + size[:, 0] < 0)
+                                     | (pos[:, 1] > screenHeight) | (pos[:, 1] + size[:, 1] < 0)))
+            if gone.size == 0:
+                return gone
+            if self.kpi is not None:
+                self._record_kpis(gone)
+
+            # Parked rows stay crossed and never move or turn again
+            self.active[gone] = False
+            self.willTurn[gone] = False
+            self.speed[gone] = 0.0
+            self.velocity[gone] = 0.0
+
+            # Followers of a parked vehicle drive on without a leader
+            orphaned = np.flatnonzero(np.isin(self.leader[:n], gone))
+            self.leader[orphaned] = -1
+            self.clear[orphaned] = True
+            self.leaderAxisIndex[orphaned] = _AXIS[self.direction[orphaned]]
+            self.leaderTurnIndex[orphaned] = _NEW_AXIS[self.direction[orphaned]]
+            self.laneTail[np.isin(self.laneTail, gone)] = -1
+
+            self.free.extend(gone.tolist())
+            return gone
+
+    def _record_kpis(self, rows):
+        records = np.zeros(rows.size, dtype=VEHICLE_RECORD)
+        records["approach"] = self.approach[rows]
+        records["born"] = self.born[rows]
+        records["queued"] = self.queuedAt[rows]
+        records["crossed"] = self.crossedAt[rows]
+        records["exited"] = self.clock()
+        records["delay"] = self.delay[rows]
+        records["stops"] = self.stops[rows]
+        self.kpi.record_vehicles(records)
+
+    def reset_stops(self, direction_number, junction=0):
+        """Move every vehicle of an approach back to the stop line once its green ends."""
+        with self.lock:
+            n = self.count
+            self.signedStop[:n][self.approach[:n] == 4 * junction + direction_number] = _SIGNED_DEFAULT_STOP[direction_number]
+
+    def _publish_waiting(self):
+        self._waitingSnapshot = tuple(map(tuple, self.waiting.tolist()))
+        if self.on_waiting is not None:
+            self.on_waiting(self._waitingSnapshot)
+
+    def waiting_snapshot(self):
+        """
+        Vehicles waiting before the stop line as ((lane0, lane1, lane2), ...) per approach.
+        The tuple is replaced, never mutated, so any thread can read it without taking the lock.
+        """
+        return self._waitingSnapshot
+
+    def waiting_counts(self, junction=0):
+        """Vehicles waiting before the stop line of one junction, per direction number."""
+        return tuple(sum(lanes) for lanes in self._waitingSnapshot[4 * junction:4 * junction + 4])
+
+    def step(self, currentGreen, currentYellow):
+        """
+        Advance every vehicle by one frame.
+        currentGreen / currentYellow are the controller's values, or arrays of them by junction.
+        """
+        with self.lock:
+            n = self.count
+            if n == 0:
+                return
+            flatPos, flatSize = self.flatPos, self.flatSize
+            direction, crossed = self.direction[:n], self.crossed[:n]
+            sign, axisIndex, leaderAxisIndex = self.sign[:n], self.axisIndex[:n], self.leaderAxisIndex[:n]
+            forward = self.forward[:n]
+
+            signedFront = sign * (flatPos[axisIndex] + flatSize[axisIndex] * forward)
+            newlyCrossed = ((signedFront > self.signedStopLine[:n]) > crossed).nonzero()[0]   # past it and not yet crossed
+            if newlyCrossed.size:
+                if self.kpi is not None:
+                    self._time_crossings(newlyCrossed)
+                crossed[newlyCrossed] = True
+                approach = self.approach[newlyCrossed]
+                self.crossedCount += np.bincount(approach, minlength=self.crossedCount.size)
+                laneKeys = approach * 3 + self.lane[newlyCrossed]
+                self.waiting -= np.bincount(laneKeys, minlength=self.waiting.size).reshape(self.waiting.shape)
+                self._publish_waiting()
+
+            # The middle is past the stop line, so a vehicle that reached it has crossed
+            inTurn = self.willTurn[:n] & (signedFront >= self.signedMid[:n])
+
+            # Straight ahead (and turning vehicles that have not reached the middle yet)
+            if self.junctions == 1:
+                atGreen = (direction == currentGreen) if currentYellow == 0 else False
+            else:
+                atGreen = direction == np.where(currentYellow == 0, currentGreen, -1)[self.junction[:n]]
+            signedLeaderRear = sign * (flatPos[leaderAxisIndex] + flatSize[leaderAxisIndex] * self.backward[:n])
+            goStraight = (~inTurn
+                          & ((signedFront <= self.signedStop[:n]) | crossed | atGreen)
+                          & ((signedFront < signedLeaderRear - gap2) | self.clear[:n]))
+            flatPos[axisIndex[goStraight]] += self.velocity[:n][goStraight]
+            if self.kpi is not None:
+                self._time_stops(n, crossed | goStraight)
+
+            turning = inTurn.nonzero()[0]
+            if turning.size:
+                self._turn(turning)
+            self.steps += 1
+
+    def _time_crossings(self, rows):
+        """
+        Stamp vehicles crossing the stop line with their delay: time taken less free-flow time.
+        Free flow is counted in steps, and each vehicle's own seconds per step convert it, so the frame rate does not matter.
+        """
+        now = self.clock()
+        self.crossedAt[rows] = now
+        travel = now - self.born[rows]
+        steps = np.maximum(self.steps - self.bornStep[rows], 1)
+        self.delay[rows] = travel * np.maximum(0.0, 1.0 - self.freeFlow[rows] / steps)
+
+    def _time_stops(self, n, going):
+        """Count a stop for every waiting vehicle that halts after STOP_RELEASE seconds of driving; stamp its first halt."""
+        moving = self.moving[:n]
+        changed = (going != moving).nonzero()[0]   # halted or drove off this step: a few rows at most
+        if changed.size == 0:
+            return
+        now = self.clock()
+        wasMoving = moving[changed]
+        halted, started = changed[wasMoving], changed[~wasMoving]
+        self.movingSince[started] = now
+        self.stops[halted[now - self.movingSince[halted] >= STOP_RELEASE]] += 1
+        self.queuedAt[halted[np.isnan(self.queuedAt[halted])]] = now
+        moving[changed] = ~wasMoving
+
+    def _turn(self, rows):
+        """Rotate vehicles inside the box by one rotationAngle step per frame."""
+        angle = self.angle[rows] + rotationAngle
+        self.angle[rows] = angle
+        self.pos[rows] += _TURN_OFFSET[self.direction[rows]]
+        self.size[rows] = _ROTATED_SIZES[self.sizeKey[rows], angle // rotationAngle]
+        done = rows[angle >= 90]
+        if done.size:
+            self._finish_turns(done)
+
+    def _finish_turns(self, rows):
+        """
+        Put vehicles that have turned back on the straight path, now along their new axis.
+        From here on step() moves them like any other crossed vehicle, so the per-frame cost
+        of a turn ends with its rotation instead of when the vehicle leaves the screen.
+        """
+        n, flatPos = self.count, self.flatPos
+        # Whoever follows a vehicle that turned off no longer waits for it
+        self.clear[:n][np.isin(self.leader[:n], rows)] = True
+        # Neither vehicle moves along the old axis again, so the gap there is settled now
+        sign = self.sign[rows]
+        self.clear[rows] = ((self.leader[rows] < 0)
+                            | (sign * flatPos[self.axisIndex[rows]] < sign * flatPos[self.leaderAxisIndex[rows]] - gap2))
+        newSign, newForward = self.turnSign[rows], self.turnForward[rows]
+        self.axisIndex[rows] = self.turnIndex[rows]
+        self.leaderAxisIndex[rows] = self.leaderTurnIndex[rows]
+        self.sign[rows] = newSign
+        self.forward[rows] = newForward
+        self.backward[rows] = 1.0 - newForward
+        self.velocity[rows] = newSign * self.speed[rows]
+        self.turned[rows] = True
+        self.willTurn[rows] = False     # off the turning path: inTurn no longer picks them up
@@ -0,0 +1,140 @@
+"""
+Binary wire format for sensor readings and ACKs.
+
+Every datagram starts with a 3-byte header (magic, version, kind) followed by a
+fixed struct layout, all in network byte order:
+
+    READING  junction_id:B  vehicles:H  seq:I  timestamp:d           18 bytes
+    FRAME    count:B  seq:I  timestamp:d  count x (junction_id:B  vehicles:H)
+    ACK      seq:I                                                     7 bytes
+    SACK     seq:I  cum:I  sack:I                                     15 bytes
+
+A FRAME carries the readings of several approaches (all four junctions of the
+intersection) in one datagram under one sequence number. A SACK acknowledges seq
+and also reports the receiver's window: every seq below cum has arrived, and bit
+i of sack is set when seq cum + 1 + i has arrived too. The magic byte is never
+'{', so a receiver can tell a binary datagram from a legacy JSON one by its
+first byte and keep accepting both.
+"""
+import json
+import struct
+import time
+
+
+# === FORMAT ===
+MAGIC = 0xA7
+VERSION = 1
+
+KIND_READING = 1
+KIND_FRAME = 2
+KIND_ACK = 3
+KIND_SACK = 4
+
+SACK_BITS = 32                # seqs after cum covered by the SACK bitmap
+
+NO_SEQ = 0xFFFFFFFF           # seq field value for readings sent without a sequence number
+MAX_VEHICLES = 0xFFFF
+MAX_FRAME_READINGS = 0xFF
+
+HEADER = struct.Struct("!BBB")
+READING = struct.Struct("!BBBBHId")
+FRAME_HEAD = struct.Struct("!BBBBId")
+FRAME_ENTRY = struct.Struct("!BH")
+ACK = struct.Struct("!BBBI")
+SACK = struct.Struct("!BBBIII")
+
+
+def _seq_field(seq):
+    return NO_SEQ if seq is None else seq & 0xFFFFFFFF
+
+
+def _timestamp_field(timestamp):
+    # An epoch-0 reading would be dropped as stale by the receiver, so a missing time means now
+    return time.time() if timestamp is None else timestamp
+
+
+def _vehicles_field(vehicles):
+    return min(max(int(vehicles), 0), MAX_VEHICLES)
+
+
+# === ENCODING ===
+def encode_reading(junction_id, vehicles_detected, seq=None, timestamp=None):
+    """One junction's vehicle count, taken at timestamp (default: now)."""
+    return READING.pack(MAGIC, VERSION, KIND_READING, junction_id,
+                        _vehicles_field(vehicles_detected), _seq_field(seq), _timestamp_field(timestamp))
+
+
+def encode_frame(readings, seq=None, timestamp=None):
+    """Several (junction_id, vehicles_detected) readings in one datagram, taken at timestamp (default: now)."""
+    readings = list(readings)
+    if len(readings) > MAX_FRAME_READINGS:
+        raise ValueError(f"a frame holds at most {MAX_FRAME_READINGS} readings")
+    parts = [FRAME_HEAD.pack(MAGIC, VERSION, KIND_FRAME, len(readings), _seq_field(seq), _timestamp_field(timestamp))]
+    parts.extend(FRAME_ENTRY.pack(jid, _vehicles_field(v)) for jid, v in readings)
+    return b"".join(parts)
+
+
+def encode_ack(seq):
+    return ACK.pack(MAGIC, VERSION, KIND_ACK, _seq_field(seq))
+
+
+def encode_sack(seq, cum, sack):
+    """ACK for seq carrying the receiver's cumulative ACK point and SACK bitmap."""
+    return SACK.pack(MAGIC, VERSION, KIND_SACK, _seq_field(seq), cum & 0xFFFFFFFF, sack & 0xFFFFFFFF)
+
+
+# === DECODING ===
+def is_binary(data):
+    return len(data) >= HEADER.size and data[0] == MAGIC
+
+
+def decode(data):
+    """
+    Decode a binary or legacy JSON datagram into (kind, seq, payloads).
+    payloads is a list of reading dicts in the legacy JSON shape
+    ({"junction_id", "vehicles_detected", "timestamp", "seq"}); it is empty for ACKs
+    and holds one {"ack", "cum", "sack"} dict for SACKs.
+    Raises ValueError on anything malformed.
+    """
+    if not is_binary(data):
+        try:
+            message = json.loads(data.decode())
+        except (UnicodeDecodeError, json.JSONDecodeError) as e:
+            raise ValueError(f"not a sensor datagram: {e}") from None
+        if not isinstance(message, dict):
+            raise ValueError("JSON datagram is not an object")
+        if "ack" in message:
+            if "cum" in message:
+                return KIND_SACK, message["ack"], [{"ack": message["ack"], "cum": message["cum"],
+                                                    "sack": message.get("sack", 0)}]
+            return KIND_ACK, message["ack"], []
+        return KIND_READING, message.get("seq", None), [message]
+
+    _, version, kind = HEADER.unpack_from(data)
+    if version != VERSION:
+        raise ValueError(f"unsupported wire version {version}")
+    try:
+        if kind == KIND_READING:
+            _, _, _, jid, vehicles, seq, ts = READING.unpack(data)
+            seq = None if seq == NO_SEQ else seq
+            return kind, seq, [{"junction_id": jid, "vehicles_detected": vehicles, "timestamp": ts, "seq": seq}]
+
+        if kind == KIND_FRAME:
+            _, _, _, count, seq, ts = FRAME_HEAD.unpack_from(data)
+            if len(data) != FRAME_HEAD.size + count * FRAME_ENTRY.size:
+                raise ValueError(f"frame length {len(data)} does not match {count} readings")
+            seq = None if seq == NO_SEQ else seq
+            return kind, seq, [{"junction_id": jid, "vehicles_detected": vehicles, "timestamp": ts, "seq": seq}
+                               for jid, vehicles in FRAME_ENTRY.iter_unpack(data[FRAME_HEAD.size:])]
+
+        if kind == KIND_ACK:
+            _, _, _, seq = ACK.unpack(data)
+            return kind, (None if seq == NO_SEQ else seq), []
+
+        if kind == KIND_SACK:
+            _, _, _, seq, cum, sack = SACK.unpack(data)
+            seq = None if seq == NO_SEQ else seq
+            return kind, seq, [{"ack": seq, "cum": cum, "sack": sack}]
+    except struct.error as e:
+        raise ValueError(f"truncated datagram: {e}") from None
+    raise ValueError(f"unknown datagram kind {kind}")
@@ -0,0 +1,299 @@
+"""
+Sensor fleet: hundreds to thousands of virtual sensor nodes in one process.
+
+Each virtual node behaves like sensor_node.py. It sends one reading per interval
+with selective repeat, using its own sequence numbers, window and RTO. All nodes
+run as timer callbacks on one asyncio loop and share a small pool of UDP sockets.
+Nodes on the same socket interleave their sequence numbers: slot k of a socket
+with M nodes sends k, k + M, k + 2M, ... The listener therefore sees one ordinary
+sequence space per socket, and every ACK maps back to its node by seq % M.
+
+    python iot_nodes/sensor_fleet.py --nodes 2000 --interval 1 --duration 60
+"""
+import argparse
+import asyncio
+import logging
+import random
+import time
+
+from sensor_node import (DEFAULT_HOST, DEFAULT_PORT, SLEEP_INTERVAL, MAX_RETRIES, DUP_THRESHOLD,
+                         PACKET_LOSS_PROB, INITIAL_RTO, MAX_RTO, update_rto, CountsSubscription,
+                         wire_format)
+
+
+# === FLEET SETTINGS ===
+DEFAULT_NODES = 500
+NODE_WINDOW = 4              # readings in flight per node
+NODES_PER_SOCKET = 64        # keeps a socket's interleaved seqs well inside the listener's WINDOW_LIMIT
+DEFAULT_DURATION = 60.0      # seconds of traffic before the fleet drains and exits
+REPORT_INTERVAL = 5.0        # seconds between fleet status lines
+MAX_SYNTHETIC_VEHICLES = 60
+
+DIRECTIONS = ["right", "down", "left", "up"]
+
+
+# === VIRTUAL NODE ===
+class VirtualNode:
+    """One sensor's selective-repeat state; in_flight maps wire seq -> [data, sent_at, timer, retries, retransmitted]."""
+
+    __slots__ = ("fleet", "channel", "slot", "junction_id", "vehicles", "next_seq", "highest_acked",
+                 "in_flight", "srtt", "rttvar", "rto")
+
+    def __init__(self, fleet, channel, slot, junction_id):
+        self.fleet = fleet
+        self.channel = channel
+        self.slot = slot
+        self.junction_id = junction_id
+        self.vehicles = fleet.rng.randint(0, MAX_SYNTHETIC_VEHICLES // 2)
+
+        self.next_seq = slot
+        self.highest_acked = -1
+        self.in_flight = {}
+        self.srtt = None
+        self.rttvar = None
+        self.rto = INITIAL_RTO
+
+    # --- Sending ---
+    def tick(self):
+        """Send this interval's reading, unless the window is still full."""
+        fleet = self.fleet
+        stride = self.channel.size
+        if self.in_flight and self.next_seq >= min(self.in_flight) + fleet.window * stride:
+            fleet.stats["skipped"] += 1
+            return
+        seq = self.next_seq
+        self.next_seq += stride
+        data = wire_format.encode_reading(self.junction_id, fleet.reading(self), seq, time.time())
+        entry = self.in_flight[seq] = [data, 0.0, None, 0, False]
+        self._transmit(seq, entry)
+
+    def _transmit(self, seq, entry):
+        fleet = self.fleet
+        now = fleet.loop.time()
+        entry[1] = now
+        entry[2] = fleet.loop.call_at(now + min(self.rto * (2 ** entry[3]), MAX_RTO), self._timeout, seq)
+        if fleet.rng.random() < fleet.loss:
+            fleet.stats["lost"] += 1
+            return
+        self.channel.transport.sendto(entry[0])
+        fleet.stats["sent"] += 1
+
+    def _timeout(self, seq):
+        entry = self.in_flight.get(seq)
+        if entry is None:
+            return
+        # The cumulative ACK point is only checked here, once a packet's own ACK is overdue
+        if seq < self.channel.cum:
+            self.on_ack(seq)
+            return
+        # The backoff is per packet (2 ** retries in _transmit), as in sensor_node; rto changes only with RTT samples
+        if entry[3] >= MAX_RETRIES:
+            del self.in_flight[seq]
+            self.fleet.stats["dropped"] += 1
+            return
+        self._retransmit(seq, entry)
+
+    def _retransmit(self, seq, entry):
+        entry[3] += 1
+        entry[4] = True
+        self.fleet.stats["retransmitted"] += 1
+        self._transmit(seq, entry)
+
+    # --- Acknowledgements ---
+    def on_ack(self, seq):
+        entry = self.in_flight.pop(seq, None)
+        if entry is None:
+            return
+        entry[2].cancel()
+        fleet = self.fleet
+        fleet.stats["acked"] += 1
+        if not entry[4]:
+            self.srtt, self.rttvar, self.rto = update_rto(self.srtt, self.rttvar, fleet.loop.time() - entry[1])
+
+        if seq > self.highest_acked:
+            self.highest_acked = seq
+            # Fast retransmit, counted in this node's own packets
+            limit = seq - DUP_THRESHOLD * self.channel.size
+            for other, pending in list(self.in_flight.items()):
+                if other <= limit and pending[3] == 0:
+                    pending[2].cancel()
+                    self._retransmit(other, pending)
+
+
+# === SHARED SOCKET ===
+class Channel(asyncio.DatagramProtocol):
+    """One UDP socket shared by up to NODES_PER_SOCKET nodes; routes each ACK to the node that owns its seq."""
+
+    def __init__(self, fleet):
+        self.fleet = fleet
+        self.nodes = []
+        self.size = 0
+        self.cum = 0
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        try:
+            kind, seq, payloads = wire_format.decode(data)
+        except ValueError:
+            self.fleet.stats["invalid"] += 1
+            return
+        if seq is None:
+            return
+        nodes, size = self.nodes, self.size
+        if kind == wire_format.KIND_SACK:
+            cum, sack = payloads[0]["cum"], payloads[0]["sack"]
+            if cum > self.cum:
+                self.cum = cum
+            # Every set bit i is seq cum + 1 + i, owned by node (cum + 1 + i) % size
+            while sack:
+                low = sack & -sack
+                sacked = cum + low.bit_length()
+                nodes[sacked % size].on_ack(sacked)
+                sack ^= low
+        elif kind != wire_format.KIND_ACK:
+            return
+        nodes[seq % size].on_ack(seq)
+
+    def error_received(self, exc):
+        self.fleet.stats["errors"] += 1
+
+
+# === FLEET ===
+class SensorFleet:
+    """N virtual nodes reporting to one listener from a single event loop."""
+
+    def __init__(self, nodes=DEFAULT_NODES, host=DEFAULT_HOST, port=DEFAULT_PORT, interval=SLEEP_INTERVAL,
+                 window=NODE_WINDOW, loss=PACKET_LOSS_PROB, nodes_per_socket=NODES_PER_SOCKET,
+                 junctions=len(DIRECTIONS), source="synthetic", seed=None):
+        self.node_count = nodes
+        self.dest = (host, port)
+        self.interval = interval
+        self.window = window
+        self.loss = loss
+        self.nodes_per_socket = nodes_per_socket
+        self.junctions = junctions
+        self.source = source
+        self.rng = random.Random(seed)
+
+        self.loop = None
+        self.channels = []
+        self.nodes = []
+        self.subscription = None
+        self.running = False
+        self.stats = {"sent": 0, "acked": 0, "retransmitted": 0, "lost": 0, "dropped": 0,
+                      "skipped": 0, "invalid": 0, "errors": 0}
+
+    def reading(self, node):
+        """The vehicle count node reports this interval."""
+        if self.source == "api" and node.junction_id <= len(DIRECTIONS):
+            return self.subscription.counts.get(DIRECTIONS[node.junction_id - 1], 0)
+        node.vehicles = min(max(node.vehicles + self.rng.randint(-2, 2), 0), MAX_SYNTHETIC_VEHICLES)
+        return node.vehicles
+
+    # --- Scheduling ---
+    def _schedule(self, node, when):
+        self.loop.call_at(when, self._tick, node, when)
+
+    def _tick(self, node, when):
+        if not self.running:
+            return
+        node.tick()
+        self._schedule(node, when + self.interval)
+
+    async def _report(self, started):
+        last = dict(self.stats)
+        while self.running:
+            await asyncio.sleep(REPORT_INTERVAL)
+            sent = self.stats["sent"] - last["sent"]
+            acked = self.stats["acked"] - last["acked"]
+            in_flight = sum(len(node.in_flight) for node in self.nodes)
+            rtos = [node.rto for node in self.nodes if node.srtt is not None]
+            mean_rto = sum(rtos) / len(rtos) if rtos else INITIAL_RTO
+            print(f"🚗 Fleet t={self.loop.time() - started:5.1f}s | {sent / REPORT_INTERVAL:8.0f} pkt/s sent | "
+                  f"{acked / REPORT_INTERVAL:8.0f} ACK/s | {in_flight} in flight | mean RTO {mean_rto:.2f}s")
+            last = dict(self.stats)
+
+    # --- Run ---
+    async def run(self, duration=DEFAULT_DURATION):
+        self.loop = asyncio.get_running_loop()
+        for first in range(0, self.node_count, self.nodes_per_socket):
+            _, channel = await self.loop.create_datagram_endpoint(lambda: Channel(self), remote_addr=self.dest)
+            for slot in range(min(self.nodes_per_socket, self.node_count - first)):
+                index = first + slot
+                channel.nodes.append(VirtualNode(self, channel, slot, index % self.junctions + 1))
+            channel.size = len(channel.nodes)
+            self.channels.append(channel)
+            self.nodes.extend(channel.nodes)
+
+        print(f"🚦 Sensor fleet: {self.node_count} nodes on {len(self.channels)} sockets → {self.dest}, "
+              f"one reading every {self.interval}s each")
+        logging.info(f"Sensor fleet started: {self.node_count} nodes, {len(self.channels)} sockets → {self.dest}")
+
+        self.running = True
+        started = self.loop.time()
+        tasks = [asyncio.ensure_future(self._report(started))]
+        if self.source == "api":
+            self.subscription = CountsSubscription().start()
+        # Spread first readings over one interval so the fleet does not send in lockstep
+        for node in self.nodes:
+            self._schedule(node, started + self.rng.uniform(0, self.interval))
+
+        try:
+            await asyncio.sleep(duration)
+        finally:
+            self.running = False
+            for task in tasks:
+                task.cancel()
+
+        # Let the packets still in flight finish or give up
+        drain_until = self.loop.time() + MAX_RTO * 2
+        while any(node.in_flight for node in self.nodes) and self.loop.time() < drain_until:
+            await asyncio.sleep(0.1)
+        for channel in self.channels:
+            channel.transport.close()
+        return self.summary(duration)
+
+    def summary(self, duration):
+        stats = self.stats
+        print("\n📊 --- Fleet Transmission Summary ---")
+        print(f"🚗 Nodes / sockets:           {self.node_count} / {len(self.channels)}")
+        print(f"📦 Total packets sent:        {stats['sent']} ({stats['sent'] / duration:.0f}/s)")
+        print(f"✅ Total packets ACKed:       {stats['acked']}")
+        print(f"🔁 Total retransmissions:     {stats['retransmitted']}")
+        print(f"📉 Packets lost in transit:   {stats['lost']}")
+        print(f"❌ Packets permanently lost:  {stats['dropped']}")
+        print(f"⏭️ Readings skipped (window): {stats['skipped']}")
+        logging.info(f"FLEET SUMMARY: {stats}")
+        return stats
+
+
+# === MAIN ENTRY ===
+def main():
+    parser = argparse.ArgumentParser(description="IoT Sensor Fleet - many virtual sensor nodes in one process")
+    parser.add_argument("--nodes", type=int, default=DEFAULT_NODES, help="Number of virtual sensor nodes")
+    parser.add_argument("--host", type=str, default=DEFAULT_HOST, help="Host IP where simulation.py is listening")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="UDP port to send data")
+    parser.add_argument("--interval", type=float, default=SLEEP_INTERVAL, help="Seconds between readings of each node")
+    parser.add_argument("--window", type=int, default=NODE_WINDOW, help="Readings in flight per node")
+    parser.add_argument("--loss", type=float, default=PACKET_LOSS_PROB, help="Simulated packet loss probability")
+    parser.add_argument("--duration", type=float, default=DEFAULT_DURATION, help="Seconds to run")
+    parser.add_argument("--junctions", type=int, default=len(DIRECTIONS), help="Junction ids the nodes report (1..N)")
+    parser.add_argument("--nodes-per-socket", type=int, default=NODES_PER_SOCKET, help="Nodes sharing one UDP socket")
+    parser.add_argument("--source", choices=["synthetic", "api"], default="synthetic",
+                        help="Random-walk counts, or the simulation's live counts from one shared /stream subscription")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed for counts and loss")
+    args = parser.parse_args()
+
+    fleet = SensorFleet(args.nodes, args.host, args.port, args.interval, args.window, args.loss,
+                        args.nodes_per_socket, args.junctions, args.source, args.seed)
+    try:
+        asyncio.run(fleet.run(args.duration))
+    except KeyboardInterrupt:
+        print("\n🛑 Sensor fleet manually stopped by user.")
+
+
+if __name__ == "__main__":
+    main()
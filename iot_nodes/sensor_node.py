@@ -6,94 +6,421 @@ import requests
 import threading
 import random
 import os
+import sys
 import logging
 
+# The wire format is shared with the simulation's listener in Code/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Code"))
+import live_stream
+import wire_format
+from event_log import rng_stream
+from log_pipeline import PacketLog, add_logging_arguments, apply_logging_arguments, setup_logging
+
 # === LOGGING CONFIGURATION ===
-LOG_FILE = "sensor_ack_log.txt"
-logging.basicConfig(
-    filename=LOG_FILE,
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(message)s"
-)
-logging.info("🚀 Sensor Node started with Sliding Window + Logging")
+# Next to this script, whatever directory the node is started from (kept out of git by .gitignore)
+LOG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sensor_ack_log.txt")
+setup_logging(LOG_FILE)      # batched on a writer thread (see Code/log_pipeline.py)
+packetLog = PacketLog()      # per-packet lines; --log-every / --log-level set it
+logging.info("🚀 Sensor Node started with Selective Repeat + Logging")
 
 # === DEFAULT SETTINGS ===
 DEFAULT_HOST = "127.0.0.1"   # UDP destination (simulation listener)
 DEFAULT_PORT = 5051          # Must match network_listener.py
 FLASK_URL = "http://127.0.0.1:5055/counts"  # Simulation’s live data API
+STREAM_URL = "http://127.0.0.1:5055/stream"  # Same data pushed as Server-Sent Events
+HTTP_TIMEOUT = 2.0           # seconds to connect / read a /counts response
+BACKOFF_BASE = 0.5           # first retry delay bound after an API failure, doubled per failure
+BACKOFF_MAX = 30.0
 SLEEP_INTERVAL = 2.0         # Seconds between updates
 MAX_ZERO_COUNT = 5           # Exit if all zero readings 5 times in a row
+WIRE_FORMAT = "binary"       # "binary" (wire_format.py) or "json" for legacy listeners
 
 # === SLIDING WINDOW SETTINGS ===
-WINDOW_SIZE = 4              # number of unacknowledged packets allowed
-ACK_TIMEOUT = 2.0            # seconds before retransmission
+WINDOW_SIZE = 32             # packets in flight at once (the listener's SACK bitmap covers 32)
 MAX_RETRIES = 3              # maximum retransmission attempts per packet
+DUP_THRESHOLD = 3            # later packets ACKed before a missing one is resent without waiting for its RTO
 PACKET_LOSS_PROB = 0.1       # 20% simulated packet loss
 
+# Retransmission timeout (Jacobson/Karels, RFC 6298)
+INITIAL_RTO = 1.0            # seconds, before the first RTT sample
+MIN_RTO = 0.2
+MAX_RTO = 8.0
+RTT_ALPHA = 0.125            # gain of the smoothed RTT
+RTT_BETA = 0.25              # gain of the RTT variation
+CLOCK_GRANULARITY = 0.01
+
 zero_streak = 0  # Track consecutive zero readings
 
 
 # === FETCH LIVE VEHICLE DATA FROM FLASK ===
-def fetch_vehicle_counts():
-    """Fetch live vehicle counts and running flag from Flask API."""
-    try:
-        response = requests.get(FLASK_URL, timeout=2.0)
-        if response.status_code == 200:
+def backoff_delay(failures):
+    """Full-jitter exponential backoff: uniform in [0, min(BACKOFF_MAX, BACKOFF_BASE * 2^failures)]."""
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** failures))
+
+
+def new_session():
+    """HTTP session that keeps its connection to the API alive between requests."""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=2, max_retries=0)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class CountsClient:
+    """
+    Polls the simulation's /counts over one keep-alive session.
+    Each poll revalidates with If-None-Match, so an unchanged snapshot costs a 304.
+    After a failure, polls are skipped until a jittered, exponentially growing delay has passed.
+    """
+
+    def __init__(self, url=FLASK_URL):
+        self.url = url
+        self.session = new_session()
+        self.etag = None
+        self.counts = None
+        self.running = True
+        self.failures = 0
+        self.retry_at = 0.0
+
+    def fetch(self):
+        """Fetch live vehicle counts and running flag; None while the API is unreachable."""
+        if time.monotonic() < self.retry_at:
+            return None
+        headers = {"If-None-Match": self.etag} if self.etag else {}
+        try:
+            response = self.session.get(self.url, headers=headers, timeout=HTTP_TIMEOUT)
+        except requests.RequestException as e:
+            return self._failed(f"Failed to fetch counts: {e}")
+
+        if response.status_code == 304 and self.counts is not None:
+            self.failures = 0
+            return self.counts
+        if response.status_code != 200:
+            return self._failed(f"API returned status {response.status_code}")
+        try:
             data = response.json()
-            if not data.get("running", True):
-                print("🛑 Simulation stopped — shutting down sensor node.")
-                logging.info("🛑 Simulation stopped — shutting down sensor node.")
-                os._exit(0)
-            return data.get("counts", {})
-        else:
-            print(f"⚠️ API returned status {response.status_code}")
-            logging.warning(f"API returned status {response.status_code}")
-    except Exception as e:
-        print(f"⚠️ Failed to fetch counts: {e}")
-        logging.error(f"Failed to fetch counts: {e}")
-    return {"right": 0, "down": 0, "left": 0, "up": 0}
-
-
-# === ACK LISTENER THREAD ===
-def ack_listener(sock, acked_packets):
-    """Listen for ACKs from simulation."""
-    while True:
+        except ValueError as e:
+            return self._failed(f"API returned invalid JSON: {e}")
+
+        self.etag = response.headers.get("ETag")
+        self.counts = data.get("counts", {})
+        self.running = data.get("running", True)
+        self.failures = 0
+        return self.counts
+
+    def _failed(self, message):
+        self.failures += 1
+        delay = backoff_delay(self.failures)
+        self.retry_at = time.monotonic() + delay
+        print(f"⚠️ {message} — retrying in {delay:.1f}s")
+        logging.error(f"{message} (failure {self.failures}, retrying in {delay:.1f}s)")
+        return None
+
+    def retry_in(self):
+        return max(0.0, self.retry_at - time.monotonic())
+
+
+# === LIVE COUNTS SUBSCRIPTION ===
+class CountsSubscription:
+    """Latest vehicle counts pushed by the simulation's /stream, kept current by a background thread."""
+
+    def __init__(self, url=STREAM_URL):
+        self.url = url
+        self.counts = {"right": 0, "down": 0, "left": 0, "up": 0}
+        self.running = True
+        self.synced = False           # set by the first snapshot
+        self.changed = threading.Condition()
+
+    def start(self):
+        threading.Thread(target=self.listen, daemon=True, name="counts-subscription").start()
+        return self
+
+    def listen(self):
+        session = new_session()
+        failures = 0
+        while True:
+            try:
+                # Read timeout a little over two keepalives: a silent stream means the server is gone
+                with session.get(self.url, stream=True, timeout=(HTTP_TIMEOUT, 2 * live_stream.KEEPALIVE + 1)) as response:
+                    response.raise_for_status()
+                    print(f"📡 Subscribed to live counts at {self.url}")
+                    logging.info(f"Subscribed to live counts at {self.url}")
+                    for event, data in live_stream.iter_events(response.iter_lines(decode_unicode=True)):
+                        self.apply(event, data)
+                        failures = 0
+            except Exception as e:
+                failures += 1
+                delay = backoff_delay(failures)
+                print(f"⚠️ Live counts stream lost: {e} — reconnecting in {delay:.1f}s")
+                logging.error(f"Live counts stream lost: {e} (failure {failures})")
+                time.sleep(delay)
+            with self.changed:
+                self.synced = False
+
+    def apply(self, event, data):
+        with self.changed:
+            if event == "snapshot":
+                self.counts.update(data.get("counts", {}).get("counts", {}))
+                self.running = data.get("status", {}).get("running", True)
+                self.synced = True
+            elif event == "counts":
+                self.counts.update(data["counts"])
+            elif event == "status":
+                self.running = data["running"]
+            else:
+                return
+            self.changed.notify_all()
+
+    def wait_for_change(self, direction, last, timeout):
+        """
+        Return a copy of the counts once direction's count differs from last, or after timeout seconds;
+        None if the stream is down, so a broken connection is never mistaken for empty roads.
+        """
+        deadline = time.monotonic() + timeout
+        with self.changed:
+            while self.running and (not self.synced or self.counts.get(direction, 0) == last):
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    break
+                self.changed.wait(left)
+            return dict(self.counts) if self.synced else None
+
+
+# === SELECTIVE-REPEAT SENDER ===
+def update_rto(srtt, rttvar, rtt):
+    """Fold one RTT sample into (srtt, rttvar) and return (srtt, rttvar, rto); srtt is None before the first."""
+    if srtt is None:
+        srtt, rttvar = rtt, rtt / 2
+    else:
+        rttvar = (1 - RTT_BETA) * rttvar + RTT_BETA * abs(srtt - rtt)
+        srtt = (1 - RTT_ALPHA) * srtt + RTT_ALPHA * rtt
+    return srtt, rttvar, min(max(srtt + max(CLOCK_GRANULARITY, 4 * rttvar), MIN_RTO), MAX_RTO)
+
+
+class SelectiveRepeatSender:
+    """
+    Pipelined sender: packets up to `window` seqs past the oldest unACKed one are in flight, each with its own retransmission
+    deadline. The timeout follows the measured round-trip time (Jacobson/Karels, RFC 6298)
+    and doubles on each retry of a packet, once: rto itself is left to the RTT samples; cumulative and SACK acknowledgements from the listener clear
+    every packet they cover, and a gap DUP_THRESHOLD packets behind the newest ACK is resent at once. Only packets still in flight are remembered.
+    rng draws the simulated packet losses (default: an unseeded stream).
+    """
+
+    def __init__(self, sock, dest, window=WINDOW_SIZE, rng=None):
+        self.sock = sock
+        self.rng = rng or random.Random()
+        self.dest = dest
+        self.window = window
+        self.cond = threading.Condition()
+        self.closed = False
+
+        self.next_seq = 0
+        self.highest_acked = -1
+        self.in_flight = {}       # seq -> [data, sent_at, deadline, retries, retransmitted]
+
+        self.srtt = None
+        self.rttvar = None
+        self.rto = INITIAL_RTO
+
+        self.stats = {"sent": 0, "acked": 0, "retransmitted": 0, "lost": 0, "dropped": 0}
+
+    def start(self):
+        threading.Thread(target=self.ack_listener, daemon=True, name="ack-listener").start()
+        threading.Thread(target=self.retransmit_timer, daemon=True, name="retransmit-timer").start()
+
+    # --- Sending ---
+    def send(self, make_packet):
+        """Wait for room in the window, then send make_packet(seq) under the next sequence number."""
+        with self.cond:
+            # The window is a range of sequence numbers: nothing past the oldest unACKed seq + window
+            while self.in_flight and self.next_seq >= min(self.in_flight) + self.window and not self.closed:
+                self.cond.wait()
+            seq = self.next_seq
+            self.next_seq += 1
+            entry = self.in_flight[seq] = [make_packet(seq), 0.0, 0.0, 0, False]
+            self._transmit(seq, entry)
+            self.cond.notify_all()
+        return seq
+
+    def _transmit(self, seq, entry):
+        now = time.monotonic()
+        entry[1] = now
+        # Exponential backoff per packet: each retry waits twice as long as the last
+        entry[2] = now + min(self.rto * (2 ** entry[3]), MAX_RTO)
+
+        # Simulate packet loss
+        if self.rng.random() < PACKET_LOSS_PROB:
+            if packetLog(logging.WARNING):
+                print(f"❌ Packet seq={seq} lost in transmission (simulated)")
+                logging.warning(f"Packet seq={seq} lost (simulated)", extra={"seq": seq})
+            self.stats["lost"] += 1
+            return
+
         try:
-            data, _ = sock.recvfrom(1024)
-            msg = json.loads(data.decode())
-            ack_seq = msg.get("ack")
-            if ack_seq is not None:
-                acked_packets.add(ack_seq)
-                print(f"✅ ACK received for seq={ack_seq}")
-                logging.info(f"ACK received for seq={ack_seq}")
-        except Exception:
-            pass
-
-
-# === SEND VEHICLE DATA (Sliding Window + Loss Simulation) ===
-def send_vehicle_data(junction_id, host, port, interval):
+            self.sock.sendto(entry[0], self.dest)
+            self.stats["sent"] += 1
+        except OSError as e:
+            print(f"⚠️ Send failed for seq={seq}: {e}")
+            logging.error(f"Send failed for seq={seq}: {e}")
+
+    def flush(self, timeout):
+        """Wait up to timeout seconds for every packet in flight to be ACKed or dropped."""
+        deadline = time.monotonic() + timeout
+        with self.cond:
+            while self.in_flight and not self.closed:
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    return False
+                self.cond.wait(left)
+        return True
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+    # --- Acknowledgements ---
+    def ack_listener(self):
+        """Listen for ACKs from simulation."""
+        while not self.closed:
+            try:
+                data, _ = self.sock.recvfrom(1024)
+                kind, ack_seq, payloads = wire_format.decode(data)
+            except socket.timeout:
+                continue
+            except ValueError:
+                continue
+            except OSError:
+                return
+            if kind == wire_format.KIND_SACK:
+                self.on_ack(ack_seq, payloads[0]["cum"], payloads[0]["sack"])
+            elif kind == wire_format.KIND_ACK and ack_seq is not None:
+                self.on_ack(ack_seq)
+
+    def on_ack(self, ack_seq, cum=None, sack=0):
+        """Clear ack_seq plus everything below cum and every seq flagged in the SACK bitmap."""
+        with self.cond:
+            entry = self.in_flight.get(ack_seq)
+            if entry is not None and not entry[4]:
+                # Karn's rule: only packets sent once give an unambiguous RTT sample
+                self._update_rto(time.monotonic() - entry[1])
+
+            covered = []
+            for seq in self.in_flight:
+                if seq == ack_seq:
+                    covered.append(seq)
+                elif cum is not None:
+                    offset = seq - cum - 1
+                    if seq < cum or (0 <= offset < wire_format.SACK_BITS and (sack >> offset) & 1):
+                        covered.append(seq)
+            for seq in covered:
+                del self.in_flight[seq]
+            if covered:
+                self.stats["acked"] += len(covered)
+                self.highest_acked = max(self.highest_acked, max(covered))
+                self.cond.notify_all()
+
+            # Fast retransmit: a packet DUP_THRESHOLD behind the newest ACK was almost surely lost
+            fast = [seq for seq, entry in self.in_flight.items()
+                    if entry[3] == 0 and seq <= self.highest_acked - DUP_THRESHOLD]
+            for seq in fast:
+                entry = self.in_flight[seq]
+                entry[3] += 1
+                entry[4] = True
+                self.stats["retransmitted"] += 1
+                self._transmit(seq, entry)
+
+        if fast and packetLog(logging.WARNING):
+            print(f"⚡ Fast retransmit: {fast}")
+            logging.warning(f"Fast retransmit: {fast}", extra={"retransmitted": fast})
+        if covered and packetLog(seq=ack_seq):
+            print(f"✅ ACK received for seq={ack_seq} (cleared {covered}, RTO={self.rto:.2f}s)")
+            logging.info(f"ACK received for seq={ack_seq} cum={cum} sack={sack:#x} cleared={covered}",
+                         extra={"seq": ack_seq, "cum": cum, "cleared": covered, "rto": round(self.rto, 3)})
+
+    def _update_rto(self, rtt):
+        self.srtt, self.rttvar, self.rto = update_rto(self.srtt, self.rttvar, rtt)
+
+    # --- Retransmission ---
+    def retransmit_timer(self):
+        """Retransmit each packet whose deadline has passed, sleeping until the earliest one."""
+        with self.cond:
+            while not self.closed:
+                now = time.monotonic()
+                expired = [seq for seq, entry in self.in_flight.items() if entry[2] <= now]
+                if expired:
+                    # The backoff is per packet (2 ** retries in _transmit); rto itself changes only with RTT samples
+                    resent = []
+                    for seq in expired:
+                        entry = self.in_flight[seq]
+                        if entry[3] >= MAX_RETRIES:
+                            if packetLog(logging.WARNING):
+                                print(f"❌ Packet seq={seq} dropped permanently after {MAX_RETRIES} retries")
+                                logging.warning(f"Packet seq={seq} dropped permanently after {MAX_RETRIES} retries",
+                                                extra={"seq": seq})
+                            del self.in_flight[seq]
+                            self.stats["dropped"] += 1
+                            continue
+                        entry[3] += 1
+                        entry[4] = True
+                        self.stats["retransmitted"] += 1
+                        resent.append(seq)
+                        self._transmit(seq, entry)
+                    if resent and packetLog(logging.WARNING):
+                        print(f"🔁 Retransmitting lost packets: {resent}")
+                        logging.warning(f"Retransmitting lost packets: {resent} (RTO={self.rto:.2f}s)",
+                                        extra={"retransmitted": resent, "rto": round(self.rto, 3)})
+                    self.cond.notify_all()
+                    continue
+
+                deadlines = [entry[2] for entry in self.in_flight.values()]
+                self.cond.wait(min(deadlines) - now if deadlines else None)
+
+
+# === SEND VEHICLE DATA (Selective Repeat + Loss Simulation) ===
+def encode_packet(pkt, wire):
+    if wire == "json":
+        return json.dumps(pkt).encode()
+    return wire_format.encode_reading(pkt["junction_id"], pkt["vehicles_detected"], pkt["seq"], pkt["timestamp"])
+
+
+def send_vehicle_data(junction_id, host, port, interval, wire=WIRE_FORMAT, window=WINDOW_SIZE, poll=False, seed=None):
     global zero_streak
 
     sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
     sock.settimeout(0.5)
 
     directions = ["right", "down", "left", "up"]
-    print(f"🚦 Reliable Sensor Node (Sliding Window + Packet Loss Simulation) started for Junction {junction_id} → {(host, port)}")
+    print(f"🚦 Reliable Sensor Node (Selective Repeat + Packet Loss Simulation) started for Junction {junction_id} → {(host, port)}")
     logging.info(f"Sensor Node started for Junction {junction_id} → {(host, port)}")
 
-    acked_packets = set()
-    seq_number = 0
-
-    # Performance counters
-    stats = {"sent": 0, "acked": 0, "retransmitted": 0, "dropped": 0}
+    sender = SelectiveRepeatSender(sock, (host, port), window, rng_stream(seed, f"loss:{junction_id}"))
+    sender.start()
 
-    # Start ACK listener thread
-    threading.Thread(target=ack_listener, args=(sock, acked_packets), daemon=True).start()
+    # Pushed counts: send as soon as this approach's count changes, or every interval as a heartbeat
+    client = CountsClient() if poll else None
+    subscription = None if poll else CountsSubscription().start()
+    direction = directions[junction_id - 1] if 1 <= junction_id <= 4 else "right"
+    vehicles_detected = None
 
     try:
         while True:
-            counts = fetch_vehicle_counts()
-            direction = directions[junction_id - 1] if 1 <= junction_id <= 4 else "right"
+            if subscription is None:
+                counts = client.fetch()
+                running = client.running
+            else:
+                counts = subscription.wait_for_change(direction, vehicles_detected, interval)
+                running = subscription.running
+            if not running:
+                print("🛑 Simulation stopped — shutting down sensor node.")
+                logging.info("🛑 Simulation stopped — shutting down sensor node.")
+                break
+            if counts is None:
+                # No data (API unreachable): wait for the backoff instead of reporting zeros
+                if subscription is None:
+                    time.sleep(client.retry_in())
+                continue
             vehicles_detected = counts.get(direction, 0)
 
             # Zero reading check
@@ -109,104 +436,60 @@ def send_vehicle_data(junction_id, host, port, interval):
                 logging.info("🛑 No activity detected — exiting sensor node.")
                 break
 
-            # Build window
-            packets = []
-            for i in range(WINDOW_SIZE):
-                packets.append({
-                    "seq": seq_number + i,
-                    "junction_id": junction_id,
-                    "vehicles_detected": vehicles_detected,
-                    "timestamp": time.time()
-                })
-
-            base = seq_number
-            retries = {p["seq"]: 0 for p in packets}
-            total_packets = len(packets)
-
-            print(f"\n🪟 Sending window: seq={base} → seq={base + total_packets - 1}")
-            logging.info(f"Sending window: seq={base} → seq={base + total_packets - 1}")
-
-            while base < seq_number + total_packets:
-                for pkt in packets:
-                    seq = pkt["seq"]
-
-                    # Skip ACKed packets
-                    if seq in acked_packets:
-                        continue
-
-                    # Simulate packet loss
-                    if random.random() < PACKET_LOSS_PROB:
-                        print(f"❌ Packet seq={seq} lost in transmission (simulated)")
-                        logging.warning(f"Packet seq={seq} lost (simulated)")
-                        stats["dropped"] += 1
-                        continue
-
-                    # Normal send
-                    try:
-                        sock.sendto(json.dumps(pkt).encode(), (host, port))
-                        print(f"📤 Sent seq={seq} | {pkt['vehicles_detected']} vehicles")
-                        logging.info(f"Sent seq={seq} | {pkt['vehicles_detected']} vehicles")
-                        stats["sent"] += 1
-                    except Exception as e:
-                        print(f"⚠️ Send failed for seq={seq}: {e}")
-                        logging.error(f"Send failed for seq={seq}: {e}")
-                    retries[seq] += 1
-
-                # Wait for ACKs
-                time.sleep(ACK_TIMEOUT)
-
-                # Slide window when ACKs come
-                while base in acked_packets and base < seq_number + total_packets:
-                    stats["acked"] += 1
-                    base += 1
-
-                # Retransmit unacked packets
-                unacked = [p["seq"] for p in packets if p["seq"] not in acked_packets]
-                if unacked:
-                    print(f"🔁 Retransmitting lost packets: {unacked}")
-                    logging.warning(f"Retransmitting lost packets: {unacked}")
-                    stats["retransmitted"] += len(unacked)
-
-                # Handle permanently lost packets
-                for seq in unacked:
-                    if retries[seq] >= MAX_RETRIES:
-                        print(f"❌ Packet seq={seq} dropped permanently after {MAX_RETRIES} retries")
-                        logging.warning(f"Packet seq={seq} dropped permanently after {MAX_RETRIES} retries")
-                        acked_packets.add(seq)
-                        stats["dropped"] += 1
-
-                if base >= seq_number + total_packets:
-                    break
+            # Blocks only while the window is full
+            seq = sender.send(lambda seq: encode_packet({
+                "seq": seq,
+                "junction_id": junction_id,
+                "vehicles_detected": vehicles_detected,
+                "timestamp": time.time()
+            }, wire))
+            if packetLog(seq=seq):
+                print(f"📤 Sent seq={seq} | {vehicles_detected} vehicles | {len(sender.in_flight)}/{window} in flight")
+                logging.info(f"Sent seq={seq} | {vehicles_detected} vehicles",
+                             extra={"seq": seq, "junction": junction_id, "vehicles": vehicles_detected})
+
+            if subscription is None:
+                time.sleep(interval)
 
-            seq_number += total_packets
-            time.sleep(interval)
+        sender.flush(timeout=MAX_RTO)
 
     except KeyboardInterrupt:
         print("\n🛑 Sensor node manually stopped by user.")
         logging.info("🛑 Sensor node manually stopped by user.")
 
     finally:
+        sender.close()
+        stats = sender.stats
         # === Print summary ===
         print("\n📊 --- Transmission Summary ---")
         print(f"📦 Total packets sent:        {stats['sent']}")
         print(f"✅ Total packets ACKed:       {stats['acked']}")
         print(f"🔁 Total retransmissions:     {stats['retransmitted']}")
+        print(f"📉 Packets lost in transit:   {stats['lost']}")
         print(f"❌ Packets permanently lost:  {stats['dropped']}")
+        print(f"⏱️ Final RTO:                 {sender.rto:.2f}s")
         logging.info(f"SUMMARY: {stats}")
+        logging.shutdown()           # os._exit skips atexit: write out the queued log lines first
         sock.close()
         os._exit(0)
 
 
 # === MAIN ENTRY ===
 def main():
-    parser = argparse.ArgumentParser(description="IoT Sensor Node - Reliable UDP (Sliding Window + Logging + Loss Simulation)")
+    parser = argparse.ArgumentParser(description="IoT Sensor Node - Reliable UDP (Selective Repeat + Logging + Loss Simulation)")
     parser.add_argument("--junction", type=int, default=1, help="Junction ID (1–4)")
     parser.add_argument("--host", type=str, default=DEFAULT_HOST, help="Host IP where simulation.py is listening")
     parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="UDP port to send data")
-    parser.add_argument("--interval", type=float, default=SLEEP_INTERVAL, help="Seconds between updates")
+    parser.add_argument("--interval", type=float, default=SLEEP_INTERVAL, help="Seconds between updates (heartbeat when subscribed)")
+    parser.add_argument("--wire", choices=["binary", "json"], default=WIRE_FORMAT, help="Packet encoding")
+    parser.add_argument("--window", type=int, default=WINDOW_SIZE, help="Packets in flight at once")
+    parser.add_argument("--poll", action="store_true", help="Poll /counts every interval instead of subscribing to /stream")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for the simulated packet loss")
+    add_logging_arguments(parser)
     args = parser.parse_args()
+    apply_logging_arguments(args, LOG_FILE, packetLog)
 
-    send_vehicle_data(args.junction, args.host, args.port, args.interval)
+    send_vehicle_data(args.junction, args.host, args.port, args.interval, args.wire, args.window, args.poll, args.seed)
 
 
 if __name__ == "__main__":